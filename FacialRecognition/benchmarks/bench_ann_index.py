@@ -0,0 +1,150 @@
+"""
+Benchmark of approximate gallery indexes against exact search.
+
+Builds a synthetic gallery, then measures query latency and recall@1 of each
+index compared with the exact FaceGallery scan. The quantized prefilters
+(int8, float16, PCA) also report the megabytes scanned per query.
+
+Clustered data is easy for indexes that rely on structure; --data uniform has
+no structure to exploit and is the regression check for the prefilters, whose
+shortlist must keep the exact match. --min-recall makes the run exit with
+code 1 when an index falls below it.
+
+Usage (from the FacialRecognition folder):
+    python -m benchmarks.bench_ann_index --size 200000 --n-probe 1 4 8 16
+    python -m benchmarks.bench_ann_index --size 100000 --dimensions 512 --metric cosine \
+        --data uniform --probe-noise 1.0 --n-probe --min-recall 1.0
+"""
+import argparse
+import json
+import sys
+import time
+import numpy as np
+
+from src.utils.face_gallery import FaceGallery
+from src.indexes.ivf_flat_index import IVFFlatIndex
+from src.indexes.quantized_index import QuantizedIndex
+
+
+def make_gallery_data(size: int, dimensions: int, identities_per_cluster: int, seed: int,
+                      clustered: bool = True):
+    """
+    Generates clustered encodings, loosely resembling real face embeddings where
+    similar-looking people end up close together. With clustered=False every
+    encoding is independent noise.
+    """
+    rng = np.random.default_rng(seed)
+    if not clustered:
+        return rng.normal(size=(size, dimensions)).astype(np.float32)
+    n_clusters = max(1, size // identities_per_cluster)
+    centers = rng.normal(size=(n_clusters, dimensions)).astype(np.float32)
+    labels = rng.integers(0, n_clusters, size)
+    encodings = centers[labels] + rng.normal(size=(size, dimensions)).astype(np.float32)
+    return encodings
+
+
+def measure(gallery: FaceGallery, probes: np.ndarray, expected) -> dict:
+    latencies = []
+    hits = 0
+    for probe, expected_username in zip(probes, expected):
+        start = time.perf_counter()
+        username, _ = gallery.best_match(probe)
+        latencies.append(time.perf_counter() - start)
+        hits += username == expected_username
+
+    latencies = np.array(latencies) * 1000
+    return {
+        "recall_at_1": hits / len(probes),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "mean_ms": float(latencies.mean()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare approximate indexes with exact gallery search")
+    parser.add_argument("--size", type=int, default=100000, help="Number of enrolled encodings")
+    parser.add_argument("--dimensions", type=int, default=128, help="Encoding size (128 dlib, 512 InsightFace)")
+    parser.add_argument("--metric", choices=FaceGallery.METRICS, default="euclidean")
+    parser.add_argument("--queries", type=int, default=500, help="Number of probes")
+    parser.add_argument("--data", choices=("clustered", "uniform"), default="clustered",
+                        help="Synthetic gallery layout")
+    parser.add_argument("--probe-noise", type=float, default=0.3,
+                        help="Noise added to enrolled encodings to build genuine probes")
+    parser.add_argument("--n-probe", type=int, nargs="*", default=[1, 4, 8, 16, 32])
+    parser.add_argument("--quantized", nargs="*", default=["int8", "float16", "pca"],
+                        choices=QuantizedIndex.PRECISIONS, help="Reduced-precision prefilters")
+    parser.add_argument("--shortlist", type=int, default=256, help="Rows re-ranked after the quantized scan")
+    parser.add_argument("--pca-dimensions", type=int, help="PCA projection size, default a quarter of the encoding")
+    parser.add_argument("--hnsw-ef", type=int, nargs="*", default=[], help="ef_search values (requires hnswlib)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--min-recall", type=float, help="Exit with code 1 if any index has a lower recall@1")
+    args = parser.parse_args()
+
+    encodings = make_gallery_data(args.size, args.dimensions, 50, args.seed, clustered=args.data == "clustered")
+    usernames = [f"user_{i}" for i in range(args.size)]
+    users = {username: {"face_encoding": encoding} for username, encoding in zip(usernames, encodings)}
+
+    rng = np.random.default_rng(args.seed + 1)
+    probe_rows = rng.integers(0, args.size, args.queries)
+    probes = encodings[probe_rows] + args.probe_noise * rng.normal(size=(args.queries, args.dimensions)).astype(np.float32)
+
+    exact = FaceGallery(metric=args.metric)
+    exact.load_users(users)
+    expected = [exact.best_match(probe)[0] for probe in probes]
+
+    results = [dict(index="exact", **measure(exact, probes, expected))]
+
+    for n_probe in args.n_probe:
+        index = IVFFlatIndex(n_probe=n_probe, min_train_size=1)
+        start = time.perf_counter()
+        gallery = FaceGallery(metric=args.metric, index=index)
+        gallery.load_users(users)
+        build_s = time.perf_counter() - start
+        results.append(dict(index="ivf", n_probe=n_probe, n_lists=len(index.centroids),
+                            build_s=build_s, **measure(gallery, probes, expected)))
+
+    for precision in args.quantized:
+        index = QuantizedIndex(precision=precision, shortlist_size=args.shortlist,
+                               pca_dimensions=args.pca_dimensions, min_train_size=1)
+        start = time.perf_counter()
+        gallery = FaceGallery(metric=args.metric, index=index)
+        gallery.load_users(users)
+        build_s = time.perf_counter() - start
+        results.append(dict(index=precision, shortlist=args.shortlist, build_s=build_s,
+                            scanned_mb=index.nbytes / (1024 * 1024), **measure(gallery, probes, expected)))
+
+    if args.hnsw_ef:
+        from src.indexes.hnsw_index import HNSWIndex
+
+        for ef_search in args.hnsw_ef:
+            index = HNSWIndex(ef_search=ef_search, min_train_size=1)
+            start = time.perf_counter()
+            gallery = FaceGallery(metric=args.metric, index=index)
+            gallery.load_users(users)
+            build_s = time.perf_counter() - start
+            results.append(dict(index="hnsw", ef_search=ef_search,
+                                build_s=build_s, **measure(gallery, probes, expected)))
+
+    print(f"{'index':<8}{'knob':>10}{'recall@1':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for result in results:
+        knob = result.get("n_probe", result.get("ef_search", result.get("shortlist", "-")))
+        print(f"{result['index']:<8}{knob:>10}{result['recall_at_1']:>10.3f}"
+              f"{result['p50_ms']:>10.3f}{result['p99_ms']:>10.3f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"size": args.size, "dimensions": args.dimensions, "metric": args.metric,
+                       "data": args.data, "results": results}, f, indent=4)
+
+    if args.min_recall is not None:
+        failed = [result["index"] for result in results if result["recall_at_1"] < args.min_recall]
+        if failed:
+            print(f"Recall@1 below {args.min_recall}: {', '.join(failed)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,103 @@
+"""
+Benchmark of the InsightFace detection input size.
+
+Encodes a set of real images once per det_size and compares every size with
+the largest one: latency per image, detection rate and cosine similarity of
+the embeddings to the reference embedding of the same image. A similarity
+close to 1 means the smaller detector input gives the same identity vector.
+
+Usage (from the FacialRecognition folder):
+    python -m benchmarks.bench_det_size photos/ --sizes 320 480 640 960
+    python -m benchmarks.bench_det_size roster.csv --limit 200 --output det_size.json
+"""
+import argparse
+import json
+import os
+import time
+import numpy as np
+
+from src.recognizers.insightface_recognizer import InsightFaceRecognizer
+from src.tools.bulk_enroll import read_roster
+from src.utils.image_utils import ImageUtils
+from src import config
+
+
+def encode_all(recognizer: InsightFaceRecognizer, images) -> dict:
+    latencies = []
+    encodings = []
+    for image in images:
+        start = time.perf_counter()
+        encodings.append(recognizer.get_face_encoding(image))
+        latencies.append(time.perf_counter() - start)
+
+    latencies = np.array(latencies) * 1000
+    return {
+        "encodings": encodings,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "mean_ms": float(latencies.mean()),
+    }
+
+
+def similarity_to_reference(encodings, reference) -> list:
+    similarities = []
+    for encoding, expected in zip(encodings, reference):
+        if encoding is None or expected is None:
+            continue
+        similarities.append(float(np.dot(encoding, expected) /
+                                  (np.linalg.norm(encoding) * np.linalg.norm(expected))))
+    return similarities
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare InsightFace detection input sizes")
+    parser.add_argument("source", help="Directory of images or CSV file with username,image_path rows")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[320, 480, 640, 960],
+                        help="det_size values; the largest one is the reference")
+    parser.add_argument("--limit", type=int, help="Use at most this many images")
+    parser.add_argument("--model-folder", default=os.path.join(os.path.expanduser("~"), ".insightface", "models"))
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    # Decode once so the timings only cover pre-processing, detection and encoding
+    paths = [path for _, path in read_roster(args.source)][:args.limit]
+    images = [image for image in (ImageUtils.read_image(path) for path in paths) if image is not None]
+    print(f"{len(images)} images, median size "
+          f"{int(np.median([max(image.shape[:2]) for image in images]))} px")
+
+    sizes = sorted(args.sizes, reverse=True)
+    runs = {}
+    for det_size in sizes:
+        recognizer = InsightFaceRecognizer(model_folder=args.model_folder,
+                                           allowed_modules=config.IF_ALLOWED_MODULES, det_size=det_size)
+        recognizer.warm_up()
+        runs[det_size] = encode_all(recognizer, images)
+
+    reference = runs[sizes[0]]["encodings"]
+    results = []
+    for det_size in sizes:
+        run = runs.pop(det_size)
+        encodings = run.pop("encodings")
+        similarities = similarity_to_reference(encodings, reference)
+        results.append(dict(
+            det_size=det_size,
+            detection_rate=sum(encoding is not None for encoding in encodings) / len(images),
+            mean_similarity=float(np.mean(similarities)) if similarities else None,
+            min_similarity=float(np.min(similarities)) if similarities else None,
+            **run
+        ))
+
+    print(f"{'det_size':>8}{'detected':>10}{'mean sim':>10}{'min sim':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for result in results:
+        mean_similarity = result["mean_similarity"] if result["mean_similarity"] is not None else float("nan")
+        min_similarity = result["min_similarity"] if result["min_similarity"] is not None else float("nan")
+        print(f"{result['det_size']:>8}{result['detection_rate']:>10.3f}{mean_similarity:>10.4f}"
+              f"{min_similarity:>10.4f}{result['p50_ms']:>10.2f}{result['p99_ms']:>10.2f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"images": len(images), "reference_size": sizes[0], "results": results}, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
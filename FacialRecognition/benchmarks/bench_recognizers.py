@@ -0,0 +1,322 @@
+"""
+Benchmark suite for the recognizers and the verify match path.
+
+Each recognizer runs in its own spawned process over a local image corpus,
+with the images resized to several resolutions and submitted as JPEG bytes,
+as the API receives them. For each resolution the suite reports:
+- end-to-end latency percentiles and images/sec
+- latency percentiles of each pipeline stage (decode, preprocess, detect, ...)
+- the detection rate
+Peak RSS is reported per recognizer.
+
+The match path is measured separately. Synthetic galleries of 1k to 1M
+encodings are built, and the FaceGallery.best_match latency is timed (the
+verify lookup). 128-d galleries use the euclidean metric (dlib) and 512-d
+galleries use cosine (InsightFace).
+
+Results are written as JSON together with the commit and library versions.
+--baseline compares a run with a previous file and exits with status 1 when
+a p50 regressed by more than --max-regression.
+
+Usage (from the FacialRecognition folder):
+    python -m benchmarks.bench_recognizers photos/ --output bench.json
+    python -m benchmarks.bench_recognizers roster.csv --recognizers hybrid insightface --resolutions 640 1280
+    python -m benchmarks.bench_recognizers --gallery-sizes 1000 100000 --baseline bench.json
+"""
+import argparse
+import json
+import multiprocessing
+import platform
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List
+
+import cv2
+import numpy as np
+
+from src.utils.face_gallery import FaceGallery
+
+
+RECOGNIZERS = ["hybrid", "cnn", "dlib", "face_recognition", "insightface"]
+
+# Encoding size -> metric of the recognizers producing it
+GALLERY_METRICS = {128: "euclidean", 512: "cosine"}
+
+
+def percentiles(values_s) -> dict:
+    """
+    Summarizes latencies given in seconds as milliseconds.
+    """
+    values = np.asarray(values_s, dtype=np.float64) * 1000
+    if len(values) == 0:
+        return {}
+    return {
+        "count": int(len(values)),
+        "p50_ms": float(np.percentile(values, 50)),
+        "p90_ms": float(np.percentile(values, 90)),
+        "p99_ms": float(np.percentile(values, 99)),
+        "mean_ms": float(values.mean()),
+    }
+
+
+def peak_rss_mb() -> float:
+    """
+    Returns the peak resident set size of the current process in MB.
+    """
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def resize_to(image: np.ndarray, max_side: int) -> np.ndarray:
+    """
+    Resizes an image so its longest side is `max_side` pixels.
+    """
+    h, w = image.shape[:2]
+    scale = max_side / max(h, w)
+    interpolation = cv2.INTER_AREA if scale < 1.0 else cv2.INTER_LINEAR
+    return cv2.resize(image, (max(1, round(w * scale)), max(1, round(h * scale))), interpolation=interpolation)
+
+
+def run_recognizer(name: str, paths: List[str], resolutions: List[int], repeat: int) -> dict:
+    """
+    Loads one recognizer and encodes the corpus at every resolution.
+    Runs in a dedicated process so model memory and peak RSS are not shared.
+    """
+    from src.tools.bulk_enroll import build_recognizer
+    from src.utils.image_utils import ImageUtils
+    from src.utils.metrics import metrics
+
+    start = time.perf_counter()
+    try:
+        recognizer = build_recognizer(name)
+    except Exception as e:
+        return {"recognizer": name, "error": str(e)}
+    if not getattr(recognizer, "is_initialized", True):
+        return {"recognizer": name, "error": "recognizer failed to initialize"}
+    load_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    recognizer.warm_up()
+    warm_up_s = time.perf_counter() - start
+
+    images = [image for image in (ImageUtils.load_image(path) for path in paths) if image is not None]
+    dimensions = None
+    runs = []
+
+    for max_side in resolutions:
+        payloads = [cv2.imencode(".jpg", resize_to(image, max_side))[1].tobytes() for image in images]
+
+        latencies = []
+        detected = 0
+        metrics.capture_samples()
+        wall_start = time.perf_counter()
+        for _ in range(repeat):
+            for payload in payloads:
+                start = time.perf_counter()
+                encoding = recognizer.get_face_encoding(payload)
+                latencies.append(time.perf_counter() - start)
+                if encoding is not None:
+                    detected += 1
+                    dimensions = len(encoding)
+        wall_s = time.perf_counter() - wall_start
+        samples = metrics.take_samples()
+
+        stages = {dict(labels)["stage"]: percentiles(values)
+                  for (metric_name, labels), values in sorted(samples.items())
+                  if metric_name == "face_stage_seconds"}
+        runs.append({
+            "max_side": max_side,
+            "images": len(latencies),
+            "detection_rate": detected / len(latencies) if latencies else 0.0,
+            "images_per_s": len(latencies) / wall_s if wall_s > 0 else 0.0,
+            "latency": percentiles(latencies),
+            "stages": stages,
+        })
+
+    return {
+        "recognizer": name,
+        "dimensions": dimensions,
+        "load_s": load_s,
+        "warm_up_s": warm_up_s,
+        "peak_rss_mb": peak_rss_mb(),
+        "resolutions": runs,
+    }
+
+
+def bench_gallery(size: int, dimensions: int, queries: int, seed: int) -> dict:
+    """
+    Times best_match over a synthetic gallery of random encodings.
+    """
+    metric = GALLERY_METRICS.get(dimensions, "euclidean")
+    rng = np.random.default_rng(seed)
+    encodings = rng.standard_normal((size, dimensions), dtype=np.float32)
+    usernames = [f"user_{i}" for i in range(size)]
+
+    start = time.perf_counter()
+    gallery = FaceGallery(metric=metric)
+    gallery.load_matrix(usernames, encodings)
+    build_s = time.perf_counter() - start
+
+    probe_rows = rng.integers(0, size, queries)
+    probes = encodings[probe_rows] + 0.1 * rng.standard_normal((queries, dimensions), dtype=np.float32)
+    del encodings
+
+    gallery.best_match(probes[0])
+    latencies = []
+    for probe in probes:
+        start = time.perf_counter()
+        gallery.best_match(probe)
+        latencies.append(time.perf_counter() - start)
+
+    return {
+        "size": size,
+        "dimensions": dimensions,
+        "metric": metric,
+        "build_s": build_s,
+        "matrix_mb": gallery.encodings.nbytes / (1024 * 1024),
+        "queries_per_s": queries / sum(latencies),
+        "latency": percentiles(latencies),
+    }
+
+
+def environment() -> dict:
+    """
+    Describes the code version and the machine the results come from.
+    """
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": multiprocessing.cpu_count(),
+    }
+
+
+def p50_table(report: dict) -> Dict[str, float]:
+    """
+    Flattens a report into {benchmark key: p50 latency in ms}.
+    """
+    table = {}
+    for result in report.get("recognizers", []):
+        for run in result.get("resolutions", []):
+            if run["latency"]:
+                table[f"{result['recognizer']}@{run['max_side']}"] = run["latency"]["p50_ms"]
+    for result in report.get("galleries", []):
+        table[f"gallery {result['size']}x{result['dimensions']}"] = result["latency"]["p50_ms"]
+    return table
+
+
+def compare(report: dict, baseline: dict, max_regression: float) -> List[str]:
+    """
+    Returns a line per benchmark whose p50 grew more than `max_regression`
+    (a fraction) compared with the baseline report.
+    """
+    current = p50_table(report)
+    regressions = []
+    for key, previous in p50_table(baseline).items():
+        if key in current and previous > 0 and current[key] > previous * (1 + max_regression):
+            regressions.append(f"{key}: {previous:.3f} ms -> {current[key]:.3f} ms "
+                               f"(+{100 * (current[key] / previous - 1):.1f}%)")
+    return regressions
+
+
+def print_report(report: dict) -> None:
+    if report["recognizers"]:
+        print(f"{'recognizer':<18}{'side':>6}{'detected':>10}{'img/s':>9}{'p50 ms':>10}{'p99 ms':>10}{'rss MB':>9}")
+    for result in report["recognizers"]:
+        if "error" in result:
+            print(f"{result['recognizer']:<18} skipped: {result['error']}")
+            continue
+        for run in result["resolutions"]:
+            latency = run["latency"] or {"p50_ms": float("nan"), "p99_ms": float("nan")}
+            print(f"{result['recognizer']:<18}{run['max_side']:>6}{run['detection_rate']:>10.3f}"
+                  f"{run['images_per_s']:>9.2f}{latency['p50_ms']:>10.2f}{latency['p99_ms']:>10.2f}"
+                  f"{result['peak_rss_mb']:>9.0f}")
+            stages = ", ".join(f"{stage} {values['p50_ms']:.2f}" for stage, values in run["stages"].items())
+            print(f"{'':<18}stage p50 ms: {stages}")
+
+    if report["galleries"]:
+        print(f"\n{'gallery':<18}{'metric':>10}{'build s':>9}{'q/s':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for result in report["galleries"]:
+        print(f"{result['size']:>10} x {result['dimensions']:<5}{result['metric']:>10}{result['build_s']:>9.2f}"
+              f"{result['queries_per_s']:>10.0f}{result['latency']['p50_ms']:>10.3f}"
+              f"{result['latency']['p99_ms']:>10.3f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark recognizers and gallery matching")
+    parser.add_argument("source", nargs="?",
+                        help="Directory of images or CSV file with username,image_path rows. "
+                             "Without it only the galleries are benchmarked")
+    parser.add_argument("--recognizers", nargs="+", default=RECOGNIZERS, choices=RECOGNIZERS)
+    parser.add_argument("--resolutions", type=int, nargs="+", default=[480, 960, 1920],
+                        help="Longest image side, in pixels, images are resized to")
+    parser.add_argument("--limit", type=int, help="Use at most this many images")
+    parser.add_argument("--repeat", type=int, default=1, help="Passes over the corpus per resolution")
+    parser.add_argument("--gallery-sizes", type=int, nargs="*", default=[1000, 10000, 100000, 1000000])
+    parser.add_argument("--gallery-dimensions", type=int, nargs="+", default=[128, 512],
+                        help="Encoding sizes; 128 is scored with euclidean, 512 with cosine")
+    parser.add_argument("--queries", type=int, default=200, help="Probes per gallery")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--baseline", help="Previous JSON results to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.10,
+                        help="Allowed p50 increase over the baseline, as a fraction")
+    args = parser.parse_args(argv)
+
+    report = {"environment": environment(), "recognizers": [], "galleries": []}
+
+    if args.source:
+        from src.tools.bulk_enroll import read_roster
+
+        paths = [path for _, path in read_roster(args.source)][:args.limit]
+        print(f"{len(paths)} images, resolutions {args.resolutions}")
+        report["corpus"] = {"source": args.source, "images": len(paths), "repeat": args.repeat}
+
+        # A fresh interpreter per recognizer: forked children would inherit the parent's peak RSS
+        context = multiprocessing.get_context("spawn")
+        for name in args.recognizers:
+            print(f"Running {name}...")
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                report["recognizers"].append(
+                    pool.submit(run_recognizer, name, paths, args.resolutions, args.repeat).result())
+
+    for dimensions in args.gallery_dimensions:
+        for size in args.gallery_sizes:
+            print(f"Gallery {size} x {dimensions}...")
+            report["galleries"].append(bench_gallery(size, dimensions, args.queries, args.seed))
+
+    print_report(report)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=4)
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            regressions = compare(report, json.load(f), args.max_regression)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) over {100 * args.max_regression:.0f}%:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print("\nNo regressions against the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,404 @@
+"""
+Load test for the /api/register and /api/verify endpoints.
+
+Replays a corpus of face images against a running API. Each request is a
+verification, or a registration with probability --register-ratio. The test
+runs one stage per --concurrency value, so the concurrency where latency
+collapses stands out. Registering a face that is already enrolled is
+answered with 409 and counted as rejected. For every stage it reports:
+- throughput
+- p50/p95/p99 latency
+- the outcome of every response: ok, rejected (4xx), shed (503) or error
+  (other 5xx, timeouts, connection failures)
+
+Without --rate the test is closed-loop: each client sends its next request as
+soon as the previous one returns. With --rate, requests arrive as a Poisson
+process at that rate and are handled by at most --concurrency clients.
+Latency is then measured from the scheduled arrival, so time spent waiting
+for a free client is included.
+
+--server starts main_api_dlib or main_api_if on a temporary database. That
+database is seeded with --gallery-size synthetic encodings, so matching runs
+against a gallery of realistic size. The models from the data folder are
+still used. Only the standard library, numpy and OpenCV are needed.
+
+Usage (from the FacialRecognition folder):
+    python -m benchmarks.load_test photos/ --server dlib --gallery-size 100000 --concurrency 1 4 16 64
+    python -m benchmarks.load_test photos/ --url http://127.0.0.1:8000 --rate 20 --duration 60
+"""
+import argparse
+import http.client
+import json
+import os
+import queue
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from typing import List, Optional, Tuple
+from urllib.parse import urlparse
+
+import cv2
+import numpy as np
+
+
+# Encoding size and per-component scale of the synthetic users of each server.
+# dlib encodings have a norm close to 1; InsightFace ones are compared by angle only
+SERVERS = {
+    "dlib": ("src.main_api_dlib", 128, 0.09),
+    "insightface": ("src.main_api_if", 512, 1.0),
+}
+
+SERVER_BOOTSTRAP = """
+import sys
+import uvicorn
+from src import config
+
+# Point the API at the seeded database before the app module reads the config
+config.DB_FILE = config.DB_FILE_IF = sys.argv[1]
+config.IMAGES_DIR = config.IMAGES_DIR_IF = sys.argv[2]
+module = __import__(sys.argv[3], fromlist=["app"])
+if module.app is None:
+    sys.exit(1)
+uvicorn.run(module.app, host="127.0.0.1", port=int(sys.argv[4]), log_level="warning")
+"""
+
+
+def percentiles(values_s) -> dict:
+    """
+    Summarizes latencies given in seconds as milliseconds.
+    """
+    values = np.asarray(values_s, dtype=np.float64) * 1000
+    if len(values) == 0:
+        return {}
+    return {
+        "p50_ms": float(np.percentile(values, 50)),
+        "p95_ms": float(np.percentile(values, 95)),
+        "p99_ms": float(np.percentile(values, 99)),
+        "max_ms": float(values.max()),
+    }
+
+
+def multipart_body(fields: dict, files: dict) -> Tuple[bytes, str]:
+    """
+    Encodes form fields and (filename, bytes) files as multipart/form-data.
+
+    Returns:
+        Tuple[bytes, str]: Request body and its Content-Type header
+    """
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    for name, (filename, data) in files.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                     f'Content-Type: image/jpeg\r\n\r\n'.encode() + data + b"\r\n")
+    parts.append(f"--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+def vary_image(image: np.ndarray, rng: random.Random) -> bytes:
+    """
+    Re-encodes an image with one pixel changed, so each request misses the
+    server's encoding cache like a fresh camera capture would.
+    """
+    image = image.copy()
+    y, x = rng.randrange(image.shape[0]), rng.randrange(image.shape[1])
+    image[y, x] = image[y, x] ^ 1
+    return cv2.imencode(".jpg", image)[1].tobytes()
+
+
+class LoadClient:
+    """
+    One keep-alive HTTP connection, reopened after any failure.
+    """
+
+    def __init__(self, host: str, port: int, timeout: float):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.connection = None
+
+    def post(self, path: str, body: bytes, content_type: str) -> int:
+        """
+        Sends a POST request and returns its status code, 0 on connection failure or timeout.
+        """
+        try:
+            if self.connection is None:
+                self.connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            self.connection.request("POST", path, body=body, headers={"Content-Type": content_type})
+            response = self.connection.getresponse()
+            response.read()
+            return response.status
+        except (OSError, http.client.HTTPException):
+            if self.connection is not None:
+                self.connection.close()
+            self.connection = None
+            return 0
+
+
+class LoadStage:
+    """
+    Runs one stage of the load test and collects its results.
+    """
+
+    def __init__(self, url: str, images: List[np.ndarray], concurrency: int, rate: Optional[float],
+                 duration: float, register_ratio: float, vary: bool, timeout: float, seed: int):
+        parsed = urlparse(url)
+        self.host = parsed.hostname
+        self.port = parsed.port or 80
+        self.images = images
+        self.concurrency = concurrency
+        self.rate = rate
+        self.duration = duration
+        self.register_ratio = register_ratio
+        self.vary = vary
+        self.timeout = timeout
+        self.seed = seed
+        self.payloads = [cv2.imencode(".jpg", image)[1].tobytes() for image in images]
+        self.results = []
+        self._lock = threading.Lock()
+        self._run_id = uuid.uuid4().hex[:8]
+        self._sequence = 0
+
+    def _next_request(self, rng: random.Random) -> Tuple[str, bytes, str]:
+        position = rng.randrange(len(self.images))
+        data = vary_image(self.images[position], rng) if self.vary else self.payloads[position]
+
+        if rng.random() < self.register_ratio:
+            with self._lock:
+                self._sequence += 1
+                username = f"load_{self._run_id}_{self._sequence}"
+            body, content_type = multipart_body({"username": username}, {"image": ("face.jpg", data)})
+            return "/api/register", body, content_type
+
+        body, content_type = multipart_body({}, {"image": ("face.jpg", data)})
+        return "/api/verify", body, content_type
+
+    def _send(self, client: LoadClient, request: Tuple[str, bytes, str], scheduled: float) -> None:
+        path, body, content_type = request
+        status = client.post(path, body, content_type)
+        finished = time.perf_counter()
+        with self._lock:
+            self.results.append((path, status, finished - scheduled, finished))
+
+    def _closed_loop(self, index: int, deadline: float) -> None:
+        client = LoadClient(self.host, self.port, self.timeout)
+        rng = random.Random(self.seed * 1000 + index)
+        while time.perf_counter() < deadline:
+            # Build the body first so JPEG encoding on the client is not timed
+            request = self._next_request(rng)
+            self._send(client, request, time.perf_counter())
+
+    def _open_loop(self, index: int, arrivals: "queue.Queue") -> None:
+        client = LoadClient(self.host, self.port, self.timeout)
+        rng = random.Random(self.seed * 1000 + index)
+        while True:
+            request = self._next_request(rng)
+            scheduled = arrivals.get()
+            if scheduled is None:
+                return
+            self._send(client, request, scheduled)
+
+    def run(self) -> dict:
+        start = time.perf_counter()
+        deadline = start + self.duration
+
+        if self.rate:
+            arrivals = queue.Queue()
+            threads = [threading.Thread(target=self._open_loop, args=(index, arrivals), daemon=True)
+                       for index in range(self.concurrency)]
+            for thread in threads:
+                thread.start()
+
+            rng = random.Random(self.seed)
+            scheduled = start
+            while True:
+                scheduled += rng.expovariate(self.rate)
+                if scheduled >= deadline:
+                    break
+                time.sleep(max(0.0, scheduled - time.perf_counter()))
+                arrivals.put(scheduled)
+            for _ in threads:
+                arrivals.put(None)
+        else:
+            threads = [threading.Thread(target=self._closed_loop, args=(index, deadline), daemon=True)
+                       for index in range(self.concurrency)]
+            for thread in threads:
+                thread.start()
+
+        for thread in threads:
+            thread.join()
+        return self.summary(time.perf_counter() - start)
+
+    def summary(self, elapsed: float) -> dict:
+        """
+        Aggregates the results of the stage, overall and per endpoint.
+        """
+        def describe(results) -> dict:
+            statuses = [status for _, status, _, _ in results]
+            ok_latencies = [latency for _, status, latency, _ in results if 200 <= status < 300]
+            total = len(results)
+            return {
+                "requests": total,
+                "throughput_rps": len(ok_latencies) / elapsed if elapsed > 0 else 0.0,
+                "ok": len(ok_latencies),
+                "rejected": sum(400 <= status < 500 for status in statuses),
+                "shed": sum(status == 503 for status in statuses),
+                "errors": sum(status == 0 or (status >= 500 and status != 503) for status in statuses),
+                "error_rate": (total - len(ok_latencies)) / total if total else 0.0,
+                "latency": percentiles(ok_latencies),
+            }
+
+        return {
+            "concurrency": self.concurrency,
+            "rate": self.rate,
+            "duration_s": elapsed,
+            **describe(self.results),
+            "endpoints": {path: describe([result for result in self.results if result[0] == path])
+                          for path in sorted({result[0] for result in self.results})},
+        }
+
+
+def seed_database(server: str, data_dir: str, gallery_size: int, seed: int) -> Tuple[str, str]:
+    """
+    Creates a database with `gallery_size` synthetic users for the server.
+
+    Returns:
+        Tuple[str, str]: Database file and images directory
+    """
+    from src.utils.db_factory import create_db_manager
+
+    _, dimensions, scale = SERVERS[server]
+    db_file = os.path.join(data_dir, "users_db.json")
+    images_dir = os.path.join(data_dir, "images")
+    os.makedirs(images_dir, exist_ok=True)
+
+    # Every synthetic user shares the same tiny profile image
+    placeholder = os.path.join(data_dir, "placeholder.jpg")
+    cv2.imwrite(placeholder, np.zeros((8, 8, 3), dtype=np.uint8))
+
+    db_manager = create_db_manager(db_file, images_dir)
+    db_manager.compact_every = sys.maxsize
+    rng = np.random.default_rng(seed)
+    batch = 10000
+    for offset in range(0, gallery_size, batch):
+        count = min(batch, gallery_size - offset)
+        encodings = rng.standard_normal((count, dimensions), dtype=np.float32) * scale
+        db_manager.save_users([(f"synthetic_{offset + i}", encoding, placeholder)
+                               for i, encoding in enumerate(encodings)])
+    db_manager.save_database()
+    return db_file, images_dir
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(server: str, db_file: str, images_dir: str, startup_timeout: float) -> Tuple[subprocess.Popen, str]:
+    """
+    Starts the API in a subprocess and waits until /api/health answers.
+
+    Returns:
+        Tuple[subprocess.Popen, str]: Server process and its base URL
+    """
+    module = SERVERS[server][0]
+    port = free_port()
+    project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    process = subprocess.Popen([sys.executable, "-c", SERVER_BOOTSTRAP, db_file, images_dir, module, str(port)],
+                               cwd=project_dir)
+
+    deadline = time.perf_counter() + startup_timeout
+    while time.perf_counter() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode}")
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+            connection.request("GET", "/api/health")
+            if connection.getresponse().status == 200:
+                return process, f"http://127.0.0.1:{port}"
+        except (OSError, http.client.HTTPException):
+            time.sleep(0.5)
+
+    process.terminate()
+    raise RuntimeError(f"Server not ready after {startup_timeout} s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the register and verify endpoints")
+    parser.add_argument("source", help="Directory of images or CSV file with username,image_path rows")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--url", help="Base URL of a running API, e.g. http://127.0.0.1:8000")
+    target.add_argument("--server", choices=sorted(SERVERS), help="Start this API on a seeded temporary database")
+    parser.add_argument("--gallery-size", type=int, default=1000, help="Synthetic users seeded with --server")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32],
+                        help="Concurrent clients; one stage per value")
+    parser.add_argument("--rate", type=float, help="Arrival rate in requests/s (open loop). Default is closed loop")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds per stage")
+    parser.add_argument("--register-ratio", type=float, default=0.1, help="Fraction of requests that register")
+    parser.add_argument("--no-vary", action="store_true",
+                        help="Send the corpus images unchanged; repeated images then hit the encoding cache")
+    parser.add_argument("--limit", type=int, help="Use at most this many images")
+    parser.add_argument("--timeout", type=float, default=30, help="Seconds before a request counts as an error")
+    parser.add_argument("--startup-timeout", type=float, default=300)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    from src.tools.bulk_enroll import read_roster
+    from src.utils.image_utils import ImageUtils
+
+    paths = [path for _, path in read_roster(args.source)][:args.limit]
+    images = [image for image in (ImageUtils.load_image(path) for path in paths) if image is not None]
+    if not images:
+        print("No images found")
+        return 1
+
+    process = None
+    data_dir = None
+    url = args.url
+    try:
+        if args.server:
+            data_dir = tempfile.mkdtemp(prefix="load_test_")
+            print(f"Seeding {args.gallery_size} synthetic users...")
+            db_file, images_dir = seed_database(args.server, data_dir, args.gallery_size, args.seed)
+            try:
+                process, url = start_server(args.server, db_file, images_dir, args.startup_timeout)
+            except RuntimeError as e:
+                print(f"Error starting the API: {e}")
+                return 1
+
+        stages = []
+        print(f"{'clients':>8}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+              f"{'ok':>8}{'rejected':>10}{'shed':>7}{'errors':>8}")
+        for concurrency in args.concurrency:
+            stage = LoadStage(url, images, concurrency, args.rate, args.duration,
+                              args.register_ratio, not args.no_vary, args.timeout, args.seed).run()
+            stages.append(stage)
+            latency = stage["latency"] or {"p50_ms": float("nan"), "p95_ms": float("nan"), "p99_ms": float("nan")}
+            print(f"{concurrency:>8}{stage['throughput_rps']:>9.2f}{latency['p50_ms']:>10.1f}"
+                  f"{latency['p95_ms']:>10.1f}{latency['p99_ms']:>10.1f}{stage['ok']:>8}"
+                  f"{stage['rejected']:>10}{stage['shed']:>7}{stage['errors']:>8}")
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+        if data_dir is not None:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"target": args.server or args.url, "gallery_size": args.gallery_size if args.server else None,
+                       "images": len(images), "register_ratio": args.register_ratio, "stages": stages}, f, indent=4)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
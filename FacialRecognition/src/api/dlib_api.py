@@ -1,13 +1,22 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException, Form
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, File, UploadFile, HTTPException, Form, WebSocket
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-import numpy as np
 import os
 import tempfile
-import shutil
+import numpy as np
+
+from typing import List, Optional
 
 from src.interfaces.face_recognizer import FaceRecognizer
+from src.interfaces.gallery_index import GalleryIndex
 from src.utils.db_manager import DBManager
+from src.utils.face_gallery import FaceGallery
+from src.api.inference_executor import InferenceExecutor
+from src.api.micro_batcher import MicroBatcher
+from src.api.stream_session import StreamSession
+from src.utils.metrics import metrics
+from src.utils import calibration
+from src import config
 
 
 class DlibAPI:
@@ -16,7 +25,9 @@ class DlibAPI:
     Provides endpoints for user registration and verification.
     """
 
-    def __init__(self, app: FastAPI, recognizer: FaceRecognizer, db_manager: DBManager):
+    def __init__(self, app: FastAPI, recognizer: FaceRecognizer, db_manager: DBManager,
+                 index: Optional[GalleryIndex] = None, executor: Optional[InferenceExecutor] = None,
+                 batcher: Optional[MicroBatcher] = None):
         """
         Initialize the API with FastAPI app and required components.
 
@@ -24,13 +35,38 @@ class DlibAPI:
             app: FastAPI application instance
             recognizer: Face recognizer implementation (HybridRecognizer or DlibCnnRecognizer)
             db_manager: Database manager for user data
+            index: Optional search index used to shortlist gallery candidates
+            executor: Worker pool for blocking inference. Default is a thread pool
+                      sharing the recognizer
+            batcher: Optional micro-batcher grouping concurrent requests into one
+                     batched descriptor computation
         """
         self.app = app
         self.recognizer = recognizer
         self.db_manager = db_manager
+        self.executor = executor or InferenceExecutor(recognizer)
+        self.batcher = batcher
+        self.app.add_event_handler("shutdown", self.executor.shutdown)
+        self.gallery = db_manager.register_gallery(FaceGallery(shortlist_size=config.TEMPLATE_SHORTLIST, index=index))
+        self._setup_metrics()
         self._setup_routes()
         self._setup_cors()
 
+    def _setup_metrics(self):
+        """Register the gauges read on every /metrics scrape and time the recognition endpoints."""
+        metrics.gauge("face_gallery_size", lambda: len(self.gallery))
+        metrics.gauge("inference_queue_depth", lambda: self.executor.queue_depth)
+        metrics.gauge("inference_in_flight", lambda: self.executor.in_flight)
+
+        timed_paths = {"/api/register", "/api/verify", "/api/identify"}
+
+        @self.app.middleware("http")
+        async def time_requests(request, call_next):
+            if request.url.path not in timed_paths:
+                return await call_next(request)
+            with metrics.timer(request.url.path, name="face_request_seconds", label="endpoint"):
+                return await call_next(request)
+
     def _setup_cors(self):
         """Configure CORS for the API."""
         self.app.add_middleware(
@@ -44,31 +80,45 @@ class DlibAPI:
     def _setup_routes(self):
         """Set up API endpoints."""
 
+        @self.app.get("/metrics")
+        async def get_metrics():
+            """
+            Per-stage latency histograms, cache and detector counters, gallery
+            size and queue depth in the Prometheus text format.
+            """
+            return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
         @self.app.post("/api/register")
-        async def register_user(username: str = Form(...), image: UploadFile = File(...)):
+        async def register_user(username: str = Form(...), image: List[UploadFile] = File(...)):
             """
             Register a new user with facial data.
 
             Args:
                 username: User identifier
-                image: User face image
+                image: User face image. Repeat the field to enroll several captures
+                       of the same person; their centroid and templates are stored
             """
             # Validate input
             self._validate_username(username)
 
-            # Process uploaded image
+            # Process uploaded images in memory
+            images_data = [await self._process_uploaded_image(upload)
+                           for upload in image[:config.MAX_ENROLL_TEMPLATES]]
+            face_encoding, templates = await self._extract_enrollment_features(images_data)
+            image_data = images_data[0]
+
+            # Check if face already exists
+            self._check_face_exists(face_encoding)
+
+            # The image only touches the disk when it has to be persisted
             temp_file = None
             try:
-                temp_file = await self._process_uploaded_image(image)
-                face_encoding = self._extract_facial_features(temp_file)
-
-                # Check if face already exists
-                self._check_face_exists(face_encoding)
+                temp_file = self._write_temp_image(image_data)
 
                 # Register user in database
-                self._save_user(username, face_encoding, temp_file)
+                self._save_user(username, face_encoding, temp_file, templates)
 
-                return self._create_successful_registration_response(username, face_encoding)
+                return self._create_successful_registration_response(username, face_encoding, templates)
             finally:
                 # Clean up temporary file
                 self._cleanup_temp_file(temp_file)
@@ -81,25 +131,48 @@ class DlibAPI:
             Args:
                 image: User face image to verify
             """
-            # Process uploaded image
-            temp_file = None
-            try:
-                temp_file = await self._process_uploaded_image(image)
-                face_encoding = self._extract_facial_features(temp_file)
+            # Process uploaded image in memory
+            image_data = await self._process_uploaded_image(image)
+            face_encoding = await self._extract_facial_features(image_data)
 
-                # Find matches in database
-                best_match, lowest_distance = self._find_best_match(face_encoding)
+            # Find matches in database
+            best_match, lowest_distance = self._find_best_match(face_encoding)
 
-                # Generate response based on result
-                return self._create_verification_response(best_match, lowest_distance)
-            finally:
-                # Clean up temporary file
-                self._cleanup_temp_file(temp_file)
+            # Generate response based on result
+            return self._create_verification_response(best_match, lowest_distance)
+
+        @self.app.post("/api/identify")
+        async def identify_faces(image: UploadFile = File(...)):
+            """
+            Identify every face in an image (group photos, door cameras).
+
+            Args:
+                image: Image with one or more faces
+            """
+            image_data = await self._process_uploaded_image(image)
+
+            # Detection runs once and all faces are encoded in one batch
+            faces = await self.executor.run("get_all_face_encodings", image_data)
+
+            return self._create_identification_response(faces)
 
         @self.app.get("/api/users")
         async def get_users():
             return self._get_user_list()
 
+        @self.app.websocket("/api/stream")
+        async def stream_recognition(websocket: WebSocket):
+            """
+            Continuous recognition over a stream of webcam frames.
+            Send each frame as a binary message with the encoded image; every
+            processed frame is answered with the tracked face box and identity.
+            """
+            session = StreamSession(
+                self._detect_stream_faces, self._encode_stream_face, self._identify_stream_face,
+                detect_every=config.STREAM_DETECT_EVERY, quality_gain=config.STREAM_QUALITY_GAIN
+            )
+            await session.serve(websocket)
+
     def _validate_username(self, username):
         if not username or not username.strip():
             raise HTTPException(status_code=400, detail="Nombre de usuario requerido")
@@ -108,70 +181,107 @@ class DlibAPI:
             raise HTTPException(status_code=409, detail="El usuario ya existe")
 
     async def _process_uploaded_image(self, image):
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".jpg") as temp:
-            temp_file = temp.name
-            shutil.copyfileobj(image.file, temp)
-            return temp_file
+        image_data = await image.read()
+        if not image_data:
+            raise HTTPException(status_code=400, detail="La imagen esta vacia")
+        return image_data
 
-    def _extract_facial_features(self, image_path):
-        face_encoding = self.recognizer.get_face_encoding(image_path)
+    def _write_temp_image(self, image_data):
+        with tempfile.NamedTemporaryFile(delete=False, suffix=".jpg") as temp:
+            temp.write(image_data)
+            return temp.name
+
+    async def _extract_facial_features(self, image_data):
+        # Recognizers decode the encoded bytes in memory; inference runs in the
+        # executor so the event loop keeps serving other requests
+        if self.batcher is not None:
+            face_encoding = await self.batcher.submit(image_data)
+        else:
+            face_encoding = await self.executor.run("get_face_encoding", image_data)
 
         if face_encoding is None:
             raise HTTPException(status_code=400, detail="No se detecto ningun rostro en la imagen")
 
         return face_encoding
 
-    def _check_face_exists(self, face_encoding):
-        for existing_username, user_data in self.db_manager.get_all_users().items():
-            stored_encoding = user_data["face_encoding"]
-            if isinstance(stored_encoding, list):
-                stored_encoding = np.array(stored_encoding)
-
-            # Calculate Euclidean distance
-            distance = np.linalg.norm(stored_encoding - face_encoding)
+    async def _extract_enrollment_features(self, images_data):
+        """
+        Encodes every enrollment capture. Returns the encoding to store and, for
+        several captures, the (T, D) templates; the stored encoding is then their centroid.
+        """
+        if len(images_data) == 1:
+            return await self._extract_facial_features(images_data[0]), None
+
+        encodings = await self.executor.run("get_face_encodings_batch", images_data)
+        encodings = [encoding for encoding in encodings if encoding is not None]
+        if not encodings:
+            raise HTTPException(status_code=400, detail="No se detecto ningun rostro en las imagenes")
+        if len(encodings) == 1:
+            return encodings[0], None
+
+        templates = np.stack(encodings)
+        face_encoding = self.gallery.centroid(templates)
+
+        # Every capture must be close to the centroid, otherwise the images show different people
+        spread = np.linalg.norm(templates - face_encoding, axis=1)
+        if float(spread.max()) > self.recognizer.default_tolerance:
+            raise HTTPException(status_code=400, detail="Las imagenes no corresponden a la misma persona")
+
+        return face_encoding, templates
+
+    async def _detect_stream_faces(self, frame):
+        return await self.executor.run("detect_faces", frame)
+
+    async def _encode_stream_face(self, face_image, box):
+        # The tracker already located the face: landmarks and descriptor only, no detection
+        return await self.executor.run("get_face_encoding_at", face_image, box)
+
+    def _identify_stream_face(self, face_encoding):
+        best_match, match_distance = self._find_best_match(face_encoding)
+        found = best_match is not None and match_distance <= self.recognizer.default_tolerance
+        return {
+            "found": bool(found),
+            "username": best_match if found else None,
+            "distance": float(match_distance) if best_match is not None else None
+        }
 
-            # If distance is less than threshold, face already exists
-            if distance <= self.recognizer.default_tolerance:
-                raise HTTPException(
-                    status_code=409,
-                    detail=f"Este rostro ya esta registrado con el nombre de usuario '{existing_username}'"
-                )
+    def _check_face_exists(self, face_encoding):
+        with metrics.timer("gallery_sync"):
+            self.db_manager.sync_galleries()
+        with metrics.timer("match"):
+            existing_username, distance = self.gallery.best_match(face_encoding)
+
+        # If distance is less than threshold, face already exists
+        if existing_username and distance <= self.recognizer.default_tolerance:
+            raise HTTPException(
+                status_code=409,
+                detail=f"Este rostro ya esta registrado con el nombre de usuario '{existing_username}'"
+            )
 
-    def _save_user(self, username, face_encoding, image_path):
-        success = self.db_manager.save_user(username, face_encoding, image_path)
+    def _save_user(self, username, face_encoding, image_path, templates=None):
+        with metrics.timer("save_user"):
+            success = self.db_manager.save_user(username, face_encoding, image_path, templates)
 
         if not success:
             raise HTTPException(status_code=500, detail="Error al guardar el usuario en la base de datos")
 
-    def _create_successful_registration_response(self, username, face_encoding):
+    def _create_successful_registration_response(self, username, face_encoding, templates=None):
         return JSONResponse(
             status_code=201,
             content={
                 "message": "Usuario registrado correctamente",
                 "username": username,
-                "dimensions": len(face_encoding)
+                "dimensions": len(face_encoding),
+                "templates": len(templates) if templates is not None else 1
             }
         )
 
     def _find_best_match(self, face_encoding):
-        best_match = None
-        lowest_distance = float('inf')
-
-        # Check all users
-        for username, user_data in self.db_manager.get_all_users().items():
-            stored_encoding = user_data["face_encoding"]
-            if isinstance(stored_encoding, list):
-                stored_encoding = np.array(stored_encoding)
-
-            # Calculate Euclidean distance
-            distance = np.linalg.norm(stored_encoding - face_encoding)
-
-            # Update best match
-            if distance < lowest_distance:
-                lowest_distance = distance
-                best_match = username
-
-        return best_match, lowest_distance
+        with metrics.timer("gallery_sync"):
+            self.db_manager.sync_galleries()
+        # Score the whole gallery with one batched Euclidean distance computation
+        with metrics.timer("match"):
+            return self.gallery.best_match(face_encoding)
 
     def _create_verification_response(self, best_match, match_distance):
         tolerance = self.recognizer.default_tolerance
@@ -188,13 +298,9 @@ class DlibAPI:
             # Calculate confidence level (0-100%)
             confidence = max(0, min(100, (1 - match_distance / tolerance) * 100))
 
-            # Determine security level
-            if confidence > 95:
-                security_level = "ALTO"
-            elif confidence > 85:
-                security_level = "MEDIO"
-            else:
-                security_level = "BAJO"
+            # Determine security level, from calibrated distances when available
+            security_level = calibration.security_level(match_distance, confidence,
+                                                        getattr(self.recognizer, "security_levels", None))
 
             return JSONResponse(
                 content={
@@ -219,6 +325,34 @@ class DlibAPI:
                 }
             )
 
+    def _create_identification_response(self, faces):
+        with metrics.timer("gallery_sync"):
+            self.db_manager.sync_galleries()
+        tolerance = self.recognizer.default_tolerance
+
+        # All faces are matched against the gallery with one matrix product
+        with metrics.timer("match"):
+            matches = self.gallery.best_matches([face_encoding for _, face_encoding in faces])
+
+        results = []
+        for ((top, right, bottom, left), _), (best_match, match_distance) in zip(faces, matches):
+            found = best_match is not None and match_distance <= tolerance
+            results.append({
+                "box": {"top": int(top), "right": int(right), "bottom": int(bottom), "left": int(left)},
+                "found": bool(found),
+                "username": best_match if found else None,
+                "distance": float(match_distance) if best_match is not None else None,
+                "confidence": float(max(0, min(100, (1 - match_distance / tolerance) * 100))) if found else 0.0
+            })
+
+        return JSONResponse(
+            content={
+                "count": len(results),
+                "tolerance": float(tolerance),
+                "faces": results
+            }
+        )
+
     def _get_user_list(self):
         users = self.db_manager.get_all_users()
         return JSONResponse(
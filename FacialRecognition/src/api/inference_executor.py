@@ -0,0 +1,188 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Optional
+
+from fastapi import HTTPException
+
+from src.interfaces.face_recognizer import FaceRecognizer
+from src.utils.metrics import metrics
+
+
+# Recognizer owned by each worker process of a process-mode executor
+_worker_recognizer = None
+
+
+def _init_worker(recognizer_factory: Callable[[], FaceRecognizer]) -> None:
+    """
+    Loads the models once in every worker process.
+    """
+    global _worker_recognizer
+    # Forked workers start with a copy of the parent's metrics; only new values travel back
+    metrics.reset()
+    _worker_recognizer = recognizer_factory()
+
+
+def _call_worker_recognizer(method_name: str, *args):
+    # Metrics recorded in the worker travel back with the result
+    return getattr(_worker_recognizer, method_name)(*args), metrics.take_delta()
+
+
+class InferenceExecutor:
+    """
+    Runs blocking recognizer calls outside the FastAPI event loop.
+
+    Modes:
+    - "thread": a thread pool sharing the given recognizer. Use it for backends that
+      release the GIL during inference (InsightFace/ONNX Runtime)
+    - "process": a process pool where each worker builds its own recognizer with
+      `recognizer_factory`. Use it for backends that hold the GIL (dlib)
+
+    At most `max_workers + max_queue` calls are accepted at once; beyond that
+    requests fail fast with 503 and a Retry-After header instead of piling up.
+    Requests waiting in a MicroBatcher reserve a slot and count toward the same limit.
+
+    If a worker process dies, the broken pool is replaced and the affected calls
+    get a 503, so later requests are served by fresh workers.
+    """
+
+    MODES = ("thread", "process")
+
+    def __init__(self, recognizer: Optional[FaceRecognizer] = None, mode: str = "thread",
+                 max_workers: Optional[int] = None, max_queue: int = 32, retry_after: int = 1,
+                 recognizer_factory: Optional[Callable[[], FaceRecognizer]] = None):
+        """
+        Initializes the executor. Worker pools are created on first use.
+
+        Args:
+            recognizer (Optional[FaceRecognizer]): Recognizer shared by the threads in thread mode
+            mode (str): "thread" or "process"
+            max_workers (Optional[int]): Pool size. Default is the number of CPU cores
+            max_queue (int): Calls allowed to wait for a free worker
+            retry_after (int): Seconds sent in the Retry-After header when overloaded
+            recognizer_factory (Optional[Callable[[], FaceRecognizer]]): Picklable callable
+                that builds a recognizer, required in process mode
+        """
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown inference mode '{mode}', expected one of {self.MODES}")
+        if mode == "thread" and recognizer is None:
+            raise ValueError("Thread mode requires a recognizer")
+        if mode == "process" and recognizer_factory is None:
+            raise ValueError("Process mode requires a recognizer_factory")
+
+        self.recognizer = recognizer
+        self.mode = mode
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self.recognizer_factory = recognizer_factory
+        self.in_flight = 0
+        self.reserved = 0
+        self._pool = None
+
+    @property
+    def queue_depth(self) -> int:
+        """
+        Returns the number of calls waiting for a free worker.
+        """
+        return max(0, self.in_flight - self.max_workers)
+
+    def _get_pool(self):
+        if self._pool is None:
+            if self.mode == "process":
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    initializer=_init_worker,
+                    initargs=(self.recognizer_factory,)
+                )
+            else:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                thread_name_prefix="inference")
+        return self._pool
+
+    def _unavailable(self, detail: str) -> HTTPException:
+        return HTTPException(status_code=503, detail=detail, headers={"Retry-After": str(self.retry_after)})
+
+    def reserve(self) -> None:
+        """
+        Takes a slot for a request that waits outside the pool, e.g. in a MicroBatcher.
+        Release it with release() once the request has its result.
+
+        Errors:
+            HTTPException: 503 with Retry-After when the queue is full
+        """
+        if self.in_flight + self.reserved >= self.max_workers + self.max_queue:
+            raise self._unavailable("Servidor ocupado, intente nuevamente")
+        self.reserved += 1
+
+    def release(self) -> None:
+        self.reserved -= 1
+
+    def _discard_pool(self, pool) -> None:
+        """
+        Drops a pool whose worker process died; the next call starts a new one.
+        """
+        if self._pool is pool:
+            print("Inference worker died, restarting the worker pool")
+            self._pool = None
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    async def run(self, method_name: str, *args, reserved: bool = False):
+        """
+        Calls a recognizer method in the worker pool and waits for the result.
+
+        Args:
+            method_name (str): Name of the FaceRecognizer method, e.g. "get_face_encoding"
+            *args: Arguments for the method; they must be picklable in process mode
+            reserved (bool): The requests behind this call already hold slots taken with reserve()
+
+        Errors:
+            HTTPException: 503 with Retry-After when the queue is full or a worker process died
+        """
+        if not reserved and self.in_flight + self.reserved >= self.max_workers + self.max_queue:
+            raise self._unavailable("Servidor ocupado, intente nuevamente")
+
+        self.in_flight += 1
+        pool = self._get_pool()
+        try:
+            loop = asyncio.get_running_loop()
+            with metrics.timer("inference"):
+                if self.mode == "process":
+                    result, delta = await loop.run_in_executor(pool, _call_worker_recognizer, method_name, *args)
+                    metrics.merge(delta)
+                    return result
+                return await loop.run_in_executor(pool, getattr(self.recognizer, method_name), *args)
+        except BrokenProcessPool:
+            self._discard_pool(pool)
+            raise self._unavailable("Servicio de reconocimiento reiniciandose, intente nuevamente")
+        finally:
+            self.in_flight -= 1
+
+    async def warm_up(self) -> None:
+        """
+        Starts the worker pool and runs the recognizer warm-up in it, so workers
+        load their models before the server accepts requests. Registered as a
+        startup handler: it runs in every server worker after forking, because a
+        pool created before the fork would not survive it.
+        """
+        loop = asyncio.get_running_loop()
+        pool = self._get_pool()
+        if self.mode == "process":
+            # One call per worker; concurrent calls make the pool start every process
+            results = await asyncio.gather(*[
+                loop.run_in_executor(pool, _call_worker_recognizer, "warm_up")
+                for _ in range(self.max_workers)
+            ])
+            for _, delta in results:
+                metrics.merge(delta)
+        else:
+            await loop.run_in_executor(pool, self.recognizer.warm_up)
+
+    def shutdown(self) -> None:
+        """
+        Stops the worker pool.
+        """
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
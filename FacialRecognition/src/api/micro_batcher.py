@@ -0,0 +1,91 @@
+import asyncio
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from src.api.inference_executor import InferenceExecutor
+
+
+class MicroBatcher:
+    """
+    Groups concurrent encoding requests into batches.
+    Requests are collected until `max_batch_size` images are waiting or the oldest
+    one has waited `max_wait_ms`; the batch is then encoded with one
+    get_face_encodings_batch call in the executor and each result is handed back
+    to the request that submitted it.
+
+    Every waiting request holds a slot of the executor, so a burst beyond
+    `max_workers + max_queue` requests gets 503 instead of growing the queue.
+    """
+
+    def __init__(self, executor: InferenceExecutor, max_batch_size: int = 16, max_wait_ms: float = 5.0):
+        """
+        Initializes the batcher.
+
+        Args:
+            executor (InferenceExecutor): Executor that runs the batched inference
+            max_batch_size (int): Maximum number of images per batch
+            max_wait_ms (float): Maximum time a request waits for the batch to fill up
+        """
+        self.executor = executor
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self._pending: List[Tuple[bytes, asyncio.Future]] = []
+        self._flush_handle = None
+
+    async def submit(self, image_data) -> Optional[np.ndarray]:
+        """
+        Queues an image for the next batch and waits for its encoding.
+
+        Args:
+            image_data: Encoded image bytes or an input accepted by the recognizer
+
+        Returns:
+            Optional[np.ndarray]: Face encoding, None if no face was detected
+
+        Errors:
+            HTTPException: 503 with Retry-After when the executor is full
+        """
+        self.executor.reserve()
+        try:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._pending.append((image_data, future))
+
+            if len(self._pending) >= self.max_batch_size:
+                self._flush()
+            elif self._flush_handle is None:
+                self._flush_handle = loop.call_later(self.max_wait_ms / 1000, self._flush)
+
+            return await future
+        finally:
+            self.executor.release()
+
+    def _flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        batch = self._pending[:self.max_batch_size]
+        self._pending = self._pending[self.max_batch_size:]
+        if batch:
+            asyncio.ensure_future(self._run_batch(batch))
+
+        # Requests that arrived beyond a full batch start a new wait window
+        if self._pending:
+            loop = asyncio.get_running_loop()
+            self._flush_handle = loop.call_later(self.max_wait_ms / 1000, self._flush)
+
+    async def _run_batch(self, batch: List[Tuple[bytes, asyncio.Future]]) -> None:
+        images = [image_data for image_data, _ in batch]
+        try:
+            encodings = await self.executor.run("get_face_encodings_batch", images, reserved=True)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), encoding in zip(batch, encodings):
+            if not future.done():
+                future.set_result(encoding)
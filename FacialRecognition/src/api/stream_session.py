@@ -0,0 +1,177 @@
+import asyncio
+import cv2
+import numpy as np
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, WebSocket, WebSocketDisconnect
+
+from src.api.face_tracker import Box, FaceTracker, box_iou, face_quality
+from src.utils.image_utils import ImageUtils
+
+
+class StreamSession:
+    """
+    Recognition state of one streaming (WebSocket) connection.
+
+    The client sends encoded frames (JPEG/PNG bytes) as binary messages and gets
+    one JSON result per processed frame:
+    - Full detection runs every `detect_every` frames, or when the tracker loses the face
+    - In between, the face box is followed with template matching
+    - The face is encoded only when a new face appears or the crop quality
+      (size and sharpness) improves by `quality_gain` over the last encoded crop
+
+    Frames that arrive while one is being processed are replaced by the newest
+    one, so results stay at camera rate instead of falling behind.
+    """
+
+    def __init__(self, detect: Callable[[np.ndarray], Awaitable[List[Box]]],
+                 encode: Callable[[np.ndarray, Box], Awaitable[Optional[np.ndarray]]],
+                 identify: Callable[[np.ndarray], Dict],
+                 detect_every: int = 5, quality_gain: float = 0.15, crop_margin: float = 0.5):
+        """
+        Args:
+            detect: Coroutine returning the (top, right, bottom, left) face boxes of a BGR frame
+            encode: Coroutine returning the encoding of a BGR face crop given the face box
+                    in crop pixels, None if no face
+            identify: Matches an encoding against the gallery and returns the identity fields
+            detect_every (int): Frames between full detections
+            quality_gain (float): Relative quality improvement that triggers a new encoding
+            crop_margin (float): Context kept around the box when cropping for encoding
+        """
+        self.detect = detect
+        self.encode = encode
+        self.identify = identify
+        self.detect_every = max(1, detect_every)
+        self.quality_gain = quality_gain
+        self.crop_margin = crop_margin
+        self.tracker = FaceTracker()
+        self.frame_index = 0
+        self.dropped = 0
+        self.detections = 0
+        self.encodings = 0
+        self.last_box: Optional[Box] = None
+        self.identity: Optional[Dict] = None
+        self.best_quality = 0.0
+
+    def _forget_face(self) -> None:
+        self.identity = None
+        self.best_quality = 0.0
+
+    def _face_crop(self, frame: np.ndarray, box: Box) -> Tuple[np.ndarray, Box]:
+        """
+        Returns the region around the face and the face box in crop pixels. Only
+        the crop is sent for encoding, so the whole frame is not copied to a worker.
+        """
+        top, right, bottom, left = box
+        pad = int(self.crop_margin * max(bottom - top, right - left))
+        h, w = frame.shape[:2]
+        y0, x0 = max(0, top - pad), max(0, left - pad)
+        crop = np.ascontiguousarray(frame[y0:min(h, bottom + pad), x0:min(w, right + pad)])
+        return crop, (top - y0, right - x0, bottom - y0, left - x0)
+
+    async def process(self, frame: np.ndarray) -> Dict:
+        """
+        Processes one BGR frame.
+
+        Returns:
+            Dict: Frame number, face box, whether it was tracked or detected, whether
+                  it was encoded and the current identity
+        """
+        self.frame_index += 1
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+        box = None
+        if self.frame_index % self.detect_every != 0:
+            box = self.tracker.update(gray)
+
+        detected = box is None
+        if detected:
+            boxes = await self.detect(frame)
+            self.detections += 1
+            if not boxes:
+                self.last_box = None
+                self.tracker.box = None
+                self._forget_face()
+                return {"frame": self.frame_index, "face": None}
+
+            box = tuple(int(value) for value in max(boxes, key=lambda b: (b[1] - b[3]) * (b[2] - b[0])))
+            # A box far from the previous one is a different face
+            if self.last_box is None or box_iou(box, self.last_box) < 0.3:
+                self._forget_face()
+            self.tracker.reset(gray, box)
+
+        self.last_box = box
+        quality = face_quality(gray, box)
+        encoded = False
+        if quality > self.best_quality * (1 + self.quality_gain) or (self.identity is None and detected):
+            self.best_quality = max(self.best_quality, quality)
+            encoding = await self.encode(*self._face_crop(frame, box))
+            self.encodings += 1
+            if encoding is not None:
+                self.identity = self.identify(encoding)
+                encoded = True
+
+        return {
+            "frame": self.frame_index,
+            "face": {"top": box[0], "right": box[1], "bottom": box[2], "left": box[3]},
+            "tracked": not detected,
+            "encoded": encoded,
+            "quality": round(quality, 2),
+            **(self.identity or {"found": False, "username": None})
+        }
+
+    async def serve(self, websocket: WebSocket) -> None:
+        """
+        Runs the session until the client disconnects.
+        """
+        await websocket.accept()
+        latest = {"frame": None, "closed": False}
+        ready = asyncio.Event()
+
+        async def receive_frames():
+            try:
+                while True:
+                    message = await websocket.receive()
+                    if message["type"] == "websocket.disconnect":
+                        break
+                    data = message.get("bytes")
+                    if data is None:
+                        continue
+                    if latest["frame"] is not None:
+                        self.dropped += 1
+                    latest["frame"] = data
+                    ready.set()
+            finally:
+                latest["closed"] = True
+                ready.set()
+
+        receiver = asyncio.create_task(receive_frames())
+        try:
+            while True:
+                await ready.wait()
+                ready.clear()
+                if latest["closed"]:
+                    break
+
+                data, latest["frame"] = latest["frame"], None
+                if data is None:
+                    continue
+
+                frame = ImageUtils.decode_image(data)
+                if frame is None:
+                    await websocket.send_json({"error": "No se pudo decodificar el frame"})
+                    continue
+
+                try:
+                    result = await self.process(frame)
+                except HTTPException as e:
+                    # Busy executor: skip this frame, the next one will be tried
+                    result = {"frame": self.frame_index, "error": e.detail}
+
+                result["dropped"] = self.dropped
+                await websocket.send_json(result)
+        except (WebSocketDisconnect, RuntimeError):
+            # The client went away while a result was being sent
+            pass
+        finally:
+            receiver.cancel()
@@ -15,4 +15,81 @@ CNN_DETECTOR_PATH = os.path.join(MODELS_DIR, "mmod_human_face_detector.dat")
 # IF paths
 MODELS_DIR_IF = os.path.join(DATA_DIR, "models_IF")
 IMAGES_DIR_IF = os.path.join(DATA_DIR, "images_IF")
-DB_FILE_IF = os.path.join(DATA_DIR, "users_db_IF.json")
\ No newline at end of file
+DB_FILE_IF = os.path.join(DATA_DIR, "users_db_IF.json")
+
+# Thresholds tuned by src/tools/calibrate_threshold.py. Recognizers use their
+# built-in tolerances when the file is missing or has no entry for them
+CALIBRATION_FILE = os.path.join(DATA_DIR, "calibration.json")
+# Built-in tolerances (maximum match distance) of each recognizer
+DEFAULT_TOLERANCES = {"hybrid": 0.49, "cnn": 0.49, "dlib": 0.6, "face_recognition": 0.6, "insightface": 0.49}
+
+# Database backend
+# "json" rewrites a single JSON file, "binary" appends to a memory-mapped float32
+# file plus a metadata sidecar (see src/tools/migrate_json_to_binary.py) and
+# "sqlite" uses a WAL-mode SQLite file that several API workers can share
+DB_BACKEND = "json"
+
+# Matching index
+# "exact" scans the whole gallery, "ivf" uses the NumPy IVF-flat index and
+# "hnsw" uses hnswlib (optional dependency). Indexes are stored next to the DB file.
+# "int8", "float16" and "pca" prefilter with a reduced-precision copy of the gallery
+# and re-rank the shortlist at full precision. "pca" is the fastest under NumPy;
+# "int8" and "float16" mainly cut the memory scanned per query
+MATCH_INDEX = "exact"
+INDEX_MIN_SIZE = 5000  # Galleries smaller than this are always scanned exactly
+IVF_N_PROBE = 8  # Lists visited per query, higher = better recall but slower
+HNSW_EF_SEARCH = 64  # Candidates explored per query, higher = better recall but slower
+QUANTIZED_SHORTLIST = 256  # Rows re-ranked at full precision after the quantized scan
+PCA_DIMENSIONS = None  # Projection size of the "pca" prefilter, None = a quarter of the encoding size
+
+# Inference executor
+# "thread" shares one recognizer between threads (backends that release the GIL,
+# like ONNX Runtime); "process" loads one recognizer per worker process (dlib)
+INFERENCE_MODE_DLIB = "process"
+INFERENCE_MODE_IF = "thread"
+INFERENCE_WORKERS = os.cpu_count() or 1
+INFERENCE_MAX_QUEUE = 32  # Requests waiting for a worker before answering 503
+INFERENCE_RETRY_AFTER = 1  # Seconds sent in the Retry-After header
+
+# InsightFace micro-batching: concurrent requests are encoded together, waiting at
+# most IF_BATCH_MAX_WAIT_MS for up to IF_BATCH_MAX_SIZE images
+IF_BATCHING = True
+IF_BATCH_MAX_SIZE = 16
+IF_BATCH_MAX_WAIT_MS = 5
+
+# dlib micro-batching: HOG detection still runs per image, only the ResNet
+# descriptors are batched, so it is off by default
+DLIB_BATCHING = False
+DLIB_BATCH_MAX_SIZE = 8
+DLIB_BATCH_MAX_WAIT_MS = 5
+
+# Encoding cache keyed by image content; repeated images skip detection and encoding
+ENCODING_CACHE = True
+ENCODING_CACHE_SIZE = 10000  # Entries kept in memory
+ENCODING_CACHE_TTL = 3600  # Seconds, None to never expire
+ENCODING_CACHE_DIR = None  # Directory for a disk-backed cache shared by workers, None for memory only
+
+# InsightFace modules loaded from the buffalo_l pack; add "landmark_2d_106",
+# "landmark_3d_68" or "genderage" only if their outputs are used
+IF_ALLOWED_MODULES = ["detection", "recognition"]
+# Longest image side used for InsightFace detection; images are downscaled to it and
+# boxes are mapped back to full resolution. 320 is enough for close-up selfies
+# (see benchmarks/bench_det_size.py)
+IF_DET_SIZE = 640
+
+# Multi-template enrollment: /api/register accepts several captures of one person.
+# Users are matched by their centroid first, then the TEMPLATE_SHORTLIST closest
+# users are re-scored against every one of their captures
+MAX_ENROLL_TEMPLATES = 10
+TEMPLATE_SHORTLIST = 10
+
+# Streaming recognition (/api/stream WebSocket)
+STREAM_DETECT_EVERY = 5  # Frames between full detections; the face is tracked in between
+STREAM_QUALITY_GAIN = 0.15  # Re-encode when the face crop gets this much larger/sharper
+
+# Startup
+# Run a synthetic inference before the server accepts requests, so the first
+# request doesn't pay for lazy model initialization
+STARTUP_WARMUP = True
+# Freeze startup objects for copy-on-write sharing with forked workers (gunicorn --preload)
+STARTUP_GC_FREEZE = True
@@ -0,0 +1,130 @@
+import os
+import numpy as np
+from typing import Optional
+
+from src.interfaces.gallery_index import GalleryIndex
+
+
+class HNSWIndex(GalleryIndex):
+    """
+    Graph-based index backed by hnswlib (optional dependency).
+    `ef_search` is the recall-vs-latency knob: the size of the candidate list
+    explored per query. Higher values give better recall at a higher cost.
+    """
+
+    def __init__(self, index_path: Optional[str] = None, ef_search: int = 64,
+                 ef_construction: int = 200, m: int = 16, shortlist_size: int = 32,
+                 min_train_size: int = 5000, save_every: int = 100):
+        """
+        Initializes the HNSW index.
+
+        Args:
+            index_path (Optional[str]): File where the hnswlib graph is persisted
+            ef_search (int): Candidate list size explored per query
+            ef_construction (int): Candidate list size used while inserting
+            m (int): Number of graph links per element
+            shortlist_size (int): Rows returned per query for exact re-scoring
+            min_train_size (int): Gallery size from which the graph is built;
+                                  smaller galleries are scanned exactly
+            save_every (int): Save the graph after this many incremental insertions
+
+        Errors:
+            ImportError: If hnswlib is not installed
+        """
+        # Import hnswlib here to avoid dependency issues if not installed
+        import hnswlib
+
+        self._hnswlib = hnswlib
+        self.index_path = index_path
+        self.ef_search = ef_search
+        self.ef_construction = ef_construction
+        self.m = m
+        self.shortlist_size = shortlist_size
+        self.min_train_size = min_train_size
+        self.save_every = save_every
+
+        self._index = None
+        self._unsaved = 0
+
+    @property
+    def is_trained(self) -> bool:
+        return self._index is not None
+
+    def _create(self, dimensions: int, capacity: int):
+        index = self._hnswlib.Index(space="l2", dim=dimensions)
+        index.init_index(max_elements=capacity, ef_construction=self.ef_construction, M=self.m)
+        index.set_ef(self.ef_search)
+        return index
+
+    def attach(self, encodings: np.ndarray) -> None:
+        if self.index_path and os.path.exists(self.index_path):
+            try:
+                index = self._hnswlib.Index(space="l2", dim=encodings.shape[1])
+                index.load_index(self.index_path, max_elements=max(1, 2 * len(encodings)))
+                index.set_ef(self.ef_search)
+                if index.get_current_count() <= len(encodings):
+                    self._index = index
+                    self._insert(encodings, np.arange(index.get_current_count(), len(encodings)))
+                    return
+            except Exception as e:
+                print(f"Error reading HNSW index: {e}")
+
+        if len(encodings) >= self.min_train_size:
+            self.build(encodings)
+
+    def build(self, encodings: np.ndarray) -> None:
+        """
+        Builds the graph from every gallery row.
+
+        Args:
+            encodings (np.ndarray): (N, D) matrix with every gallery row
+        """
+        self._index = self._create(encodings.shape[1], max(1, 2 * len(encodings)))
+        self._insert(encodings, np.arange(len(encodings)))
+        self.save()
+
+    def _insert(self, encodings: np.ndarray, rows: np.ndarray) -> None:
+        if len(rows) == 0:
+            return
+
+        required = int(rows.max()) + 1
+        if required > self._index.get_max_elements():
+            self._index.resize_index(2 * required)
+
+        # hnswlib updates the vector in place when a label already exists
+        self._index.add_items(encodings[rows], rows)
+
+    def add(self, row: int, encodings: np.ndarray) -> None:
+        if not self.is_trained:
+            if len(encodings) >= self.min_train_size:
+                self.build(encodings)
+            return
+
+        self._insert(encodings, np.array([row]))
+
+        self._unsaved += 1
+        if self._unsaved >= self.save_every:
+            self.save()
+
+    def candidates(self, query: np.ndarray, k: int = 1) -> Optional[np.ndarray]:
+        if not self.is_trained:
+            return None
+
+        count = min(max(k, self.shortlist_size), self._index.get_current_count())
+        self._index.set_ef(max(self.ef_search, count))
+        labels, _ = self._index.knn_query(query, k=count)
+        return labels[0].astype(np.int64)
+
+    def save(self) -> bool:
+        if not self.index_path or not self.is_trained:
+            return False
+
+        try:
+            temp_path = f"{self.index_path}.tmp"
+            self._index.save_index(temp_path)
+            os.replace(temp_path, self.index_path)
+            self._unsaved = 0
+            return True
+        except Exception as e:
+            print(f"Error saving HNSW index: {e}")
+            return False
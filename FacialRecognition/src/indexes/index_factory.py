@@ -0,0 +1,64 @@
+import os
+from typing import Optional
+
+from src.interfaces.gallery_index import GalleryIndex
+from src import config
+
+
+def get_index_path(db_file: str, suffix: str) -> str:
+    """
+    Returns the path of an index file stored next to a database file.
+
+    Args:
+        db_file (str): Path to the user database file
+        suffix (str): Suffix replacing the database file extension
+    """
+    return f"{os.path.splitext(db_file)[0]}.{suffix}"
+
+
+def create_gallery_index(db_file: str, kind: Optional[str] = None) -> Optional[GalleryIndex]:
+    """
+    Creates the search index configured for a gallery.
+
+    Args:
+        db_file (str): Path to the user database file the gallery is loaded from
+        kind (Optional[str]): "exact", "ivf", "hnsw", "int8", "float16" or "pca".
+                              Default is config.MATCH_INDEX
+
+    Returns:
+        Optional[GalleryIndex]: Index instance, None for an exact scan
+    """
+    kind = kind or config.MATCH_INDEX
+
+    if kind == "ivf":
+        from src.indexes.ivf_flat_index import IVFFlatIndex
+        return IVFFlatIndex(
+            index_path=get_index_path(db_file, "ivf.npz"),
+            n_probe=config.IVF_N_PROBE,
+            min_train_size=config.INDEX_MIN_SIZE
+        )
+
+    if kind == "hnsw":
+        try:
+            from src.indexes.hnsw_index import HNSWIndex
+            return HNSWIndex(
+                index_path=get_index_path(db_file, "hnsw.bin"),
+                ef_search=config.HNSW_EF_SEARCH,
+                min_train_size=config.INDEX_MIN_SIZE
+            )
+        except ImportError:
+            print("hnswlib is not installed, using exact search")
+            return None
+
+    if kind in ("int8", "float16", "pca"):
+        from src.indexes.quantized_index import QuantizedIndex
+        return QuantizedIndex(
+            precision=kind,
+            shortlist_size=config.QUANTIZED_SHORTLIST,
+            pca_dimensions=config.PCA_DIMENSIONS,
+            min_train_size=config.INDEX_MIN_SIZE
+        )
+
+    if kind != "exact":
+        print(f"Unknown match index '{kind}', using exact search")
+    return None
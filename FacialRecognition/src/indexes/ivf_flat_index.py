@@ -0,0 +1,254 @@
+import os
+import numpy as np
+from typing import List, Optional
+
+from src.interfaces.gallery_index import GalleryIndex
+
+
+class IVFFlatIndex(GalleryIndex):
+    """
+    Inverted-file index implemented in NumPy.
+    Gallery rows are clustered with k-means into `n_lists` lists; a query only
+    visits the `n_probe` lists whose centroids are closest, so the number of rows
+    scored grows with N / n_lists * n_probe instead of N.
+
+    `n_probe` is the recall-vs-latency knob: 1 is fastest, `n_lists` is an exact scan.
+
+    The persisted index keeps a signature of every row (a random projection of
+    its encoding). On load, rows whose encoding changed or moved, e.g. after a
+    backend reinserted a re-registered user, are assigned again; if most of the
+    gallery changed, the index is retrained.
+    """
+
+    def __init__(self, index_path: Optional[str] = None, n_lists: Optional[int] = None,
+                 n_probe: int = 8, min_train_size: int = 5000, save_every: int = 100,
+                 kmeans_iterations: int = 10, seed: int = 0):
+        """
+        Initializes an untrained IVF index.
+
+        Args:
+            index_path (Optional[str]): .npz file where the index is persisted
+            n_lists (Optional[int]): Number of clusters. If None it is 4 * sqrt(N) at training time
+            n_probe (int): Number of lists visited per query
+            min_train_size (int): Gallery size from which the index is trained;
+                                  smaller galleries are scanned exactly
+            save_every (int): Save the index after this many incremental insertions
+            kmeans_iterations (int): Lloyd iterations used during training
+            seed (int): Seed for the k-means initialization
+        """
+        self.index_path = index_path
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.min_train_size = min_train_size
+        self.save_every = save_every
+        self.kmeans_iterations = kmeans_iterations
+        self.seed = seed
+
+        self.centroids = None
+        self._centroid_norms = None
+        self._assignments = np.zeros(0, dtype=np.int32)
+        self._lists: List[np.ndarray] = []
+        self._pending: List[List[int]] = []
+        self._signatures = np.zeros(0, dtype=np.float64)
+        self._unsaved = 0
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    def attach(self, encodings: np.ndarray) -> None:
+        if self.load(encodings):
+            if len(self._assignments) < len(encodings):
+                self._assign_range(encodings, len(self._assignments), len(encodings))
+                self.save()
+            return
+
+        if len(encodings) >= self.min_train_size:
+            self.train(encodings)
+
+    def add(self, row: int, encodings: np.ndarray) -> None:
+        if not self.is_trained:
+            if len(encodings) >= self.min_train_size:
+                self.train(encodings)
+            return
+
+        if row < len(self._assignments):
+            self._remove(row)
+            self._assign_rows(encodings, np.array([row]))
+        else:
+            self._assign_range(encodings, len(self._assignments), row + 1)
+
+        self._unsaved += 1
+        if self._unsaved >= self.save_every:
+            self.save()
+
+    def candidates(self, query: np.ndarray, k: int = 1) -> Optional[np.ndarray]:
+        if not self.is_trained:
+            return None
+
+        n_probe = min(self.n_probe, len(self.centroids))
+        scores = self._centroid_norms - 2.0 * (self.centroids @ query)
+        lists = np.argpartition(scores, n_probe - 1)[:n_probe]
+
+        rows = [self._list_rows(list_id) for list_id in lists]
+        return np.concatenate(rows) if rows else np.zeros(0, dtype=np.int64)
+
+    def train(self, encodings: np.ndarray) -> None:
+        """
+        Clusters the gallery with k-means and assigns every row to its nearest list.
+
+        Args:
+            encodings (np.ndarray): (N, D) matrix with every gallery row
+        """
+        n_rows = len(encodings)
+        n_lists = self.n_lists or max(1, int(4 * np.sqrt(n_rows)))
+        n_lists = min(n_lists, n_rows)
+        rng = np.random.default_rng(self.seed)
+
+        # Train on a sample; 64 points per list is enough for stable centroids
+        sample_size = min(n_rows, 64 * n_lists)
+        sample = encodings[rng.choice(n_rows, sample_size, replace=False)]
+        centroids = sample[rng.choice(sample_size, n_lists, replace=False)].copy()
+
+        for _ in range(self.kmeans_iterations):
+            labels = self._nearest(sample, centroids)
+            counts = np.bincount(labels, minlength=n_lists)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+
+            empty = counts == 0
+            centroids[~empty] = sums[~empty] / counts[~empty, None]
+            # Re-seed empty lists with random sample points
+            if empty.any():
+                centroids[empty] = sample[rng.choice(sample_size, int(empty.sum()))]
+
+        self.centroids = centroids.astype(np.float32)
+        self._centroid_norms = np.einsum("ij,ij->i", self.centroids, self.centroids)
+        self._assignments = np.zeros(0, dtype=np.int32)
+        self._lists = [np.zeros(0, dtype=np.int64) for _ in range(n_lists)]
+        self._pending = [[] for _ in range(n_lists)]
+        self._assign_range(encodings, 0, n_rows)
+        self.save()
+
+    @staticmethod
+    def _row_signatures(encodings: np.ndarray, chunk_size: int = 65536) -> np.ndarray:
+        """
+        Projects every row onto a fixed random axis. Different encodings get
+        different values, so a row that changed or moved is detected on load.
+        """
+        axis = np.random.default_rng(0).standard_normal(encodings.shape[1])
+        signatures = np.empty(len(encodings), dtype=np.float64)
+        for start in range(0, len(encodings), chunk_size):
+            signatures[start:start + chunk_size] = encodings[start:start + chunk_size].astype(np.float64) @ axis
+        return signatures
+
+    @staticmethod
+    def _nearest(points: np.ndarray, centroids: np.ndarray, chunk_size: int = 65536) -> np.ndarray:
+        """
+        Returns the nearest centroid of every point, processed in chunks to bound memory.
+        """
+        centroid_norms = np.einsum("ij,ij->i", centroids, centroids)
+        labels = np.empty(len(points), dtype=np.int32)
+        for start in range(0, len(points), chunk_size):
+            chunk = points[start:start + chunk_size]
+            scores = centroid_norms[None, :] - 2.0 * (chunk @ centroids.T)
+            labels[start:start + chunk_size] = np.argmin(scores, axis=1)
+        return labels
+
+    def _assign_range(self, encodings: np.ndarray, start: int, stop: int) -> None:
+        if stop <= start:
+            return
+
+        labels = self._nearest(encodings[start:stop], self.centroids)
+        self._assignments = np.concatenate([self._assignments, labels])
+        self._signatures = np.concatenate([self._signatures[:start],
+                                           self._row_signatures(encodings[start:stop])])
+        for list_id in np.unique(labels):
+            rows = np.flatnonzero(labels == list_id) + start
+            self._pending[list_id].extend(rows.tolist())
+
+    def _assign_rows(self, encodings: np.ndarray, rows: np.ndarray) -> None:
+        labels = self._nearest(encodings[rows], self.centroids)
+        self._signatures[rows] = self._row_signatures(encodings[rows])
+        for row, list_id in zip(rows, labels):
+            self._assignments[row] = list_id
+            self._pending[list_id].append(int(row))
+
+    def _remove(self, row: int) -> None:
+        list_id = self._assignments[row]
+        rows = self._list_rows(list_id)
+        self._lists[list_id] = rows[rows != row]
+
+    def _list_rows(self, list_id: int) -> np.ndarray:
+        pending = self._pending[list_id]
+        if pending:
+            self._lists[list_id] = np.concatenate([self._lists[list_id], np.array(pending, dtype=np.int64)])
+            self._pending[list_id] = []
+        return self._lists[list_id]
+
+    def save(self) -> bool:
+        if not self.index_path or not self.is_trained:
+            return False
+
+        try:
+            temp_path = f"{self.index_path}.tmp.npz"
+            np.savez(temp_path,
+                     centroids=self.centroids,
+                     assignments=self._assignments,
+                     signatures=self._signatures)
+            os.replace(temp_path, self.index_path)
+            self._unsaved = 0
+            return True
+        except Exception as e:
+            print(f"Error saving IVF index: {e}")
+            return False
+
+    def load(self, encodings: np.ndarray) -> bool:
+        """
+        Loads a persisted index if it still matches the gallery.
+
+        Args:
+            encodings (np.ndarray): (N, D) matrix with every gallery row
+
+        Returns:
+            bool: True if the index was loaded
+        """
+        if not self.index_path or not os.path.exists(self.index_path):
+            return False
+
+        try:
+            with np.load(self.index_path) as data:
+                centroids = data["centroids"]
+                assignments = data["assignments"].astype(np.int32)
+                # Indexes saved before per-row signatures are retrained
+                signatures = data["signatures"] if "signatures" in data else None
+        except Exception as e:
+            print(f"Error reading IVF index: {e}")
+            return False
+
+        # Discard the index if the gallery shrank
+        if (len(assignments) == 0 or len(assignments) > len(encodings)
+                or centroids.shape[1] != encodings.shape[1]
+                or signatures is None or len(signatures) != len(assignments)):
+            return False
+
+        current = self._row_signatures(encodings[:len(assignments)])
+        changed = np.flatnonzero(~np.isclose(current, signatures, rtol=1e-6, atol=1e-6))
+        if len(changed) > len(assignments) // 2:
+            # The gallery was rebuilt; its clusters may no longer fit
+            return False
+
+        self.centroids = centroids.astype(np.float32)
+        self._centroid_norms = np.einsum("ij,ij->i", self.centroids, self.centroids)
+        if len(changed):
+            print(f"Re-assigning {len(changed)} IVF index rows that changed since it was saved")
+            assignments[changed] = self._nearest(encodings[changed], self.centroids)
+        self._assignments = assignments
+        self._signatures = current
+        order = np.argsort(assignments, kind="stable")
+        bounds = np.searchsorted(assignments[order], np.arange(len(centroids) + 1))
+        self._lists = [order[bounds[i]:bounds[i + 1]].astype(np.int64) for i in range(len(centroids))]
+        self._pending = [[] for _ in range(len(centroids))]
+        if len(changed):
+            self.save()
+        return True
@@ -2,6 +2,8 @@ from abc import ABC, abstractmethod
 import numpy as np
 from typing import Optional, Tuple, List
 
+from src.utils.image_utils import ImageUtils
+
 
 class FaceRecognizer(ABC):
     """
@@ -15,7 +17,8 @@ class FaceRecognizer(ABC):
         This will generate a facial encoding from an image.
 
         Args:
-            image: Can be either a path to an image file (str) or a numpy array
+            image: Can be a path to an image file (str), encoded image bytes
+                  (bytes, bytearray or memoryview, decoded in memory) or a numpy array
                   containing the image data (np.ndarray)
 
         Returns:
@@ -24,6 +27,71 @@ class FaceRecognizer(ABC):
         """
         pass
 
+    def get_face_encodings_batch(self, images) -> List[Optional[np.ndarray]]:
+        """
+        Generates facial encodings for several images at once.
+        Implementations backed by models with batch inference override this to
+        amortize per-call overhead; the default encodes one image at a time.
+
+        Args:
+            images: List of inputs accepted by get_face_encoding
+
+        Returns:
+            List[Optional[np.ndarray]]: One encoding per image, None where no face is detected
+        """
+        return [self.get_face_encoding(image) for image in images]
+
+    def get_face_encoding_at(self, image, box: Tuple[int, int, int, int]) -> Optional[np.ndarray]:
+        """
+        Generates the encoding of a face whose location is already known, e.g. a
+        face followed by a tracker. Implementations with an encode-only path skip
+        detection; the default runs get_face_encoding on the image.
+
+        Args:
+            image: Any input accepted by get_face_encoding, usually a crop around the face
+            box (Tuple[int, int, int, int]): (top, right, bottom, left) face box in image pixels
+
+        Returns:
+            Optional[np.ndarray]: Face encoding, None if it could not be computed
+        """
+        return self.get_face_encoding(image)
+
+    def get_all_face_encodings(self, image) -> List[Tuple[Tuple[int, int, int, int], np.ndarray]]:
+        """
+        Generates an encoding for every face in an image, e.g. a group photo.
+        Implementations override this to detect once and encode all faces in one
+        batch; the default detects the faces and encodes a crop around each one.
+
+        Args:
+            image: Any input accepted by get_face_encoding
+
+        Returns:
+            List[Tuple[Tuple[int, int, int, int], np.ndarray]]: (top, right, bottom, left)
+                box and encoding of each face where an encoding could be computed
+        """
+        image = ImageUtils.read_image(image)
+        if image is None:
+            return []
+
+        faces = []
+        h, w = image.shape[:2]
+        for top, right, bottom, left in self.detect_faces(image):
+            pad = max(bottom - top, right - left) // 2
+            crop = image[max(0, top - pad):min(h, bottom + pad), max(0, left - pad):min(w, right + pad)]
+            encoding = self.get_face_encoding(np.ascontiguousarray(crop))
+            if encoding is not None:
+                faces.append(((int(top), int(right), int(bottom), int(left)), encoding))
+        return faces
+
+    def warm_up(self) -> None:
+        """
+        Runs one inference on a synthetic image so lazy initialization (memory
+        allocation, kernel selection, page faults on the model weights) happens
+        at startup instead of on the first request. Implementations override this
+        to also exercise models that only run when a face is found.
+        """
+        self.get_face_encoding(np.zeros((480, 640, 3), dtype=np.uint8))
+
     @abstractmethod
     def detect_faces(self, frame) -> List[Tuple[int, int, int, int]]:
         """
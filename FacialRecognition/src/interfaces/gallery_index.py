@@ -0,0 +1,59 @@
+from abc import ABC, abstractmethod
+import numpy as np
+from typing import Optional
+
+
+class GalleryIndex(ABC):
+    """
+    Abstract interface for search indexes used by FaceGallery.
+    An index only proposes candidate rows of the gallery matrix; the gallery then
+    re-scores those rows with its exact metric, so the final distance reported
+    is always the true one.
+    """
+
+    @abstractmethod
+    def attach(self, encodings: np.ndarray) -> None:
+        """
+        Prepares the index for a freshly loaded gallery, either by loading a
+        persisted index from disk or by building it from the encodings.
+
+        Args:
+            encodings (np.ndarray): (N, D) matrix with every gallery row
+        """
+        pass
+
+    @abstractmethod
+    def add(self, row: int, encodings: np.ndarray) -> None:
+        """
+        Inserts or updates a single gallery row.
+
+        Args:
+            row (int): Row of the gallery matrix that was added or replaced
+            encodings (np.ndarray): (N, D) matrix with every gallery row
+        """
+        pass
+
+    @abstractmethod
+    def candidates(self, query: np.ndarray, k: int = 1) -> Optional[np.ndarray]:
+        """
+        Returns the gallery rows worth scoring exactly for a query.
+
+        Args:
+            query (np.ndarray): Probe encoding, prepared with the gallery metric
+            k (int): Number of neighbours the caller wants
+
+        Returns:
+            Optional[np.ndarray]: Array of row numbers, or None when the whole
+                                  gallery should be scanned
+        """
+        pass
+
+    @abstractmethod
+    def save(self) -> bool:
+        """
+        Persists the index to disk.
+
+        Returns:
+            bool: True if the index was saved
+        """
+        pass
@@ -1,6 +1,6 @@
 import os
 from src.ui.app import FacialAuthApp
-from src.utils.db_manager import DBManager
+from src.utils.db_factory import create_db_manager
 from src.recognizers.dlib_recognizer import DlibRecognizer
 from src.recognizers.face_recognition_lib_recognizer import FaceRecognitionLibRecognizer
 from src import config
@@ -52,7 +52,7 @@ def main():
     """
     create_directories()
 
-    db_manager = DBManager(config.DB_FILE, config.IMAGES_DIR)
+    db_manager = create_db_manager(config.DB_FILE, config.IMAGES_DIR)
 
     try:
         recognizer = HybridRecognizer(
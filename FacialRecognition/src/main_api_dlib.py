@@ -1,12 +1,20 @@
 import os
+import functools
 import uvicorn
 from fastapi import FastAPI, HTTPException
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
 
 from src.recognizers.hybrid_recognizer import HybridRecognizer
-from src.utils.db_manager import DBManager
+from src.recognizers.cached_recognizer import CachedRecognizer
+from src.utils.encoding_cache import EncodingCache
+from src.utils.db_factory import create_db_manager
+from src.indexes.index_factory import create_gallery_index
 from src.api.dlib_api import DlibAPI
+from src.api.inference_executor import InferenceExecutor
+from src.api.micro_batcher import MicroBatcher
+from src.utils.startup import StartupTimer, freeze_for_fork
+from src.utils.metrics import metrics
 from src import config
 
 
@@ -47,13 +55,15 @@ def main():
     """
     Main application entry point for DLIB API.
     """
+    timer = StartupTimer()
     create_directories()
 
     if not check_models():
         print("Missing models")
         return None
 
-    db_manager = DBManager(config.DB_FILE, config.IMAGES_DIR)
+    with timer.stage("database"):
+        db_manager = create_db_manager(config.DB_FILE, config.IMAGES_DIR)
 
     app = FastAPI(
         title="DLIB Recognition API",
@@ -71,23 +81,82 @@ def main():
         return FileResponse(image_path)
 
     try:
-        recognizer = HybridRecognizer(
-            config.SHAPE_PREDICTOR_PATH,
-            config.RECOGNITION_MODEL_PATH
-        )
+        with timer.stage("models"):
+            recognizer = HybridRecognizer(
+                config.SHAPE_PREDICTOR_PATH,
+                config.RECOGNITION_MODEL_PATH
+            )
+
+        if config.STARTUP_WARMUP:
+            with timer.stage("warm_up"):
+                recognizer.warm_up()
 
     except Exception as e:
         print(f"ERROR: {e}")
         return None
 
+    recognizer_factory = functools.partial(
+        HybridRecognizer,
+        config.SHAPE_PREDICTOR_PATH,
+        config.RECOGNITION_MODEL_PATH
+    )
+
+    if config.ENCODING_CACHE:
+        cache_options = dict(
+            max_entries=config.ENCODING_CACHE_SIZE,
+            ttl_seconds=config.ENCODING_CACHE_TTL,
+            disk_dir=config.ENCODING_CACHE_DIR
+        )
+        recognizer = CachedRecognizer(recognizer, EncodingCache(**cache_options))
+        recognizer_factory = functools.partial(CachedRecognizer.from_factory, recognizer_factory, **cache_options)
+
+    # dlib holds the GIL, so by default each worker process loads its own models
+    executor = InferenceExecutor(
+        recognizer,
+        mode=config.INFERENCE_MODE_DLIB,
+        max_workers=config.INFERENCE_WORKERS,
+        max_queue=config.INFERENCE_MAX_QUEUE,
+        retry_after=config.INFERENCE_RETRY_AFTER,
+        recognizer_factory=recognizer_factory
+    )
+
+    batcher = None
+    if config.DLIB_BATCHING:
+        batcher = MicroBatcher(executor, config.DLIB_BATCH_MAX_SIZE, config.DLIB_BATCH_MAX_WAIT_MS)
+
     # Initialize API with the app, recognizer and db_manager
-    api = DlibAPI(app, recognizer, db_manager)
+    with timer.stage("gallery"):
+        index = create_gallery_index(config.DB_FILE)
+        api = DlibAPI(app, recognizer, db_manager, index, executor, batcher)
+
+    if config.STARTUP_WARMUP and executor.mode == "process":
+        # Worker processes load their own models; warm them before the worker reports ready
+        async def warm_up_workers():
+            with timer.stage("worker_warm_up"):
+                await executor.warm_up()
+
+        app.add_event_handler("startup", warm_up_workers)
 
     # Add a simple root endpoint
     @app.get("/")
     def read_root():
         return {"message": "DLIB Recognition API", "status": "online"}
 
+    @app.get("/api/health")
+    def health():
+        return {"status": "ready", "startup_ms": timer.report()}
+
+    @app.get("/api/stats/detection")
+    def detection_stats():
+        # Images resolved by each upsampling tier. Served from the metrics registry,
+        # which merges the counters of every inference worker, so this request
+        # does not take an inference slot
+        return metrics.counter_values("face_detection_tier_total", "tier")
+
+    print(f"Startup finished in {timer.finish() * 1000:.1f} ms")
+    if config.STARTUP_GC_FREEZE:
+        freeze_for_fork()
+
     return app
 
 
@@ -1,12 +1,19 @@
 import os
+import functools
 import uvicorn
 from fastapi import FastAPI, HTTPException
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
 
 from src.recognizers.insightface_recognizer import InsightFaceRecognizer
-from src.utils.db_manager import DBManager
+from src.recognizers.cached_recognizer import CachedRecognizer
+from src.utils.encoding_cache import EncodingCache
+from src.utils.db_factory import create_db_manager
+from src.indexes.index_factory import create_gallery_index
 from src.api.insight_face_api import InsightFaceAPI
+from src.api.inference_executor import InferenceExecutor
+from src.api.micro_batcher import MicroBatcher
+from src.utils.startup import StartupTimer, freeze_for_fork
 from src import config
 
 
@@ -28,9 +35,11 @@ def main():
     """
     Main application entry point for IF API.
     """
+    timer = StartupTimer()
     create_directories()
 
-    db_manager = DBManager(config.DB_FILE_IF, config.IMAGES_DIR_IF)
+    with timer.stage("database"):
+        db_manager = create_db_manager(config.DB_FILE_IF, config.IMAGES_DIR_IF)
 
     app = FastAPI(
         title="InsightFace Recognition API",
@@ -58,12 +67,19 @@ def main():
 
         print(f"Usando directorio de modelos: {models_path}")
 
-        recognizer = InsightFaceRecognizer(model_folder=models_path)
+        with timer.stage("models"):
+            recognizer = InsightFaceRecognizer(model_folder=models_path,
+                                               allowed_modules=config.IF_ALLOWED_MODULES,
+                                               det_size=config.IF_DET_SIZE)
 
         if not recognizer.is_initialized:
             print("ERROR: IF not init")
             return
 
+        if config.STARTUP_WARMUP:
+            with timer.stage("warm_up"):
+                recognizer.warm_up()
+
     except ImportError:
         print("ERROR: IF is not insttaled")
         return
@@ -71,14 +87,59 @@ def main():
         print(f"ERROR: {e}")
         return
 
+    recognizer_factory = functools.partial(InsightFaceRecognizer, model_folder=models_path,
+                                           allowed_modules=config.IF_ALLOWED_MODULES,
+                                           det_size=config.IF_DET_SIZE)
+
+    if config.ENCODING_CACHE:
+        cache_options = dict(
+            max_entries=config.ENCODING_CACHE_SIZE,
+            ttl_seconds=config.ENCODING_CACHE_TTL,
+            disk_dir=config.ENCODING_CACHE_DIR
+        )
+        recognizer = CachedRecognizer(recognizer, EncodingCache(**cache_options))
+        recognizer_factory = functools.partial(CachedRecognizer.from_factory, recognizer_factory, **cache_options)
+
+    # ONNX Runtime releases the GIL, so by default threads share one recognizer
+    executor = InferenceExecutor(
+        recognizer,
+        mode=config.INFERENCE_MODE_IF,
+        max_workers=config.INFERENCE_WORKERS,
+        max_queue=config.INFERENCE_MAX_QUEUE,
+        retry_after=config.INFERENCE_RETRY_AFTER,
+        recognizer_factory=recognizer_factory
+    )
+
+    batcher = None
+    if config.IF_BATCHING:
+        batcher = MicroBatcher(executor, config.IF_BATCH_MAX_SIZE, config.IF_BATCH_MAX_WAIT_MS)
+
     # Initialize API with the app, recognizer and db_manager
-    api = InsightFaceAPI(app, recognizer, db_manager)
+    with timer.stage("gallery"):
+        index = create_gallery_index(config.DB_FILE_IF)
+        api = InsightFaceAPI(app, recognizer, db_manager, index, executor, batcher)
+
+    if config.STARTUP_WARMUP and executor.mode == "process":
+        # Worker processes load their own models; warm them before the worker reports ready
+        async def warm_up_workers():
+            with timer.stage("worker_warm_up"):
+                await executor.warm_up()
+
+        app.add_event_handler("startup", warm_up_workers)
 
     # Add a simple root endpoint
     @app.get("/")
     def read_root():
         return {"message": "InsightFace Recognition API", "status": "online"}
 
+    @app.get("/api/health")
+    def health():
+        return {"status": "ready", "startup_ms": timer.report()}
+
+    print(f"Startup finished in {timer.finish() * 1000:.1f} ms")
+    if config.STARTUP_GC_FREEZE:
+        freeze_for_fork()
+
     return app
 
 
@@ -1,7 +1,7 @@
 import os
 from src.recognizers.insightface_recognizer import InsightFaceRecognizer
 from src.ui.IF.facial_auth_app_IF import FacialAuthAppIF
-from src.utils.db_manager import DBManager
+from src.utils.db_factory import create_db_manager
 from src import config
 
 
@@ -27,7 +27,7 @@ def main():
     create_directories()
 
     # Initialize database manager
-    db_manager = DBManager(config.DB_FILE_IF, config.IMAGES_DIR_IF)
+    db_manager = create_db_manager(config.DB_FILE_IF, config.IMAGES_DIR_IF)
 
     # Initialize IF recognizer
     try:
@@ -39,7 +39,9 @@ def main():
 
         print(f"Usando directorio de modelos: {models_path}")
 
-        recognizer = InsightFaceRecognizer(model_folder=models_path)
+        recognizer = InsightFaceRecognizer(model_folder=models_path,
+                                           allowed_modules=config.IF_ALLOWED_MODULES,
+                                           det_size=config.IF_DET_SIZE)
 
         if not recognizer.is_initialized:
             print("ERROR: No se pudo iniciar IF")
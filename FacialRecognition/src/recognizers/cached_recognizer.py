@@ -0,0 +1,116 @@
+import numpy as np
+from typing import Optional, List, Tuple, Callable
+
+from src.interfaces.face_recognizer import FaceRecognizer
+from src.utils.encoding_cache import EncodingCache
+from src.utils.image_utils import ImageUtils
+
+
+class CachedRecognizer(FaceRecognizer):
+    """
+    Wraps another recognizer and caches its encodings by image content.
+    Repeated submissions of the same image (client retries, kiosk re-submissions,
+    duplicate check followed by save) skip detection and encoding entirely.
+    """
+
+    def __init__(self, recognizer: FaceRecognizer, cache: Optional[EncodingCache] = None):
+        """
+        Args:
+            recognizer (FaceRecognizer): Recognizer that computes the encodings
+            cache (Optional[EncodingCache]): Cache instance. Default is an in-memory cache
+        """
+        self.recognizer = recognizer
+        self.cache = cache or EncodingCache()
+        self.identity = self._build_identity(recognizer)
+
+    @classmethod
+    def from_factory(cls, recognizer_factory: Callable[[], FaceRecognizer], **cache_options):
+        """
+        Builds the wrapped recognizer and its cache; picklable with functools.partial,
+        so it can be used as the recognizer factory of a process-mode executor.
+        """
+        return cls(recognizer_factory(), EncodingCache(**cache_options))
+
+    @staticmethod
+    def _build_identity(recognizer: FaceRecognizer) -> str:
+        """
+        Describes the recognizer class and the simple parameters that can change its output.
+        """
+        params = sorted(
+            (name, value) for name, value in vars(recognizer).items()
+            if isinstance(value, (str, int, float, bool, tuple)) and not name.startswith("_")
+        )
+        return f"{type(recognizer).__module__}.{type(recognizer).__name__}:{params}"
+
+    def __getattr__(self, name):
+        # Expose attributes of the wrapped recognizer such as default_tolerance
+        if name == "recognizer":
+            raise AttributeError(name)
+        return getattr(self.recognizer, name)
+
+    def get_face_encoding(self, image) -> Optional[np.ndarray]:
+        """
+        Returns the cached encoding of the image, computing it on a miss.
+        """
+        image = ImageUtils.read_image(image)
+        if image is None:
+            return None
+
+        key = EncodingCache.make_key(image, self.identity)
+        found, encoding = self.cache.get(key)
+        if found:
+            return encoding
+
+        encoding = self.recognizer.get_face_encoding(image)
+        self.cache.put(key, encoding)
+        return encoding
+
+    def get_face_encodings_batch(self, images) -> List[Optional[np.ndarray]]:
+        """
+        Returns cached encodings and computes the misses in a single batch.
+        """
+        encodings: List[Optional[np.ndarray]] = [None] * len(images)
+        missing_images = []
+        missing = []
+
+        for position, image in enumerate(images):
+            image = ImageUtils.read_image(image)
+            if image is None:
+                continue
+
+            key = EncodingCache.make_key(image, self.identity)
+            found, encoding = self.cache.get(key)
+            if found:
+                encodings[position] = encoding
+            else:
+                missing_images.append(image)
+                missing.append((position, key))
+
+        if missing_images:
+            for (position, key), encoding in zip(missing, self.recognizer.get_face_encodings_batch(missing_images)):
+                self.cache.put(key, encoding)
+                encodings[position] = encoding
+
+        return encodings
+
+    def get_face_encoding_at(self, image, box: Tuple[int, int, int, int]) -> Optional[np.ndarray]:
+        # Tracked face crops differ on every frame; not worth caching
+        return self.recognizer.get_face_encoding_at(image, box)
+
+    def get_all_face_encodings(self, image) -> List[Tuple[Tuple[int, int, int, int], np.ndarray]]:
+        # Group images are rarely resubmitted; not worth caching
+        return self.recognizer.get_all_face_encodings(image)
+
+    def warm_up(self) -> None:
+        # The synthetic image must reach the models, not the cache
+        self.recognizer.warm_up()
+
+    def detect_faces(self, frame) -> List[Tuple[int, int, int, int]]:
+        return self.recognizer.detect_faces(frame)
+
+    def compare_faces(self, known_encoding: np.ndarray,
+                      face_encoding_to_check: np.ndarray,
+                      tolerance: float = None) -> bool:
+        if tolerance is None:
+            return self.recognizer.compare_faces(known_encoding, face_encoding_to_check)
+        return self.recognizer.compare_faces(known_encoding, face_encoding_to_check, tolerance)
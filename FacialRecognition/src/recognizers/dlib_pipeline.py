@@ -0,0 +1,264 @@
+import dlib
+import cv2
+import numpy as np
+from typing import Callable, List, Optional, Tuple
+
+from src.utils.metrics import metrics
+
+
+def largest_rect(rects) -> Optional[dlib.rectangle]:
+    """
+    Returns the largest face rectangle (generally the closest face).
+
+    Args:
+        rects: dlib rectangles or mmod_rectangles
+
+    Returns:
+        Optional[dlib.rectangle]: Largest rectangle, None if there are no faces
+    """
+    rects = [rect.rect if hasattr(rect, "rect") else rect for rect in rects]
+    if not rects:
+        return None
+    return max(rects, key=lambda rect: rect.width() * rect.height())
+
+
+def downscale_for_detection(image: np.ndarray, max_side: int) -> Tuple[np.ndarray, float]:
+    """
+    Returns an RGB copy of the image whose longest side is at most `max_side`.
+    Only the small copy is colour-converted, so detection cost stops growing
+    with the input megapixels.
+
+    Args:
+        image (np.ndarray): BGR image at full resolution
+        max_side (int): Longest side of the detection image
+
+    Returns:
+        Tuple[np.ndarray, float]: (RGB detection image, scale from full resolution to it)
+    """
+    with metrics.timer("preprocess"):
+        h, w = image.shape[:2]
+        scale = min(1.0, max_side / max(h, w))
+        if scale < 1.0:
+            image = cv2.resize(image, (max(1, round(w * scale)), max(1, round(h * scale))),
+                               interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(image, cv2.COLOR_BGR2RGB), scale
+
+
+def scale_rect(rect: dlib.rectangle, scale: float) -> dlib.rectangle:
+    """
+    Maps a rectangle found on the detection image back to full-resolution pixels.
+    """
+    if scale == 1.0:
+        return rect
+    return dlib.rectangle(int(round(rect.left() / scale)), int(round(rect.top() / scale)),
+                          int(round(rect.right() / scale)), int(round(rect.bottom() / scale)))
+
+
+def crop_face(image: np.ndarray, rect: dlib.rectangle,
+              margin: float = 0.6) -> Tuple[np.ndarray, dlib.rectangle]:
+    """
+    Cuts a region around a face from the full-resolution image for the landmark
+    predictor and the ResNet. The margin keeps the context the 150x150 face
+    chip is sampled from, so descriptors don't depend on the rest of the frame.
+
+    Args:
+        image (np.ndarray): BGR image at full resolution
+        rect (dlib.rectangle): Face rectangle in full-resolution pixels
+        margin (float): Extra space around the face, as a fraction of its size
+
+    Returns:
+        Tuple[np.ndarray, dlib.rectangle]: (RGB crop, face rectangle in crop coordinates)
+    """
+    h, w = image.shape[:2]
+    pad = int(margin * max(rect.width(), rect.height()))
+    x0, y0 = max(0, rect.left() - pad), max(0, rect.top() - pad)
+    x1, y1 = min(w, rect.right() + pad + 1), min(h, rect.bottom() + pad + 1)
+
+    with metrics.timer("preprocess"):
+        rgb_crop = cv2.cvtColor(np.ascontiguousarray(image[y0:y1, x0:x1]), cv2.COLOR_BGR2RGB)
+    return rgb_crop, dlib.rectangle(rect.left() - x0, rect.top() - y0,
+                                    rect.right() - x0, rect.bottom() - y0)
+
+
+class AdaptiveDetector:
+    """
+    Runs a dlib detector on a downscaled copy of each image, trying the cheapest
+    upsampling tier first and escalating only for images where no face was found.
+    Selfie-style images, where the face fills a large part of the frame, are
+    resolved without upsampling; each upsampling step scans 4x the pixels.
+    Counts how many images each tier resolved in the face_detection_tier_total metric.
+    """
+
+    def __init__(self, detect: Callable[[np.ndarray, int], List], max_side: int,
+                 upsample_tiers: Tuple[int, ...] = (0, 1),
+                 detect_batch: Optional[Callable[[List[np.ndarray], int], List]] = None):
+        """
+        Args:
+            detect (Callable[[np.ndarray, int], List]): Detector called as detect(rgb_image, upsample_num_times)
+            max_side (int): Longest side of the detection image
+            upsample_tiers (Tuple[int, ...]): Upsampling values tried in order
+            detect_batch (Optional[Callable[[List[np.ndarray], int], List]]): Batched detector
+                called as detect_batch(rgb_images, upsample_num_times), used for several images
+        """
+        self.detect = detect
+        self.max_side = max_side
+        self.upsample_tiers = tuple(upsample_tiers)
+        self.detect_batch = detect_batch
+
+    def __call__(self, image: np.ndarray) -> List[dlib.rectangle]:
+        """
+        Detects faces in one BGR image.
+
+        Returns:
+            List[dlib.rectangle]: Face rectangles in full-resolution pixels
+        """
+        return self.detect_many([image])[0]
+
+    def detect_many(self, images: List[np.ndarray]) -> List[List[dlib.rectangle]]:
+        """
+        Detects faces in several BGR images; each tier runs only on the images
+        earlier tiers found nothing in.
+
+        Returns:
+            List[List[dlib.rectangle]]: Face rectangles in full-resolution pixels, per image
+        """
+        downscaled = [downscale_for_detection(image, self.max_side) for image in images]
+        results: List[List[dlib.rectangle]] = [[] for _ in images]
+        pending = list(range(len(images)))
+        resolved = {}
+
+        for tier in self.upsample_tiers:
+            if not pending:
+                break
+
+            rgb_images = [downscaled[position][0] for position in pending]
+            with metrics.timer("detect"):
+                if self.detect_batch is not None and len(rgb_images) > 1:
+                    detections = self.detect_batch(rgb_images, tier)
+                else:
+                    detections = [self.detect(rgb_image, tier) for rgb_image in rgb_images]
+
+            still_pending = []
+            for position, faces in zip(pending, detections):
+                if len(faces) == 0:
+                    still_pending.append(position)
+                    continue
+                scale = downscaled[position][1]
+                results[position] = [scale_rect(face.rect if hasattr(face, "rect") else face, scale)
+                                     for face in faces]
+                resolved[f"upsample_{tier}"] = resolved.get(f"upsample_{tier}", 0) + 1
+            pending = still_pending
+
+        resolved["no_face"] = len(pending)
+        for name, count in resolved.items():
+            if count:
+                metrics.inc("face_detection_tier_total", count, tier=name)
+        return results
+
+
+def compute_descriptors_batch(face_encoder, rgb_images: List[np.ndarray],
+                              shapes: List[dlib.full_object_detection]) -> List[np.ndarray]:
+    """
+    Computes one face descriptor per image with a single ResNet call.
+
+    Args:
+        face_encoder: dlib.face_recognition_model_v1 instance
+        rgb_images (List[np.ndarray]): RGB images
+        shapes (List[dlib.full_object_detection]): Landmarks of one face per image
+
+    Returns:
+        List[np.ndarray]: 128-dimensional descriptors, in the same order as the images
+    """
+    if not rgb_images:
+        return []
+
+    batch_faces = []
+    for shape in shapes:
+        detections = dlib.full_object_detections()
+        detections.append(shape)
+        batch_faces.append(detections)
+
+    with metrics.timer("encode"):
+        descriptors = face_encoder.compute_face_descriptor(rgb_images, batch_faces)
+    return [np.array(image_descriptors[0]) for image_descriptors in descriptors]
+
+
+def encode_faces(image: np.ndarray, faces: List[dlib.rectangle], shape_predictor,
+                 face_encoder) -> List[Tuple[Tuple[int, int, int, int], np.ndarray]]:
+    """
+    Encodes every detected face of one image with a single batched ResNet call.
+
+    Args:
+        image (np.ndarray): BGR image at full resolution
+        faces (List[dlib.rectangle]): Face rectangles in full-resolution pixels
+        shape_predictor: dlib.shape_predictor instance
+        face_encoder: dlib.face_recognition_model_v1 instance
+
+    Returns:
+        List[Tuple[Tuple[int, int, int, int], np.ndarray]]: (top, right, bottom, left)
+                                                            box and descriptor of each face
+    """
+    rgb_crops = []
+    shapes = []
+    for face in faces:
+        rgb_crop, crop_rect = crop_face(image, face)
+        rgb_crops.append(rgb_crop)
+        with metrics.timer("landmarks"):
+            shapes.append(shape_predictor(rgb_crop, crop_rect))
+
+    descriptors = compute_descriptors_batch(face_encoder, rgb_crops, shapes)
+    return [((face.top(), face.right(), face.bottom(), face.left()), descriptor)
+            for face, descriptor in zip(faces, descriptors)]
+
+
+def encode_face_at(image: np.ndarray, box: Tuple[int, int, int, int], shape_predictor,
+                   face_encoder) -> Optional[np.ndarray]:
+    """
+    Encodes the face at a known (top, right, bottom, left) box, without detection.
+
+    Args:
+        image (np.ndarray): BGR image
+        box (Tuple[int, int, int, int]): Face box in image pixels
+        shape_predictor: dlib.shape_predictor instance
+        face_encoder: dlib.face_recognition_model_v1 instance
+
+    Returns:
+        Optional[np.ndarray]: Descriptor of the face
+    """
+    top, right, bottom, left = (int(value) for value in box)
+    faces = encode_faces(image, [dlib.rectangle(left, top, right, bottom)], shape_predictor, face_encoder)
+    return faces[0][1] if faces else None
+
+
+def detect_cnn_batch(cnn_face_detector, rgb_images: List[np.ndarray], upsample_num_times: int = 1,
+                     batch_size: int = 32) -> List:
+    """
+    Runs the MMOD CNN detector over several images.
+    dlib only batches images of identical size, so images are grouped by shape
+    and each group is detected with one call.
+
+    Args:
+        cnn_face_detector: dlib.cnn_face_detection_model_v1 instance
+        rgb_images (List[np.ndarray]): RGB images
+        upsample_num_times (int): Times each image is upsampled before detection
+        batch_size (int): Maximum images per detector call
+
+    Returns:
+        List: mmod_rectangles for each image, in the same order as the images
+    """
+    detections = [None] * len(rgb_images)
+    groups = {}
+    for position, rgb_image in enumerate(rgb_images):
+        groups.setdefault(rgb_image.shape, []).append(position)
+
+    for positions in groups.values():
+        if len(positions) == 1:
+            detections[positions[0]] = cnn_face_detector(rgb_images[positions[0]], upsample_num_times)
+            continue
+
+        results = cnn_face_detector([rgb_images[position] for position in positions],
+                                    upsample_num_times, batch_size=batch_size)
+        for position, faces in zip(positions, results):
+            detections[position] = faces
+
+    return detections
@@ -1,12 +1,16 @@
 import dlib
-import cv2
 import numpy as np
 from typing import Optional, Tuple, List
 from ..interfaces.face_recognizer import FaceRecognizer
+from ..utils.image_utils import ImageUtils
+from ..utils.metrics import metrics
+from ..utils.calibration import calibrated_tolerance, calibrated_security_levels
+from .dlib_pipeline import largest_rect, compute_descriptors_batch, AdaptiveDetector, crop_face, encode_face_at
 
 class DlibRecognizer(FaceRecognizer):
 
-    def __init__(self, predictor_path: str, recognition_model_path: str):
+    def __init__(self, predictor_path: str, recognition_model_path: str, detect_max_side: int = 640,
+                 upsample_tiers: Tuple[int, ...] = (0, 1)):
         """
         Initializes the dlib face recognizer with required models.
 
@@ -15,6 +19,8 @@ class DlibRecognizer(FaceRecognizer):
                                 (shape_predictor_68_face_landmarks.dat)
             recognition_model_path (str): Path to the face recognition model file
                                         (dlib_face_recognition_resnet_model_v1.dat)
+            detect_max_side (int): Longest side of the downscaled copy used for detection
+            upsample_tiers (Tuple[int, ...]): HOG upsampling values tried in order
 
         Errors:
             RuntimeError: If model files cannot be loaded
@@ -27,45 +33,79 @@ class DlibRecognizer(FaceRecognizer):
         # ResNet model -> Charge CNN model
         self.face_encoder = dlib.face_recognition_model_v1(recognition_model_path)
 
-        self.default_tolerance = 0.6
+        # HOG on a downscaled copy without upsampling first, upsampled only when no face is found
+        self.detector = AdaptiveDetector(self.face_detector, detect_max_side, tuple(upsample_tiers))
+
+        self.default_tolerance = calibrated_tolerance("dlib")
+        self.security_levels = calibrated_security_levels("dlib")
 
     def get_face_encoding(self, image) -> Optional[np.ndarray]:
         """
         Generates a face encoding using dlib's ResNet model.
 
         Args:
-            image: Either path to image file (str) or numpy array with image data
+            image: Either path to image file (str), encoded image bytes or numpy array with image data
         """
-        if isinstance(image, str):
-            image = cv2.imread(image)
-        rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-
-        # 1. Detector face HOG con múltiples escalas para mejor precisión
-        faces = self.face_detector(rgb_image, 1)  # El segundo parámetro aumenta la escala de detección
-        if not faces:
+        image = ImageUtils.read_image(image)
+        if image is None:
             return None
 
+        # 1. Detector face HOG sobre una copia reducida, con más escala solo si no encuentra caras
         # Seleccionamos la cara más grande (generalmente la más cercana)
-        if len(faces) > 1:
-            largest_face = max(faces, key=lambda rect: rect.width() * rect.height())
-        else:
-            largest_face = faces[0]
-
-        # 2. Obtains 68 facials points that map it
-        shape = self.shape_predictor(rgb_image, largest_face)
+        largest_face = largest_rect(self.detector(image))
+        if largest_face is None:
+            return None
 
-        # 3. Calculamos 5 encodings con pequeñas variaciones y promediamos
-        # para obtener un embedding más robusto
-        face_descriptors = []
+        # 2. Obtains 68 facials points that map it, on a full-resolution crop around the face
+        rgb_crop, face = crop_face(image, largest_face)
+        with metrics.timer("landmarks"):
+            shape = self.shape_predictor(rgb_crop, face)
 
-        # Encoding original
-        face_descriptors.append(self.face_encoder.compute_face_descriptor(rgb_image, shape))
+        # 3. Un solo encoding por imagen; la robustez viene de registrar varias
+        # capturas (centroide + plantillas, ver FaceGallery)
+        with metrics.timer("encode"):
+            return np.array(self.face_encoder.compute_face_descriptor(rgb_crop, shape))
 
-        # Promediamos los encodings
-        if face_descriptors:
-            return np.mean(np.array(face_descriptors), axis=0)
+    def get_face_encodings_batch(self, images) -> List[Optional[np.ndarray]]:
+        """
+        Generates face encodings for several images, computing all ResNet
+        descriptors in one batched call.
 
-        return None
+        Args:
+            images: List of image paths, encoded image bytes or numpy arrays
+        """
+        rgb_crops = []
+        shapes = []
+        owners = []
+
+        for position, image in enumerate(images):
+            image = ImageUtils.read_image(image)
+            if image is None:
+                continue
+
+            face = largest_rect(self.detector(image))
+            if face is None:
+                continue
+
+            rgb_crop, face = crop_face(image, face)
+            rgb_crops.append(rgb_crop)
+            with metrics.timer("landmarks"):
+                shapes.append(self.shape_predictor(rgb_crop, face))
+            owners.append(position)
+
+        encodings: List[Optional[np.ndarray]] = [None] * len(images)
+        for position, descriptor in zip(owners, compute_descriptors_batch(self.face_encoder, rgb_crops, shapes)):
+            encodings[position] = descriptor
+        return encodings
+
+    def get_face_encoding_at(self, image, box: Tuple[int, int, int, int]) -> Optional[np.ndarray]:
+        """
+        Encodes the face at a known box: landmarks and ResNet only, no detection.
+        """
+        image = ImageUtils.read_image(image)
+        if image is None:
+            return None
+        return encode_face_at(image, box, self.shape_predictor, self.face_encoder)
 
     def detect_faces(self, frame) -> List[Tuple[int, int, int, int]]:
         """
@@ -74,9 +114,8 @@ class DlibRecognizer(FaceRecognizer):
         Args:
             frame (np.ndarray): Image frame to detect faces in
         """
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        # Detector HOG con umbral más estricto
-        faces = self.face_detector(rgb_frame, 1)  # Aumentamos la escala
+        # Detector HOG sobre la copia reducida; posiciones en píxeles de resolución completa
+        faces = self.detector(frame)
         return [(face.top(), face.right(), face.bottom(), face.left())
                 for face in faces]
 
@@ -1,21 +1,39 @@
 import face_recognition
+import cv2
 import numpy as np
 from typing import Optional, Tuple, List
 from ..interfaces.face_recognizer import FaceRecognizer
+from ..utils.image_utils import ImageUtils
+from ..utils.metrics import metrics
+from ..utils.calibration import calibrated_tolerance, calibrated_security_levels
 
 
 class FaceRecognitionLibRecognizer(FaceRecognizer):
+    def __init__(self):
+        self.default_tolerance = calibrated_tolerance("face_recognition")
+        self.security_levels = calibrated_security_levels("face_recognition")
+
     def get_face_encoding(self, image) -> Optional[np.ndarray]:
         """
         Generates face encoding using face_recognition library.
 
         Args:
-            image: Path to image file (str) or numpy array with image data
+            image: Path to image file (str), encoded image bytes or numpy array with image data
         """
-        if isinstance(image, str):
-            image = face_recognition.load_image_file(image)
-
-        face_encodings = face_recognition.face_encodings(image)
+        with metrics.timer("decode"):
+            if isinstance(image, str):
+                image = face_recognition.load_image_file(image)
+            elif isinstance(image, (bytes, bytearray, memoryview)):
+                image = ImageUtils.decode_image(image)
+                if image is not None:
+                    image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+
+        if image is None:
+            return None
+
+        # face_recognition runs detection, landmarks and encoding in one call
+        with metrics.timer("encode"):
+            face_encodings = face_recognition.face_encodings(image)
         return face_encodings[0] if face_encodings else None
 
     def detect_faces(self, frame) -> List[Tuple[int, int, int, int]]:
@@ -29,14 +47,17 @@ class FaceRecognitionLibRecognizer(FaceRecognizer):
 
     def compare_faces(self, known_encoding: np.ndarray,
                       face_encoding_to_check: np.ndarray,
-                      tolerance: float = 0.6) -> bool:
+                      tolerance: float = None) -> bool:
         """
         Compares faces using face_recognition library's comparison function.
 
         Args:
             known_encoding (np.ndarray): Known face encoding to compare against
             face_encoding_to_check (np.ndarray): Face encoding to check
-            tolerance (float, optional): Maximum distance threshold. Default: 0.6
+            tolerance (float, optional): Maximum distance threshold. Default is self.default_tolerance
         """
+        if tolerance is None:
+            tolerance = self.default_tolerance
+
         return face_recognition.compare_faces(
             [known_encoding], face_encoding_to_check, tolerance)[0]
\ No newline at end of file
@@ -1,9 +1,13 @@
 import dlib
-import cv2
 import numpy as np
 from typing import Optional, List, Tuple
 
 from src.interfaces.face_recognizer import FaceRecognizer
+from src.utils.image_utils import ImageUtils
+from src.utils.metrics import metrics
+from src.utils.calibration import calibrated_tolerance, calibrated_security_levels
+from src.recognizers.dlib_pipeline import (largest_rect, compute_descriptors_batch, AdaptiveDetector, crop_face,
+                                           encode_faces, encode_face_at)
 
 
 class HybridRecognizer(FaceRecognizer):
@@ -15,7 +19,8 @@ class HybridRecognizer(FaceRecognizer):
     This provides a good balance between speed and accuracy.
     """
 
-    def __init__(self, predictor_path: str, recognition_model_path: str):
+    def __init__(self, predictor_path: str, recognition_model_path: str, detect_max_side: int = 640,
+                 upsample_tiers: Tuple[int, ...] = (0, 1)):
         # HOG face detector (fast)
         self.face_detector = dlib.get_frontal_face_detector()
 
@@ -25,69 +30,121 @@ class HybridRecognizer(FaceRecognizer):
         # ResNet model for face recognition (accurate)
         self.face_encoder = dlib.face_recognition_model_v1(recognition_model_path)
 
-        # Stricter default tolerance to reduce false positives
-        self.default_tolerance = 0.49
+        # Longest side of the downscaled copy used for detection
+        self.detect_max_side = detect_max_side
+
+        # HOG without upsampling first, upsampled again only when no face is found
+        self.upsample_tiers = tuple(upsample_tiers)
+        self.detector = AdaptiveDetector(self.face_detector, detect_max_side, self.upsample_tiers)
+
+        # Stricter default tolerance to reduce false positives, unless calibrated
+        self.default_tolerance = calibrated_tolerance("hybrid")
+        self.security_levels = calibrated_security_levels("hybrid")
 
     def get_face_encoding(self, image) -> Optional[np.ndarray]:
         """
         Extracts face encoding from an image using HOG detection and ResNet encoding.
+        Detection runs on a downscaled copy; landmarks and the descriptor run on a
+        full-resolution crop around the face.
         Returns None if no face is detected.
         """
-        if isinstance(image, str):
-            image = cv2.imread(image)
+        image = ImageUtils.read_image(image)
 
         if image is None:
             return None
 
-        # Resize image to increase speed if too large
-        h, w = image.shape[:2]
-        if max(h, w) > 640:
-            scale = 640 / max(h, w)
-            image = cv2.resize(image, (0, 0), fx=scale, fy=scale)
-
-        rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-
-        # Use HOG detector for faster detection
-        faces = self.face_detector(rgb_image, 1)  # The second parameter can increase detection accuracy
+        # Select the largest face (generally the closest one)
+        largest_face = largest_rect(self.detector(image))
 
-        if not faces:
+        if largest_face is None:
             return None
 
-        # Select the largest face (generally the closest one)
-        if len(faces) > 1:
-            largest_face = max(faces, key=lambda rect: rect.width() * rect.height())
-        else:
-            largest_face = faces[0]
+        rgb_crop, face = crop_face(image, largest_face)
 
         # Get facial landmarks
-        shape = self.shape_predictor(rgb_image, largest_face)
+        with metrics.timer("landmarks"):
+            shape = self.shape_predictor(rgb_crop, face)
 
         # Compute face encoding with ResNet model
-        face_descriptor = self.face_encoder.compute_face_descriptor(rgb_image, shape)
+        with metrics.timer("encode"):
+            face_descriptor = self.face_encoder.compute_face_descriptor(rgb_crop, shape)
 
         return np.array(face_descriptor)
 
+    def get_face_encodings_batch(self, images) -> List[Optional[np.ndarray]]:
+        """
+        Extracts face encodings from several images, computing all ResNet
+        descriptors in one batched call.
+        Returns None for the images where no face is detected.
+        """
+        rgb_crops = []
+        shapes = []
+        owners = []
+
+        for position, image in enumerate(images):
+            image = ImageUtils.read_image(image)
+            if image is None:
+                continue
+
+            face = largest_rect(self.detector(image))
+            if face is None:
+                continue
+
+            rgb_crop, face = crop_face(image, face)
+            rgb_crops.append(rgb_crop)
+            with metrics.timer("landmarks"):
+                shapes.append(self.shape_predictor(rgb_crop, face))
+            owners.append(position)
+
+        encodings: List[Optional[np.ndarray]] = [None] * len(images)
+        for position, descriptor in zip(owners, compute_descriptors_batch(self.face_encoder, rgb_crops, shapes)):
+            encodings[position] = descriptor
+        return encodings
+
+    def get_face_encoding_at(self, image, box: Tuple[int, int, int, int]) -> Optional[np.ndarray]:
+        """
+        Encodes the face at a known box: landmarks and ResNet only, no detection.
+        """
+        image = ImageUtils.read_image(image)
+        if image is None:
+            return None
+        return encode_face_at(image, box, self.shape_predictor, self.face_encoder)
+
+    def get_all_face_encodings(self, image) -> List[Tuple[Tuple[int, int, int, int], np.ndarray]]:
+        """
+        Detects every face once and computes all ResNet descriptors in one batched call.
+        Returns a list of (face location, encoding) pairs.
+        """
+        image = ImageUtils.read_image(image)
+
+        if image is None:
+            return []
+
+        return encode_faces(image, self.detector(image), self.shape_predictor, self.face_encoder)
+
+    def warm_up(self) -> None:
+        """
+        Runs the HOG detector on a synthetic image, then the landmark predictor
+        and the ResNet on a fixed region so every model is exercised.
+        """
+        rgb_image = np.zeros((480, 640, 3), dtype=np.uint8)
+        self.face_detector(rgb_image, 1)
+
+        shape = self.shape_predictor(rgb_image, dlib.rectangle(220, 140, 420, 340))
+        self.face_encoder.compute_face_descriptor(rgb_image, shape)
+
     def detect_faces(self, image) -> List[Tuple[int, int, int, int]]:
         """
         Detects faces in an image using HOG detection (fast).
         Returns a list of face locations.
         """
-        if isinstance(image, str):
-            image = cv2.imread(image)
+        image = ImageUtils.read_image(image)
 
         if image is None:
             return []
 
-        # Resize image for faster processing if needed
-        h, w = image.shape[:2]
-        if max(h, w) > 640:
-            scale = 640 / max(h, w)
-            image = cv2.resize(image, (0, 0), fx=scale, fy=scale)
-
-        rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-
-        # Use HOG detector with upsampling to improve detection
-        faces = self.face_detector(rgb_image, 1)
+        # Use HOG detector on the downscaled copy, locations in full-resolution pixels
+        faces = self.detector(image)
 
         return [(face.top(), face.right(), face.bottom(), face.left())
                 for face in faces]
@@ -1,8 +1,12 @@
+import os
 import numpy as np
 import cv2
 from typing import Optional, List, Tuple
 
 from src.interfaces.face_recognizer import FaceRecognizer
+from src.utils.image_utils import ImageUtils
+from src.utils.metrics import metrics
+from src.utils.calibration import calibrated_tolerance, calibrated_security_levels
 
 
 class InsightFaceRecognizer(FaceRecognizer):
@@ -12,26 +16,43 @@ class InsightFaceRecognizer(FaceRecognizer):
     across different ethnicities and skin tones.
     """
 
-    def __init__(self, model_folder=None):
+    # Modules needed for bbox + embedding; the buffalo_l pack also ships
+    # landmark_2d_106, landmark_3d_68 and genderage, which we never read
+    DEFAULT_MODULES = ("detection", "recognition")
+
+    def __init__(self, model_folder=None, allowed_modules=None, det_size: int = 640):
         """
         Initialize IF recognition model.
 
         Args:
             model_folder: Optional path to model folder. If None, uses default path.
+            allowed_modules: Optional list of InsightFace task names to load. If None,
+                             only detection and recognition are loaded.
+            det_size (int): Detector input size. Images are downscaled so their longest
+                            side fits it before detection; 320 is enough for close-up
+                            selfies, larger values find smaller faces.
         """
         try:
             # Import InsightFace here to avoid dependency issues if not installed
             import insightface
             from insightface.app import FaceAnalysis
 
-            # Set up the face analysis app with detection and recognition
-            self.app = FaceAnalysis(name="buffalo_l", root=model_folder)
-            self.app.prepare(ctx_id=0, det_size=(640, 640))
+            self.allowed_modules = tuple(allowed_modules or self.DEFAULT_MODULES)
+            self.det_size = det_size
+
+            # Set up the face analysis app; modules not listed are never loaded nor run
+            self.app = FaceAnalysis(name="buffalo_l", root=model_folder,
+                                    allowed_modules=list(self.allowed_modules))
+            self.app.prepare(ctx_id=0, det_size=(det_size, det_size))
 
-            # Default tolerance threshold for face comparison
-            self.default_tolerance = 0.49
+            # Default tolerance threshold for face comparison, unless calibrated
+            self.default_tolerance = calibrated_tolerance("insightface")
+            self.security_levels = calibrated_security_levels("insightface")
 
             self.is_initialized = True
+            loaded = ", ".join(f"{task} ({os.path.basename(model.model_file)})"
+                               for task, model in self.app.models.items())
+            print(f"IF models loaded: {loaded}")
             print("------- IF started -------")
 
         except ImportError:
@@ -40,6 +61,74 @@ class InsightFaceRecognizer(FaceRecognizer):
             print(f"ERROR initializing InsightFace: {e}")
             self.is_initialized = False
 
+    def _detect(self, image: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """
+        Detects faces on a copy of the image downscaled to det_size and maps the
+        results back to full-resolution coordinates. Only the small copy is
+        converted to RGB, so large uploads no longer pay for a full-size conversion.
+
+        Args:
+            image (np.ndarray): BGR image at full resolution
+
+        Returns:
+            Tuple[np.ndarray, Optional[np.ndarray]]: (N, 5) boxes with scores and
+                                                     (N, 5, 2) keypoints, in full-resolution pixels
+        """
+        with metrics.timer("preprocess"):
+            h, w = image.shape[:2]
+            scale = min(1.0, self.det_size / max(h, w))
+            if scale < 1.0:
+                image = cv2.resize(image, (max(1, round(w * scale)), max(1, round(h * scale))),
+                                   interpolation=cv2.INTER_AREA)
+
+            rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+
+        with metrics.timer("detect"):
+            bboxes, kpss = self.app.det_model.detect(rgb_image, max_num=0, metric="default")
+
+        if scale < 1.0:
+            bboxes = bboxes.copy()
+            bboxes[:, :4] /= scale
+            if kpss is not None:
+                kpss = kpss / scale
+        return bboxes, kpss
+
+    def _aligned_crop(self, image: np.ndarray, bbox: np.ndarray, kps: np.ndarray) -> np.ndarray:
+        """
+        Aligns one face from the full-resolution image for the recognition model.
+        Only a region around the face is converted to RGB; the margin covers
+        everything the alignment warp can sample, so the crop is identical to
+        aligning the whole image.
+        """
+        from insightface.utils import face_align
+
+        h, w = image.shape[:2]
+        margin = max(bbox[2] - bbox[0], bbox[3] - bbox[1])
+        x0 = int(max(0, np.floor(min(bbox[0], kps[:, 0].min()) - margin)))
+        y0 = int(max(0, np.floor(min(bbox[1], kps[:, 1].min()) - margin)))
+        x1 = int(min(w, np.ceil(max(bbox[2], kps[:, 0].max()) + margin)))
+        y1 = int(min(h, np.ceil(max(bbox[3], kps[:, 1].max()) + margin)))
+
+        with metrics.timer("align"):
+            # Same colour handling as before so new embeddings match the enrolled ones
+            rgb_region = cv2.cvtColor(image[y0:y1, x0:x1], cv2.COLOR_BGR2RGB)
+            rec_model = self.app.models["recognition"]
+            return face_align.norm_crop(rgb_region, landmark=kps - np.array([x0, y0], dtype=kps.dtype),
+                                        image_size=rec_model.input_size[0])
+
+    def _largest_face_crop(self, image: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Returns the aligned crop of the largest face, None if there are no faces.
+        """
+        bboxes, kpss = self._detect(image)
+        if bboxes.shape[0] == 0 or kpss is None:
+            return None
+
+        # Keep the largest face (generally the closest one)
+        areas = (bboxes[:, 2] - bboxes[:, 0]) * (bboxes[:, 3] - bboxes[:, 1])
+        largest = int(np.argmax(areas))
+        return self._aligned_crop(image, bboxes[largest], kpss[largest])
+
     def get_face_encoding(self, image) -> Optional[np.ndarray]:
         """
         Extract facial features from an image using IF.
@@ -49,31 +138,100 @@ class InsightFaceRecognizer(FaceRecognizer):
             print("IF is not initialized properly")
             return None
 
-        # Load image if path is provided
-        if isinstance(image, str):
-            image = cv2.imread(image)
+        # Load image if a path or encoded bytes are provided
+        image = ImageUtils.read_image(image)
 
         if image is None:
             return None
 
-        # Convert to RGB (InsightFace expects RGB)
-        rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        crop = self._largest_face_crop(image)
+        if crop is None:
+            return None
 
-        # Detect faces with embeddings
-        faces = self.app.get(rgb_image)
+        # Get embedding from the largest face
+        with metrics.timer("encode"):
+            return self.app.models["recognition"].get_feat([crop]).flatten()
 
-        if len(faces) == 0:
-            return None
+    def get_face_encodings_batch(self, images) -> List[Optional[np.ndarray]]:
+        """
+        Extract facial features from several images with one recognition call.
+        Detection runs per image; the aligned crops of the largest face of every
+        image are then stacked and embedded by the ArcFace model in a single batch.
+
+        Args:
+            images: List of inputs accepted by get_face_encoding
+
+        Returns:
+            List[Optional[np.ndarray]]: One encoding per image, None where no face is detected
+        """
+        if not self.is_initialized:
+            print("IF is not initialized properly")
+            return [None] * len(images)
+
+        crops = []
+        crop_owners = []
+
+        for position, image in enumerate(images):
+            image = ImageUtils.read_image(image)
+            if image is None:
+                continue
+
+            crop = self._largest_face_crop(image)
+            if crop is not None:
+                crops.append(crop)
+                crop_owners.append(position)
+
+        encodings: List[Optional[np.ndarray]] = [None] * len(images)
+        if crops:
+            with metrics.timer("encode"):
+                embeddings = self.app.models["recognition"].get_feat(crops)
+            for position, embedding in zip(crop_owners, embeddings):
+                encodings[position] = embedding.flatten()
 
-        # Get the largest face if multiple faces are detected
-        if len(faces) > 1:
-            # Sort by face area (bbox size)
-            faces = sorted(faces, key=lambda x: (x.bbox[2] - x.bbox[0]) * (x.bbox[3] - x.bbox[1]), reverse=True)
+        return encodings
 
-        # Get embedding from the first/largest face
-        face_encoding = faces[0].embedding
+    def get_all_face_encodings(self, image) -> List[Tuple[Tuple[int, int, int, int], np.ndarray]]:
+        """
+        Detects every face once and embeds all aligned crops in one recognition call.
+        Returns a list of (face location, encoding) pairs, locations as (top, right, bottom, left).
+        """
+        if not self.is_initialized:
+            print("IF is not initialized properly")
+            return []
 
-        return face_encoding
+        image = ImageUtils.read_image(image)
+
+        if image is None:
+            return []
+
+        bboxes, kpss = self._detect(image)
+        if bboxes.shape[0] == 0 or kpss is None:
+            return []
+
+        crops = [self._aligned_crop(image, bbox, kps) for bbox, kps in zip(bboxes, kpss)]
+        with metrics.timer("encode"):
+            embeddings = self.app.models["recognition"].get_feat(crops)
+
+        faces = []
+        for bbox, embedding in zip(bboxes, embeddings):
+            # IF returns bbox as (x1, y1, x2, y2)
+            left, top, right, bottom = (int(value) for value in bbox[:4])
+            faces.append(((top, right, bottom, left), embedding.flatten()))
+        return faces
+
+    def warm_up(self) -> None:
+        """
+        Runs the detector on a synthetic image and the recognition model on a
+        blank aligned crop, so both ONNX sessions are initialized.
+        """
+        if not self.is_initialized:
+            return
+
+        self.app.det_model.detect(np.zeros((480, 640, 3), dtype=np.uint8), max_num=0, metric="default")
+
+        rec_model = self.app.models["recognition"]
+        size = rec_model.input_size[0]
+        rec_model.get_feat([np.zeros((size, size, 3), dtype=np.uint8)])
 
     def detect_faces(self, image) -> List[Tuple[int, int, int, int]]:
         """
@@ -84,25 +242,20 @@ class InsightFaceRecognizer(FaceRecognizer):
             print("IF not initialized properly")
             return []
 
-        if isinstance(image, str):
-            image = cv2.imread(image)
+        image = ImageUtils.read_image(image)
 
         if image is None:
             return []
 
-        # Convert to RGB
-        rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-
-        # Detect faces
-        faces = self.app.get(rgb_image)
+        # Detect faces on the downscaled copy, boxes come back in full-resolution pixels
+        bboxes, _ = self._detect(image)
 
         # Convert to the format expected by our interface (top, right, bottom, left)
         face_locations = []
-        for face in faces:
-            bbox = face.bbox.astype(int)
+        for bbox in bboxes:
             # IF returns bbox as (x1, y1, x2, y2)
             # Convert to (top, right, bottom, left)
-            left, top, right, bottom = bbox
+            left, top, right, bottom = bbox[:4].astype(int)
             face_locations.append((top, right, bottom, left))
 
         return face_locations
@@ -0,0 +1,273 @@
+"""
+Bulk enrollment of users from a directory or a CSV file.
+
+Images are encoded across a pool of processes (one recognizer per process) and
+users are written to the database in large batches. Every processed username is
+appended to a checkpoint file, so an interrupted import resumes where it stopped.
+On resume, users that failed are tried again; users whose image had no face are
+only tried again with --retry-no-face.
+
+Input formats:
+- Directory with one image per user: <dir>/<username>.jpg
+- Directory with one folder per user: <dir>/<username>/<any image> (first image is used)
+- CSV file with username,image_path rows (a header row is optional)
+
+Usage (from the FacialRecognition folder):
+    python -m src.tools.bulk_enroll roster.csv --recognizer hybrid --workers 8
+    python -m src.tools.bulk_enroll photos/ --recognizer insightface
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional, Set, Tuple
+
+from src.utils.db_factory import create_db_manager
+from src.utils.face_gallery import FaceGallery
+from src import config
+
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+# Recognizer owned by each worker process
+_worker_recognizer = None
+
+
+def build_recognizer(name: str):
+    """
+    Creates a recognizer by name; imports are local so each backend is only
+    loaded when used.
+
+    Args:
+        name (str): "hybrid", "cnn", "dlib", "face_recognition" or "insightface"
+    """
+    if name == "hybrid":
+        from src.recognizers.hybrid_recognizer import HybridRecognizer
+        return HybridRecognizer(config.SHAPE_PREDICTOR_PATH, config.RECOGNITION_MODEL_PATH)
+    if name == "cnn":
+        from src.recognizers.dlib_cnn_recognizer import DlibCnnRecognizer
+        return DlibCnnRecognizer(config.SHAPE_PREDICTOR_PATH, config.RECOGNITION_MODEL_PATH,
+                                 config.CNN_DETECTOR_PATH)
+    if name == "dlib":
+        from src.recognizers.dlib_recognizer import DlibRecognizer
+        return DlibRecognizer(config.SHAPE_PREDICTOR_PATH, config.RECOGNITION_MODEL_PATH)
+    if name == "face_recognition":
+        from src.recognizers.face_recognition_lib_recognizer import FaceRecognitionLibRecognizer
+        return FaceRecognitionLibRecognizer()
+    if name == "insightface":
+        from src.recognizers.insightface_recognizer import InsightFaceRecognizer
+        models_path = os.path.join(os.path.expanduser("~"), ".insightface", "models")
+        return InsightFaceRecognizer(model_folder=models_path, allowed_modules=config.IF_ALLOWED_MODULES,
+                                     det_size=config.IF_DET_SIZE)
+    raise ValueError(f"Unknown recognizer '{name}'")
+
+
+def recognizer_metric(name: str) -> str:
+    """
+    Returns the gallery metric of a recognizer: "cosine" for InsightFace, whose
+    encodings are stored as unit vectors like the API register endpoint does,
+    "euclidean" for the dlib-based ones.
+    """
+    return "cosine" if name == "insightface" else "euclidean"
+
+
+def _init_worker(recognizer_name: str) -> None:
+    global _worker_recognizer
+    _worker_recognizer = build_recognizer(recognizer_name)
+
+
+def _encode_chunk(items: List[Tuple[str, str]]):
+    """
+    Encodes a chunk of (username, image path) items in a worker process.
+    """
+    encodings = _worker_recognizer.get_face_encodings_batch([path for _, path in items])
+    return [(username, path, encoding) for (username, path), encoding in zip(items, encodings)]
+
+
+def read_roster(source: str) -> List[Tuple[str, str]]:
+    """
+    Reads (username, image path) pairs from a directory or a CSV file.
+
+    Args:
+        source (str): Directory or CSV path
+    """
+    if os.path.isdir(source):
+        items = []
+        for entry in sorted(os.listdir(source)):
+            path = os.path.join(source, entry)
+            if os.path.isdir(path):
+                images = sorted(name for name in os.listdir(path) if name.lower().endswith(IMAGE_EXTENSIONS))
+                if images:
+                    items.append((entry, os.path.join(path, images[0])))
+            elif entry.lower().endswith(IMAGE_EXTENSIONS):
+                items.append((os.path.splitext(entry)[0], path))
+        return items
+
+    items = []
+    base_dir = os.path.dirname(os.path.abspath(source))
+    with open(source, newline='') as f:
+        for row in csv.reader(f):
+            if len(row) < 2 or (not items and row[0].strip().lower() == "username"):
+                continue
+            username, path = row[0].strip(), row[1].strip()
+            items.append((username, path if os.path.isabs(path) else os.path.join(base_dir, path)))
+    return items
+
+
+def read_checkpoint(checkpoint_file: str, statuses: Tuple[str, ...] = ("enrolled", "no_face")) -> Set[str]:
+    """
+    Returns the usernames whose latest status in a previous run is one of `statuses`.
+
+    Args:
+        checkpoint_file (str): Progress file
+        statuses (Tuple[str, ...]): Statuses that count as done
+    """
+    latest = {}
+    if os.path.exists(checkpoint_file):
+        with open(checkpoint_file, 'r') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    latest[entry["username"]] = entry.get("status")
+                except (json.JSONDecodeError, KeyError):
+                    continue
+    return {username for username, status in latest.items() if status in statuses}
+
+
+def write_checkpoint(checkpoint_file: str, entries: List[Tuple[str, str]]) -> None:
+    """
+    Appends (username, status) entries to the checkpoint and syncs it to disk.
+    """
+    if not entries:
+        return
+    with open(checkpoint_file, 'a') as f:
+        f.write("".join(json.dumps({"username": username, "status": status}) + "\n"
+                        for username, status in entries))
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def enroll(source: str, recognizer_name: str, db_file: str, images_dir: str,
+           checkpoint_file: Optional[str] = None, workers: Optional[int] = None,
+           chunk_size: int = 16, write_batch: int = 1000, retry_no_face: bool = False) -> dict:
+    """
+    Encodes and registers every user of a roster.
+
+    Args:
+        source (str): Directory or CSV file with the roster
+        recognizer_name (str): Recognizer used to encode the images
+        db_file (str): Database file users are written to
+        images_dir (str): Directory where user profile images are stored
+        checkpoint_file (Optional[str]): Progress file. Default is <db>.enroll.checkpoint.jsonl
+        workers (Optional[int]): Encoding processes. Default is the number of CPU cores
+        chunk_size (int): Images encoded per worker task
+        write_batch (int): Users written to the database per batch
+        retry_no_face (bool): Also retry users whose image had no face in a previous run
+
+    Returns:
+        dict: Counts of enrolled, skipped, no-face and failed users
+    """
+    checkpoint_file = checkpoint_file or f"{os.path.splitext(db_file)[0]}.enroll.checkpoint.jsonl"
+    db_manager = create_db_manager(db_file, images_dir)
+    # Compact once at the end instead of every few thousand users
+    db_manager.compact_every = sys.maxsize
+
+    done = read_checkpoint(checkpoint_file, ("enrolled",) if retry_no_face else ("enrolled", "no_face"))
+    roster = read_roster(source)
+    pending = [(username, path) for username, path in roster
+               if username not in done and not db_manager.user_exists(username)]
+    stats = {"total": len(roster), "skipped": len(roster) - len(pending),
+             "enrolled": 0, "no_face": 0, "failed": 0}
+    print(f"{len(roster)} users in roster, {len(pending)} to enroll")
+
+    normalize = recognizer_metric(recognizer_name) == "cosine"
+    chunks = [pending[i:i + chunk_size] for i in range(0, len(pending), chunk_size)]
+    workers = workers or os.cpu_count() or 1
+    buffer = []
+    failures = []
+
+    def flush():
+        saved = set(db_manager.save_users(buffer)) if buffer else set()
+        entries = [(username, "enrolled") for username, _, _ in buffer if username in saved]
+        entries += [(username, "failed") for username, _, _ in buffer if username not in saved]
+        write_checkpoint(checkpoint_file, entries + failures)
+        stats["enrolled"] += len(saved)
+        stats["failed"] += len(buffer) - len(saved)
+        buffer.clear()
+        failures.clear()
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(recognizer_name,)) as pool:
+        # Keep a bounded number of chunks in flight so memory stays flat on large rosters
+        next_chunk = 0
+        in_flight = {}
+        while next_chunk < len(chunks) or in_flight:
+            while next_chunk < len(chunks) and len(in_flight) < 2 * workers:
+                in_flight[pool.submit(_encode_chunk, chunks[next_chunk])] = chunks[next_chunk]
+                next_chunk += 1
+
+            finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                chunk = in_flight.pop(future)
+                try:
+                    results = future.result()
+                except BrokenProcessPool:
+                    raise
+                except Exception as e:
+                    if len(chunk) > 1:
+                        # Retry one image per task so a single bad image only fails its own user
+                        print(f"Error encoding chunk, retrying its {len(chunk)} images one by one: {e}")
+                        chunks.extend([item] for item in chunk)
+                    else:
+                        print(f"Error encoding {chunk[0][1]}: {e}")
+                        failures.append((chunk[0][0], "failed"))
+                        stats["failed"] += 1
+                    continue
+
+                for username, path, encoding in results:
+                    if encoding is None:
+                        failures.append((username, "no_face"))
+                        stats["no_face"] += 1
+                    else:
+                        buffer.append((username, FaceGallery.normalize(encoding) if normalize else encoding, path))
+
+            if len(buffer) >= write_batch:
+                flush()
+                print(f"Enrolled {stats['enrolled']}/{len(pending)}")
+
+    flush()
+    db_manager.save_database()
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk-enroll users from a directory or CSV roster")
+    parser.add_argument("source", help="Directory of images or CSV file with username,image_path rows")
+    parser.add_argument("--recognizer", default="hybrid",
+                        choices=["hybrid", "cnn", "dlib", "face_recognition", "insightface"])
+    parser.add_argument("--db-file", help="Database file. Default depends on the recognizer")
+    parser.add_argument("--images-dir", help="User images directory. Default depends on the recognizer")
+    parser.add_argument("--checkpoint", help="Checkpoint file used to resume interrupted imports")
+    parser.add_argument("--workers", type=int, help="Encoding processes (default: CPU cores)")
+    parser.add_argument("--chunk-size", type=int, default=16, help="Images per worker task")
+    parser.add_argument("--write-batch", type=int, default=1000, help="Users written per database batch")
+    parser.add_argument("--retry-no-face", action="store_true",
+                        help="Retry users whose image had no face in a previous run")
+    args = parser.parse_args(argv)
+
+    is_insightface = args.recognizer == "insightface"
+    db_file = args.db_file or (config.DB_FILE_IF if is_insightface else config.DB_FILE)
+    images_dir = args.images_dir or (config.IMAGES_DIR_IF if is_insightface else config.IMAGES_DIR)
+
+    stats = enroll(args.source, args.recognizer, db_file, images_dir, args.checkpoint,
+                   args.workers, args.chunk_size, args.write_batch, args.retry_no_face)
+    print(f"Enrolled: {stats['enrolled']}, skipped: {stats['skipped']}, "
+          f"no face: {stats['no_face']}, failed: {stats['failed']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,310 @@
+"""
+Calibration of the match tolerance of a recognizer on a labelled dataset.
+
+Every image is encoded once and the embeddings are cached, so re-running with
+other operating points costs no inference. All pairs of images are then
+compared in blocks with matrix products:
+- genuine pairs: same identity
+- impostor pairs: different identities
+Their distances are accumulated into fine histograms, which give the false
+accept rate (FAR) and false reject rate (FRR) at every threshold.
+
+The tolerance is the largest distance whose FAR stays under --target-far.
+The "ALTO" and "MEDIO" security levels get the thresholds at stricter FARs.
+Note that /api/verify searches the whole gallery: with N users, the chance
+that an impostor matches someone is roughly N * FAR.
+
+Input formats:
+- Directory with one folder per identity: <dir>/<identity>/<images>
+- CSV file with identity,image_path rows (a header row is optional)
+
+Usage (from the FacialRecognition folder):
+    python -m src.tools.calibrate_threshold lfw/ --recognizer hybrid --target-far 1e-4
+    python -m src.tools.calibrate_threshold lfw/ --recognizer insightface --levels ALTO=1e-6 MEDIO=1e-5 --write
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.tools.bulk_enroll import build_recognizer, recognizer_metric, IMAGE_EXTENSIONS
+from src.utils import calibration
+from src import config
+
+
+# Recognizer owned by each worker process
+_worker_recognizer = None
+
+
+def _init_worker(recognizer_name: str) -> None:
+    global _worker_recognizer
+    _worker_recognizer = build_recognizer(recognizer_name)
+
+
+def _encode_chunk(paths: List[str]) -> List[Optional[np.ndarray]]:
+    return _worker_recognizer.get_face_encodings_batch(paths)
+
+
+def read_labelled(source: str) -> List[Tuple[str, str]]:
+    """
+    Reads (identity, image path) pairs from a directory or a CSV file.
+
+    Args:
+        source (str): Directory with one folder per identity, or CSV path
+    """
+    items = []
+    if os.path.isdir(source):
+        for identity in sorted(os.listdir(source)):
+            folder = os.path.join(source, identity)
+            if os.path.isdir(folder):
+                items.extend((identity, os.path.join(folder, name)) for name in sorted(os.listdir(folder))
+                             if name.lower().endswith(IMAGE_EXTENSIONS))
+        return items
+
+    base_dir = os.path.dirname(os.path.abspath(source))
+    with open(source, newline='') as f:
+        for row in csv.reader(f):
+            if len(row) < 2 or (not items and row[0].strip().lower() in ("identity", "username")):
+                continue
+            identity, path = row[0].strip(), row[1].strip()
+            items.append((identity, path if os.path.isabs(path) else os.path.join(base_dir, path)))
+    return items
+
+
+def _file_key(path: str) -> str:
+    stat = os.stat(path)
+    return f"{os.path.abspath(path)}|{stat.st_size}|{int(stat.st_mtime)}"
+
+
+def encode_dataset(paths: List[str], recognizer_name: str, cache_file: str,
+                   workers: Optional[int] = None, chunk_size: int = 16) -> List[Optional[np.ndarray]]:
+    """
+    Encodes every image, reusing the embeddings cached by previous runs.
+    Cache entries are keyed by path, size and modification time.
+
+    Returns:
+        List[Optional[np.ndarray]]: One encoding per path, None where no face was found
+    """
+    cached = {}
+    if os.path.exists(cache_file):
+        with np.load(cache_file, allow_pickle=False) as data:
+            cached = {key: encoding for key, encoding, found in zip(data["keys"], data["encodings"], data["found"])
+                      if found}
+            cached.update({key: None for key, found in zip(data["keys"], data["found"]) if not found})
+
+    keys = [_file_key(path) for path in paths]
+    missing = [position for position, key in enumerate(keys) if key not in cached]
+    print(f"{len(paths) - len(missing)} embeddings cached, {len(missing)} to encode")
+
+    if missing:
+        chunks = [missing[i:i + chunk_size] for i in range(0, len(missing), chunk_size)]
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1, initializer=_init_worker,
+                                 initargs=(recognizer_name,)) as pool:
+            results = pool.map(_encode_chunk, [[paths[position] for position in chunk] for chunk in chunks])
+            for chunk, encodings in zip(chunks, results):
+                for position, encoding in zip(chunk, encodings):
+                    cached[keys[position]] = encoding
+
+        found = [key for key, encoding in cached.items() if encoding is not None]
+        dimensions = len(cached[found[0]]) if found else 0
+        os.makedirs(os.path.dirname(os.path.abspath(cache_file)), exist_ok=True)
+        np.savez(cache_file,
+                 keys=np.array(list(cached.keys())),
+                 found=np.array([encoding is not None for encoding in cached.values()]),
+                 encodings=np.array([encoding if encoding is not None else np.zeros(dimensions)
+                                     for encoding in cached.values()], dtype=np.float32).reshape(-1, dimensions))
+
+    return [cached[key] for key in keys]
+
+
+def pair_histograms(labels: np.ndarray, encodings: np.ndarray, metric: str, step: float,
+                    max_distance: float, block_size: int = 1024) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Histograms of the genuine and impostor distances over all unordered pairs.
+    The distance matrix is computed one block of rows at a time, so memory
+    stays at block_size x N whatever the dataset size.
+
+    Args:
+        labels (np.ndarray): Integer identity of each encoding
+        encodings (np.ndarray): (N, D) encodings
+        metric (str): "euclidean" or "cosine" (1 - cosine similarity)
+        step (float): Histogram bin width
+        max_distance (float): Distances above it fall in the last bin
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Genuine and impostor counts per bin
+    """
+    encodings = np.asarray(encodings, dtype=np.float32)
+    if metric == "cosine":
+        norms = np.linalg.norm(encodings, axis=1, keepdims=True)
+        encodings = encodings / np.where(norms > 0, norms, 1.0)
+    squared_norms = np.einsum("ij,ij->i", encodings, encodings)
+
+    n_bins = int(np.ceil(max_distance / step)) + 1
+    genuine = np.zeros(n_bins, dtype=np.int64)
+    impostor = np.zeros(n_bins, dtype=np.int64)
+    n = len(encodings)
+
+    for start in range(0, n, block_size):
+        stop = min(n, start + block_size)
+        products = encodings[start:stop] @ encodings[start:].T
+        if metric == "cosine":
+            distances = 1.0 - products
+        else:
+            distances = squared_norms[start:stop, None] - 2.0 * products + squared_norms[None, start:]
+            np.maximum(distances, 0.0, out=distances)
+            np.sqrt(distances, out=distances)
+
+        # Only pairs (i, j) with j > i, each unordered pair is counted once
+        upper = np.arange(start, n)[None, :] > np.arange(start, stop)[:, None]
+        same = labels[start:stop, None] == labels[None, start:]
+        bins = np.minimum((np.maximum(distances, 0.0) / step).astype(np.int64), n_bins - 1)
+        genuine += np.bincount(bins[upper & same], minlength=n_bins)
+        impostor += np.bincount(bins[upper & ~same], minlength=n_bins)
+
+    return genuine, impostor
+
+
+def error_rates(genuine: np.ndarray, impostor: np.ndarray, step: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    FAR and FRR when accepting every distance up to each bin's upper edge.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: Thresholds, FAR and FRR per bin
+    """
+    thresholds = (np.arange(len(genuine)) + 1) * step
+    far = np.cumsum(impostor) / max(1, impostor.sum())
+    frr = 1.0 - np.cumsum(genuine) / max(1, genuine.sum())
+    return thresholds, far, frr
+
+
+def threshold_at_far(thresholds: np.ndarray, far: np.ndarray, target: float) -> Optional[int]:
+    """
+    Returns the bin of the largest threshold whose FAR does not exceed `target`,
+    None if even the smallest threshold accepts more impostors than that.
+    """
+    allowed = np.nonzero(far <= target)[0]
+    return int(allowed[-1]) if len(allowed) else None
+
+
+def operating_point(thresholds, far, frr, position: int) -> dict:
+    return {"threshold": round(float(thresholds[position]), 6), "far": float(far[position]),
+            "frr": float(frr[position])}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Calibrate the match tolerance on a labelled dataset")
+    parser.add_argument("source", help="Directory with one folder per identity or CSV with identity,image_path rows")
+    parser.add_argument("--recognizer", default="hybrid", choices=sorted(config.DEFAULT_TOLERANCES))
+    parser.add_argument("--target-far", type=float, default=1e-3, help="FAR at the tolerance")
+    parser.add_argument("--levels", nargs="*", default=["ALTO=1e-5", "MEDIO=1e-4"],
+                        help="FAR of each security level, as LEVEL=far")
+    parser.add_argument("--report-far", type=float, nargs="*", default=[1e-2, 1e-3, 1e-4, 1e-5, 1e-6])
+    parser.add_argument("--step", type=float, default=0.0005, help="Distance histogram resolution")
+    parser.add_argument("--cache", help="Embedding cache file. Default is data/calibration_<recognizer>.npz")
+    parser.add_argument("--workers", type=int, help="Encoding processes (default: CPU cores)")
+    parser.add_argument("--output", help="Write the ROC and operating points as JSON to this file")
+    parser.add_argument("--write", action="store_true", help=f"Store the tolerance in {config.CALIBRATION_FILE}")
+    args = parser.parse_args(argv)
+
+    metric = recognizer_metric(args.recognizer)
+    cache_file = args.cache or os.path.join(config.DATA_DIR, f"calibration_{args.recognizer}.npz")
+
+    items = read_labelled(args.source)
+    encodings = encode_dataset([path for _, path in items], args.recognizer, cache_file, args.workers)
+    kept = [(identity, encoding) for (identity, _), encoding in zip(items, encodings) if encoding is not None]
+    if len(kept) < 2:
+        print("Not enough faces to calibrate")
+        return 1
+
+    identities, labels = np.unique([identity for identity, _ in kept], return_inverse=True)
+    matrix = np.stack([encoding for _, encoding in kept])
+    print(f"{len(kept)}/{len(items)} images with a face, {len(identities)} identities")
+
+    genuine, impostor = pair_histograms(labels, matrix, metric, args.step, max_distance=2.0)
+    if genuine.sum() == 0 or impostor.sum() == 0:
+        print("Need at least one identity with two images and two identities")
+        return 1
+    print(f"{genuine.sum()} genuine pairs, {impostor.sum()} impostor pairs")
+
+    thresholds, far, frr = error_rates(genuine, impostor, args.step)
+    eer_position = int(np.argmin(np.abs(far - frr)))
+    default_position = min(len(thresholds) - 1, max(0, int(np.ceil(config.DEFAULT_TOLERANCES[args.recognizer] / args.step)) - 1))
+
+    for target in [args.target_far] + args.report_far:
+        if target * impostor.sum() < 10:
+            print(f"Warning: FAR {target:g} is estimated from fewer than 10 impostor pairs, use a larger dataset")
+            break
+
+    print(f"\n{'operating point':<22}{'threshold':>10}{'FAR':>12}{'FRR':>10}")
+    points: Dict[str, dict] = {}
+    for target in args.report_far:
+        position = threshold_at_far(thresholds, far, target)
+        if position is not None:
+            points[f"far<={target:g}"] = operating_point(thresholds, far, frr, position)
+    points["eer"] = operating_point(thresholds, far, frr, eer_position)
+    points["built-in tolerance"] = operating_point(thresholds, far, frr, default_position)
+    for name, point in points.items():
+        print(f"{name:<22}{point['threshold']:>10.4f}{point['far']:>12.2e}{point['frr']:>10.4f}")
+
+    # A tolerance below every impostor distance can't be derived from the histogram;
+    # writing the smallest threshold instead would make every verification fail
+    targets = {"tolerance": args.target_far}
+    for spec in args.levels:
+        level, _, target = spec.partition("=")
+        targets[level] = float(target)
+    positions = {name: threshold_at_far(thresholds, far, target) for name, target in targets.items()}
+    unreachable = [name for name, position in positions.items() if position is None]
+    if unreachable:
+        for name in unreachable:
+            print(f"ERROR: FAR {targets[name]:g} ({name}) is not reachable: {int(impostor[0])} impostor pairs "
+                  f"are closer than the first threshold {args.step:g}. Use a smaller --step, a higher FAR "
+                  f"or a dataset with more separable identities")
+        print("Nothing was written")
+        return 1
+
+    tolerance_point = operating_point(thresholds, far, frr, positions.pop("tolerance"))
+    points[f"tolerance (far<={args.target_far:g})"] = tolerance_point
+    print(f"{'tolerance':<22}{tolerance_point['threshold']:>10.4f}{tolerance_point['far']:>12.2e}"
+          f"{tolerance_point['frr']:>10.4f}")
+
+    levels = {level: operating_point(thresholds, far, frr, position) for level, position in positions.items()}
+    missing_levels = [level for level in calibration.SECURITY_LEVELS if level not in levels]
+    if missing_levels:
+        print(f"Missing security levels {missing_levels}, the confidence bands stay in use")
+
+    entry = {
+        "tolerance": tolerance_point["threshold"],
+        "metric": metric,
+        "target_far": args.target_far,
+        "far": tolerance_point["far"],
+        "frr": tolerance_point["frr"],
+        "security_levels": {level: point["threshold"] for level, point in levels.items()} if not missing_levels else None,
+        "images": len(kept),
+        "identities": len(identities),
+        "genuine_pairs": int(genuine.sum()),
+        "impostor_pairs": int(impostor.sum()),
+    }
+
+    if args.write:
+        calibration.save_calibration(args.recognizer, entry)
+        print(f"\nTolerance {entry['tolerance']} written to {config.CALIBRATION_FILE}")
+
+    if args.output:
+        # ROC sampled every 0.01 of distance; the histograms keep the full resolution
+        every = max(1, int(round(0.01 / args.step)))
+        roc = [{"threshold": round(float(t), 6), "far": float(a), "frr": float(r)}
+               for t, a, r in zip(thresholds[every - 1::every], far[every - 1::every], frr[every - 1::every])]
+        with open(args.output, "w") as f:
+            json.dump({"recognizer": args.recognizer, "calibration": entry, "operating_points": points,
+                       "security_levels": levels, "roc": roc}, f, indent=4)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,65 @@
+"""
+Migrates a JSON user database to the binary embedding store.
+
+Usage (from the FacialRecognition folder):
+    python -m src.tools.migrate_json_to_binary data/users_db.json
+    python -m src.tools.migrate_json_to_binary data/users_db_IF.json --images-dir data/images_IF
+"""
+import argparse
+import os
+import sys
+
+from src.utils.binary_db_manager import BinaryDBManager
+from src.utils.db_manager import DBManager
+from src import config
+
+
+def migrate(json_file: str, images_dir: str, overwrite: bool = False) -> int:
+    """
+    Copies every user of a JSON database, snapshot and journal, into a binary store next to it.
+    Image files are not copied; records keep their existing image paths.
+
+    Args:
+        json_file (str): Path to the JSON database
+        images_dir (str): Directory where user profile images are stored
+        overwrite (bool): Replace an existing binary store instead of failing
+
+    Returns:
+        int: Number of users migrated
+    """
+    source = DBManager(json_file, images_dir)
+    if not os.path.exists(json_file) and not os.path.exists(source.journal_file):
+        raise FileNotFoundError(f"Database file not found: {json_file}")
+    # Replays the journal too, which holds the registrations since the last snapshot
+    users = source.get_all_users()
+
+    target = BinaryDBManager(json_file, images_dir)
+    if target.get_all_users():
+        if not overwrite:
+            raise FileExistsError(f"{target.meta_file} already contains users, use --overwrite")
+        for path in (target.vectors_file, target.meta_file):
+            os.remove(path)
+        target = BinaryDBManager(json_file, images_dir)
+
+    return target.import_users(users)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Migrate a JSON user database to the binary store")
+    parser.add_argument("json_file", nargs="?", default=config.DB_FILE, help="JSON database to migrate")
+    parser.add_argument("--images-dir", default=config.IMAGES_DIR, help="User images directory")
+    parser.add_argument("--overwrite", action="store_true", help="Replace an existing binary store")
+    args = parser.parse_args(argv)
+
+    try:
+        count = migrate(args.json_file, args.images_dir, args.overwrite)
+    except (OSError, ValueError) as e:
+        print(f"ERROR: {e}")
+        return 1
+
+    print(f"Migrated {count} users from {args.json_file}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,340 @@
+import json
+import os
+from typing import Dict, Any, Optional, List, Tuple
+from datetime import datetime
+import numpy as np
+
+from .db_manager import DBManager
+from .face_gallery import FaceGallery
+
+
+class BinaryDBManager(DBManager):
+    """
+    Database manager that stores face encodings in a raw float32 file.
+    - <db>.f32: encodings, one row per record, memory-mapped on load (zero-copy)
+    - <db>.meta.jsonl: header line plus one metadata line per record
+
+    Both files are append-only, so each registration costs O(1) regardless of
+    gallery size. When a user is saved twice the latest record wins.
+    The .f32 file is preallocated with geometric growth and mapped once per
+    growth; rows past the last metadata record are unused.
+    Templates of multi-capture users are stored as extra rows after the
+    centroids of the same write; their metadata line keeps [first row, count].
+    """
+
+    def __init__(self, db_file: str, images_dir: str):
+        """
+        Initializes the binary database manager.
+
+        Args:
+            db_file (str): Path of the database; its extension is replaced by .f32 and .meta.jsonl
+            images_dir (str): Directory path where user profile images will be stored
+        """
+        base_path = os.path.splitext(db_file)[0]
+        self.vectors_file = f"{base_path}.f32"
+        self.meta_file = f"{base_path}.meta.jsonl"
+        self.dimensions = None
+        self._row_count = 0
+        self._capacity = 0
+        self._vectors = None
+        self._records: Dict[str, Dict[str, Any]] = {}
+        super().__init__(db_file, images_dir)
+
+    def _load_database(self) -> Dict[str, Any]:
+        """
+        Memory-maps the encodings file and reads the metadata sidecar.
+
+        Returns:
+            Dict[str, Any]: Dictionary containing user data; each face_encoding is a
+                           read-only view into the memory-mapped file
+        """
+        if not os.path.exists(self.meta_file):
+            return {}
+
+        records = []
+        valid_end = 0
+        offset = 0
+        with open(self.meta_file, 'rb') as f:
+            header = f.readline()
+            try:
+                self.dimensions = json.loads(header)["dimensions"]
+            except (ValueError, KeyError):
+                # The header is written alone before the first record; rewrite it on the next save
+                print(f"Ignoring incomplete header in {self.meta_file}")
+                self.dimensions = None
+                return {}
+            offset = valid_end = len(header)
+
+            for line in f:
+                offset += len(line)
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    # A partially written last line after a crash is ignored
+                    print(f"Skipping corrupt record in {self.meta_file}")
+                    continue
+                valid_end = offset
+
+        self._repair_journal(self.meta_file, valid_end, offset)
+
+        row_size = self.dimensions * np.dtype(np.float32).itemsize
+        vectors_size = os.path.getsize(self.vectors_file) if os.path.exists(self.vectors_file) else 0
+        stored_rows = vectors_size // row_size
+
+        # Rows past the last valid record are leftovers of an interrupted write;
+        # the next append overwrites them
+        records = [record for record in records if self._record_end(record) <= stored_rows]
+        self._row_count = max((self._record_end(record) for record in records), default=0)
+        self._map_vectors()
+
+        users_db = {}
+        for record in records:
+            self._records[record["username"]] = record
+            users_db[record["username"]] = self._user_entry(record, record["row"])
+        return users_db
+
+    @staticmethod
+    def _record_end(record: Dict[str, Any]) -> int:
+        """
+        Returns the row after the last one used by a metadata record, templates included.
+        """
+        if record.get("templates"):
+            first, count = record["templates"]
+            return max(record["row"] + 1, first + count)
+        return record["row"] + 1
+
+    def _user_entry(self, record: Dict[str, Any], row: int) -> Dict[str, Any]:
+        user_data = {
+            'face_encoding': self._vectors[row],
+            'image_path': record["image_path"],
+            'created_at': record["created_at"],
+            'row': row
+        }
+        if record.get("templates"):
+            first, count = record["templates"]
+            user_data['templates'] = self._vectors[first:first + count]
+        return user_data
+
+    def _map_vectors(self) -> None:
+        """
+        Maps the whole preallocated file. Rows written later through the file
+        are visible in the map, so it only has to be replaced when the file grows.
+        """
+        row_size = (self.dimensions or 0) * np.dtype(np.float32).itemsize
+        vectors_size = os.path.getsize(self.vectors_file) if os.path.exists(self.vectors_file) else 0
+        self._capacity = vectors_size // row_size if row_size else 0
+        if self._capacity == 0:
+            self._vectors = np.zeros((0, self.dimensions or 0), dtype=np.float32)
+            return
+        self._vectors = np.memmap(self.vectors_file, dtype=np.float32, mode='r',
+                                  shape=(self._capacity, self.dimensions))
+
+    def _remap_users(self) -> None:
+        """
+        Maps the grown file and points every user at the new map, so the
+        previous mapping is released instead of kept alive by old views.
+        """
+        self._map_vectors()
+        for username, record in self._records.items():
+            self.users_db[username] = self._user_entry(record, record["row"])
+
+    def save_database(self) -> bool:
+        # Records are appended as they are saved; there is nothing to rewrite
+        return True
+
+    def _append_records(self, records: List[Dict[str, Any]], encodings: np.ndarray,
+                        templates: Optional[List[Optional[np.ndarray]]] = None) -> None:
+        """
+        Appends encodings and their metadata in a single write per file.
+
+        Args:
+            records (List[Dict[str, Any]]): username, image_path and created_at of each record
+            encodings (np.ndarray): (len(records), D) matrix of encodings
+            templates (Optional[List[Optional[np.ndarray]]]): (T, D) templates of each record, or None
+        """
+        encodings = np.ascontiguousarray(encodings, dtype=np.float32)
+
+        if self.dimensions is None:
+            self.dimensions = encodings.shape[1]
+            # Drop leftovers from an interrupted first write before writing the header
+            open(self.vectors_file, 'wb').close()
+            with open(self.meta_file, 'w') as f:
+                f.write(json.dumps({"format": "float32", "dimensions": self.dimensions}) + "\n")
+        elif encodings.shape[1] != self.dimensions:
+            raise ValueError(f"Expected {self.dimensions}-dimensional encodings, got {encodings.shape[1]}")
+
+        first_row = self._row_count
+
+        # Template rows go after the centroids of this write
+        blocks = [encodings]
+        template_rows = []
+        next_row = first_row + len(records)
+        for record_templates in templates or [None] * len(records):
+            if record_templates is None or len(record_templates) < 2:
+                template_rows.append(None)
+                continue
+            block = np.ascontiguousarray(record_templates, dtype=np.float32).reshape(-1, self.dimensions)
+            blocks.append(block)
+            template_rows.append([next_row, len(block)])
+            next_row += len(block)
+        data = np.concatenate(blocks) if len(blocks) > 1 else encodings
+
+        # Write vectors before metadata so a record never points past the end of the file
+        grow = next_row > self._capacity
+        with open(self.vectors_file, 'r+b' if os.path.exists(self.vectors_file) else 'wb') as f:
+            f.seek(first_row * self.dimensions * data.itemsize)
+            f.write(data.tobytes())
+            if grow:
+                # Doubling keeps the number of remaps logarithmic in the gallery size
+                capacity = max(next_row, 2 * self._capacity, 1024)
+                f.truncate(capacity * self.dimensions * data.itemsize)
+            f.flush()
+            os.fsync(f.fileno())
+
+        lines = []
+        for offset, record in enumerate(records):
+            record = dict(record, row=first_row + offset)
+            if template_rows[offset]:
+                record["templates"] = template_rows[offset]
+            records[offset] = record
+            lines.append(json.dumps(record, separators=(',', ':')) + "\n")
+
+        with open(self.meta_file, 'a') as f:
+            f.write("".join(lines))
+            f.flush()
+            os.fsync(f.fileno())
+
+        self._row_count = next_row
+        for record in records:
+            self._records[record["username"]] = record
+        if grow:
+            self._remap_users()
+        else:
+            for record in records:
+                self.users_db[record["username"]] = self._user_entry(record, record["row"])
+
+    def save_user(self, username: str, face_encoding: np.ndarray,
+                  original_image_path: str, templates: Optional[np.ndarray] = None) -> bool:
+        """
+        Saves a new user by appending its rows and one metadata line.
+
+        Args:
+            username (str): Username of the new user
+            face_encoding (np.ndarray): Facial encoding data; the centroid when templates are given
+            original_image_path (str): Path to user's profile image
+            templates (Optional[np.ndarray]): (T, D) encodings of every capture of the user
+        """
+        if face_encoding is None:
+            print("Error saving user: binary store requires a face encoding")
+            return False
+
+        try:
+            saved_image_path = self._save_user_image(original_image_path, username)
+            if not saved_image_path:
+                return False
+
+            record = {
+                'username': username,
+                'image_path': saved_image_path,
+                'created_at': datetime.now().isoformat()
+            }
+            self._append_records([record], np.asarray(face_encoding).reshape(1, -1), [templates])
+
+            for gallery in self.galleries:
+                gallery.add(username, face_encoding, templates)
+            return True
+        except Exception as e:
+            print(f"Error saving user: {e}")
+            return False
+
+    def save_users(self, users: List[Tuple[str, np.ndarray, str]]) -> List[str]:
+        """
+        Saves many users with one append per file, used for bulk enrollment.
+
+        Args:
+            users (List[Tuple[str, np.ndarray, str]]): (username, face encoding,
+                                                        original image path) of each user
+
+        Returns:
+            List[str]: Usernames that were saved; users without encoding or whose
+                       image can't be copied are skipped
+        """
+        records = []
+        encodings = []
+        for username, face_encoding, original_image_path in users:
+            if face_encoding is None:
+                continue
+            saved_image_path = self._save_user_image(original_image_path, username)
+            if not saved_image_path:
+                continue
+            records.append({
+                'username': username,
+                'image_path': saved_image_path,
+                'created_at': datetime.now().isoformat()
+            })
+            encodings.append(np.asarray(face_encoding, dtype=np.float32).ravel())
+
+        if not records:
+            return []
+
+        try:
+            self._append_records(records, np.stack(encodings))
+        except Exception as e:
+            print(f"Error saving users: {e}")
+            return []
+
+        self._add_to_galleries([(record['username'], encoding) for record, encoding in zip(records, encodings)])
+        return [record['username'] for record in records]
+
+    def import_users(self, users: Dict[str, Dict[str, Any]]) -> int:
+        """
+        Appends many existing user records at once, keeping their image paths and dates.
+
+        Args:
+            users (Dict[str, Dict[str, Any]]): Mapping of username to user data
+                                               in the JSON database format
+
+        Returns:
+            int: Number of users imported
+        """
+        records = []
+        encodings = []
+        templates = []
+        for username, user_data in users.items():
+            if user_data.get('face_encoding') is None:
+                continue
+            records.append({
+                'username': username,
+                'image_path': user_data.get('image_path', ''),
+                'created_at': user_data.get('created_at', datetime.now().isoformat())
+            })
+            encodings.append(np.asarray(user_data['face_encoding'], dtype=np.float32))
+            templates.append(self.unpack_templates(user_data))
+
+        if records:
+            self._append_records(records, np.stack(encodings), templates)
+            for gallery in self.galleries:
+                for record, encoding, user_templates in zip(records, encodings, templates):
+                    gallery.add(record['username'], encoding, user_templates)
+        return len(records)
+
+    def register_gallery(self, gallery: FaceGallery) -> FaceGallery:
+        """
+        Bulk-loads the memory-mapped encodings into a gallery and keeps it in sync.
+
+        Args:
+            gallery (FaceGallery): Gallery to populate
+
+        Returns:
+            FaceGallery: The same gallery, for chaining
+        """
+        usernames = list(self.users_db.keys())
+        rows = np.array([self.users_db[username]['row'] for username in usernames], dtype=np.int64)
+        gallery.load_matrix(usernames, self._vectors[rows] if len(rows) else self._vectors)
+        for username in usernames:
+            templates = self.users_db[username].get('templates')
+            if templates is not None:
+                # Copied so the gallery does not keep a mapping alive after the file grows
+                gallery.set_templates(username, np.array(templates))
+        self.galleries.append(gallery)
+        return gallery
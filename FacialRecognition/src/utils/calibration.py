@@ -0,0 +1,97 @@
+import json
+import os
+from datetime import datetime
+from typing import Dict, Optional
+
+from src import config
+
+
+# Security levels from strictest to loosest; each one is a maximum distance
+SECURITY_LEVELS = ("ALTO", "MEDIO")
+
+
+def load_calibration(path: Optional[str] = None) -> Dict[str, dict]:
+    """
+    Reads the thresholds written by src/tools/calibrate_threshold.py.
+
+    Args:
+        path (Optional[str]): Calibration file. Default is config.CALIBRATION_FILE
+
+    Returns:
+        Dict[str, dict]: Calibration entry by recognizer name, empty if there is no file
+    """
+    path = path or config.CALIBRATION_FILE
+    if not os.path.exists(path):
+        return {}
+
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"Error reading calibration file: {e}")
+        return {}
+
+
+def save_calibration(recognizer_name: str, entry: dict, path: Optional[str] = None) -> None:
+    """
+    Stores the calibration of one recognizer, keeping the entries of the others.
+
+    Args:
+        recognizer_name (str): "hybrid", "cnn", "dlib", "face_recognition" or "insightface"
+        entry (dict): Tolerance, security level thresholds and the measured error rates
+        path (Optional[str]): Calibration file. Default is config.CALIBRATION_FILE
+    """
+    path = path or config.CALIBRATION_FILE
+    calibration = load_calibration(path)
+    calibration[recognizer_name] = dict(entry, calibrated_at=datetime.now().isoformat())
+
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w') as f:
+        json.dump(calibration, f, indent=4)
+    os.replace(temp_path, path)
+
+
+def calibrated_tolerance(recognizer_name: str) -> float:
+    """
+    Returns the calibrated tolerance of a recognizer, or its built-in tolerance
+    from config.DEFAULT_TOLERANCES if it was never calibrated.
+    """
+    entry = load_calibration().get(recognizer_name, {})
+    return float(entry.get("tolerance", config.DEFAULT_TOLERANCES[recognizer_name]))
+
+
+def calibrated_security_levels(recognizer_name: str) -> Optional[Dict[str, float]]:
+    """
+    Returns the maximum distance of each security level, None if not calibrated.
+    """
+    levels = load_calibration().get(recognizer_name, {}).get("security_levels")
+    if not levels or any(level not in levels for level in SECURITY_LEVELS):
+        return None
+    return {level: float(levels[level]) for level in SECURITY_LEVELS}
+
+
+def security_level(distance: float, confidence: float,
+                   levels: Optional[Dict[str, float]] = None) -> str:
+    """
+    Classifies an accepted match as "ALTO", "MEDIO" or "BAJO".
+
+    Calibrated levels compare the distance with the thresholds measured at
+    stricter false-accept rates than the tolerance. Without a calibration the
+    confidence percentage is used.
+
+    Args:
+        distance (float): Distance of the match
+        confidence (float): Confidence percentage derived from the tolerance
+        levels (Optional[Dict[str, float]]): Maximum distance of each level
+    """
+    if levels:
+        for level in SECURITY_LEVELS:
+            if distance <= levels[level]:
+                return level
+        return "BAJO"
+
+    if confidence > 95:
+        return "ALTO"
+    if confidence > 85:
+        return "MEDIO"
+    return "BAJO"
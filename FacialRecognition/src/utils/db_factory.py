@@ -0,0 +1,31 @@
+from typing import Optional
+
+from .db_manager import DBManager
+from .. import config
+
+
+def create_db_manager(db_file: str, images_dir: str, backend: Optional[str] = None) -> DBManager:
+    """
+    Creates the database manager for the configured storage backend.
+
+    Args:
+        db_file (str): Path to the database file
+        images_dir (str): Directory path where user profile images will be stored
+        backend (Optional[str]): "json", "binary" or "sqlite". Default is config.DB_BACKEND
+
+    Returns:
+        DBManager: Database manager instance
+    """
+    backend = backend or config.DB_BACKEND
+
+    if backend == "binary":
+        from .binary_db_manager import BinaryDBManager
+        return BinaryDBManager(db_file, images_dir)
+
+    if backend == "sqlite":
+        from .sqlite_db_manager import SQLiteDBManager
+        return SQLiteDBManager(db_file, images_dir)
+
+    if backend != "json":
+        print(f"Unknown database backend '{backend}', using json")
+    return DBManager(db_file, images_dir)
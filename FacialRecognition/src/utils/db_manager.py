@@ -1,23 +1,50 @@
+import base64
 import json
 import os
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Tuple
 from datetime import datetime
 import shutil
 import numpy as np
 
+from .face_gallery import FaceGallery
+from .metrics import metrics
+
+
 class DBManager:
-    def __init__(self, db_file: str, images_dir: str):
+    """
+    JSON database manager.
+    The JSON file is a snapshot; each save_user only appends one line to a journal
+    file next to it (<db>.journal.jsonl), so registration cost does not depend on
+    gallery size. The journal is compacted into a new snapshot every
+    `compact_every` records, and on startup the state is rebuilt from the
+    snapshot plus the journal.
+
+    Users enrolled from several captures store their centroid as face_encoding
+    and the captures as 'templates', packed as base64 float32.
+    """
+
+    def __init__(self, db_file: str, images_dir: str, compact_every: int = 1000,
+                 fsync_every: int = 1):
         """
         Initializes the database manager.
 
         Args:
             db_file (str): Path to the JSON database file
             images_dir (str): Directory path where user profile images will be stored
+            compact_every (int): Journal records written before compacting into a snapshot
+            fsync_every (int): Journal records written per fsync. 1 makes every
+                               registration durable; higher values batch the syncs
         """
         self.db_file = db_file
         self.images_dir = images_dir
+        self.journal_file = f"{os.path.splitext(db_file)[0]}.journal.jsonl"
+        self.compact_every = compact_every
+        self.fsync_every = fsync_every
+        self._journal_records = 0
+        self._unsynced_records = 0
         self._ensure_directories()
         self.users_db = self._load_database()
+        self.galleries: List[FaceGallery] = []
 
     def _ensure_directories(self) -> None:
         """
@@ -32,30 +59,148 @@ class DBManager:
 
     def _load_database(self) -> Dict[str, Any]:
         """
-        Loads the user database from JSON file.
+        Loads the user database from the JSON snapshot and replays the journal.
 
         Returns:
-            Dict[str, Any]: Dictionary containing user data, empty if file doesn't exist
-                           or can't be read
+            Dict[str, Any]: Dictionary containing user data, empty if neither file exists
+
+        Errors:
+            RuntimeError: If the snapshot is corrupt. Starting with an empty database
+                          would overwrite every user on the next compaction
         """
+        users_db = {}
         if os.path.exists(self.db_file):
             try:
                 with open(self.db_file, 'r') as f:
-                    return json.load(f)
-            except json.JSONDecodeError:
-                print(f"Error reading database file: {self.db_file}")
-                return {}
-        return {}
+                    users_db = json.load(f)
+            except json.JSONDecodeError as e:
+                raise RuntimeError(f"Error reading database file {self.db_file}: {e}")
+
+        if os.path.exists(self.journal_file):
+            valid_end = 0
+            offset = 0
+            with open(self.journal_file, 'rb') as f:
+                for line in f:
+                    offset += len(line)
+                    try:
+                        record = json.loads(line)
+                    except (json.JSONDecodeError, UnicodeDecodeError):
+                        # Only the last line can be partially written by a crash
+                        print(f"Skipping incomplete journal record in {self.journal_file}")
+                        continue
+                    users_db[record.pop('username')] = record
+                    self._journal_records += 1
+                    valid_end = offset
+
+            self._repair_journal(self.journal_file, valid_end, offset)
+
+        return users_db
+
+    @staticmethod
+    def _repair_journal(path: str, valid_end: int, size: int) -> None:
+        """
+        Cuts a torn tail off an append-only JSON lines file so the next record starts
+        on its own line. Otherwise it would be appended onto the broken line and lost
+        on the next load.
+
+        Args:
+            path (str): JSON lines file
+            valid_end (int): Byte offset after the last line that parsed
+            size (int): Size of the file
+        """
+        with open(path, 'rb+') as f:
+            if valid_end < size:
+                print(f"Truncating {size - valid_end} bytes of incomplete data in {path}")
+                f.truncate(valid_end)
+            if valid_end > 0:
+                # The last record can be complete but missing its newline
+                f.seek(valid_end - 1)
+                if f.read(1) != b"\n":
+                    f.write(b"\n")
+            f.flush()
+            os.fsync(f.fileno())
 
     def save_database(self) -> bool:
+        """
+        Compacts the database: writes a new snapshot atomically and empties the journal.
+
+        Returns:
+            bool: True if the snapshot was written
+        """
         try:
-            with open(self.db_file, 'w') as f:
+            temp_file = f"{self.db_file}.tmp"
+            with metrics.timer("save_database"), open(temp_file, 'w') as f:
                 json.dump(self.users_db, f, indent=4)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_file, self.db_file)
+
+            # The snapshot now contains every journal record
+            open(self.journal_file, 'w').close()
+            self._journal_records = 0
+            self._unsynced_records = 0
             return True
         except Exception as e:
             print(f"Error saving database: {e}")
             return False
 
+    def _append_journal(self, records: List[Tuple[str, Dict[str, Any]]]) -> bool:
+        """
+        Appends user records to the journal with a single write.
+
+        Args:
+            records (List[Tuple[str, Dict[str, Any]]]): (username, user data) pairs
+
+        Returns:
+            bool: True if the records were written
+        """
+        try:
+            with open(self.journal_file, 'a') as f:
+                f.write("".join(json.dumps(dict(user_data, username=username)) + "\n"
+                                for username, user_data in records))
+                self._unsynced_records += len(records)
+                if self._unsynced_records >= self.fsync_every:
+                    f.flush()
+                    os.fsync(f.fileno())
+                    self._unsynced_records = 0
+        except Exception as e:
+            print(f"Error writing journal: {e}")
+            return False
+
+        self._journal_records += len(records)
+        return True
+
+    @staticmethod
+    def pack_templates(templates) -> Optional[str]:
+        """
+        Packs a (T, D) matrix of encodings as base64 float32, a quarter of the
+        size of JSON number lists. Returns None for fewer than two templates.
+        """
+        if templates is None or len(templates) < 2:
+            return None
+        return base64.b64encode(np.ascontiguousarray(templates, dtype=np.float32).tobytes()).decode("ascii")
+
+    @staticmethod
+    def unpack_templates(user_data: Dict[str, Any]) -> Optional[np.ndarray]:
+        """
+        Returns the (T, D) templates of a user record, None for single-capture users.
+        """
+        packed = user_data.get('templates')
+        if packed is None or len(packed) == 0 or user_data.get('face_encoding') is None:
+            return None
+        if isinstance(packed, np.ndarray):
+            # Backends with binary storage keep the matrix itself
+            return packed
+        templates = np.frombuffer(base64.b64decode(packed), dtype=np.float32)
+        return templates.reshape(-1, len(user_data['face_encoding']))
+
+    def get_templates(self, username: str) -> Optional[np.ndarray]:
+        """
+        Returns the (T, D) templates of a user, None if the user has a single capture.
+        """
+        user_data = self.get_user(username)
+        return self.unpack_templates(user_data) if user_data else None
+
     def user_exists(self, username: str) -> bool:
         return username in self.users_db
 
@@ -63,31 +208,90 @@ class DBManager:
         return self.users_db.get(username)
 
     def save_user(self, username: str, face_encoding: np.ndarray,
-                  original_image_path: str) -> bool:
+                  original_image_path: str, templates: Optional[np.ndarray] = None) -> bool:
         """
         Saves a new user to the database.
 
         Args:
             username (str): Username of the new user
-            face_encoding (np.ndarray): Facial encoding data
+            face_encoding (np.ndarray): Facial encoding data; the centroid when templates are given
             original_image_path (str): Path to user's profile image
+            templates (Optional[np.ndarray]): (T, D) encodings of every capture of the user
         """
         try:
             saved_image_path = self._save_user_image(original_image_path, username)
             if not saved_image_path:
                 return False
 
-            self.users_db[username] = {
+            user_data = {
                 'face_encoding': face_encoding.tolist() if face_encoding is not None else None,
                 'image_path': saved_image_path,
                 'created_at': datetime.now().isoformat()
             }
+            packed_templates = self.pack_templates(templates)
+            if packed_templates:
+                user_data['templates'] = packed_templates
+
+            if not self._append_journal([(username, user_data)]):
+                return False
+            self.users_db[username] = user_data
 
-            return self.save_database()
+            # A failed compaction keeps the journal, so the user is still saved
+            if self._journal_records >= self.compact_every:
+                self.save_database()
+
+            if face_encoding is not None:
+                for gallery in self.galleries:
+                    gallery.add(username, face_encoding, templates)
+            return True
         except Exception as e:
             print(f"Error saving user: {e}")
             return False
 
+    def save_users(self, users: List[Tuple[str, np.ndarray, str]]) -> List[str]:
+        """
+        Saves many users with a single journal write, used for bulk enrollment.
+
+        Args:
+            users (List[Tuple[str, np.ndarray, str]]): (username, face encoding,
+                                                        original image path) of each user
+
+        Returns:
+            List[str]: Usernames that were saved; users whose image can't be copied are skipped
+        """
+        records = []
+        for username, face_encoding, original_image_path in users:
+            saved_image_path = self._save_user_image(original_image_path, username)
+            if not saved_image_path:
+                continue
+            records.append((username, {
+                'face_encoding': face_encoding.tolist() if face_encoding is not None else None,
+                'image_path': saved_image_path,
+                'created_at': datetime.now().isoformat()
+            }))
+
+        if not records or not self._append_journal(records):
+            return []
+
+        for username, user_data in records:
+            self.users_db[username] = user_data
+
+        if self._journal_records >= self.compact_every:
+            self.save_database()
+
+        saved = [username for username, _ in records]
+        saved_set = set(saved)
+        self._add_to_galleries([(username, face_encoding) for username, face_encoding, _ in users
+                                if username in saved_set])
+        return saved
+
+    def _add_to_galleries(self, encodings: List[Tuple[str, np.ndarray]]) -> None:
+        for username, face_encoding in encodings:
+            if face_encoding is None:
+                continue
+            for gallery in self.galleries:
+                gallery.add(username, face_encoding)
+
     def _save_user_image(self, original_path: str, username: str) -> Optional[str]:
         """
         Saves user's profile image to images directory.
@@ -112,4 +316,32 @@ class DBManager:
             return None
 
     def get_all_users(self) -> Dict[str, Any]:
-        return self.users_db
\ No newline at end of file
+        return self.users_db
+
+    def register_gallery(self, gallery: FaceGallery) -> FaceGallery:
+        """
+        Loads every stored encoding into a gallery and keeps it in sync on each save_user.
+
+        Args:
+            gallery (FaceGallery): Gallery to populate
+
+        Returns:
+            FaceGallery: The same gallery, for chaining
+        """
+        gallery.load_users(self.users_db)
+        for username, user_data in self.users_db.items():
+            templates = self.unpack_templates(user_data)
+            if templates is not None:
+                gallery.set_templates(username, templates)
+        self.galleries.append(gallery)
+        return gallery
+
+    def sync_galleries(self) -> int:
+        """
+        Adds users saved by other processes to the registered galleries.
+        The JSON database is owned by a single process, so there is nothing to sync.
+
+        Returns:
+            int: Number of users added
+        """
+        return 0
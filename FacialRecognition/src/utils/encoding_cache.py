@@ -0,0 +1,152 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import numpy as np
+
+from src.utils.metrics import metrics
+
+
+class EncodingCache:
+    """
+    LRU cache of face encodings keyed by image content.
+    Entries expire after `ttl_seconds` and the least recently used entry is
+    evicted when `max_entries` is reached. An optional directory keeps encodings
+    on disk so they survive restarts and are shared between worker processes.
+    Images without a face are cached in memory only.
+    """
+
+    # Marker stored for images where no face was detected
+    NO_FACE = object()
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: Optional[float] = 3600,
+                 disk_dir: Optional[str] = None):
+        """
+        Initializes the cache.
+
+        Args:
+            max_entries (int): Maximum number of entries kept in memory
+            ttl_seconds (Optional[float]): Entry lifetime in seconds, None to never expire
+            disk_dir (Optional[str]): Directory for the disk-backed layer, None to disable it
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.disk_dir = disk_dir
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        if disk_dir and not os.path.exists(disk_dir):
+            os.makedirs(disk_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(image: np.ndarray, identity: str) -> str:
+        """
+        Builds a cache key from the decoded pixels and the recognizer identity.
+
+        Args:
+            image (np.ndarray): Decoded image
+            identity (str): Recognizer class and parameters that affect the encoding
+        """
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(identity.encode())
+        digest.update(str(image.shape).encode())
+        digest.update(np.ascontiguousarray(image).data)
+        return digest.hexdigest()
+
+    def _expired(self, stored_at: float) -> bool:
+        return self.ttl_seconds is not None and time.time() - stored_at > self.ttl_seconds
+
+    def get(self, key: str) -> Tuple[bool, Optional[np.ndarray]]:
+        """
+        Looks up an encoding.
+
+        Returns:
+            Tuple[bool, Optional[np.ndarray]]: (found, encoding). The encoding is
+                                               None when the image had no face
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, stored_at = entry
+                if not self._expired(stored_at):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    metrics.inc("encoding_cache_lookups_total", result="hit")
+                    return True, None if value is self.NO_FACE else value
+                del self._entries[key]
+
+        encoding = self._read_disk(key)
+        with self._lock:
+            if encoding is not None:
+                self.hits += 1
+                self._store(key, encoding)
+            else:
+                self.misses += 1
+        metrics.inc("encoding_cache_lookups_total", result="hit" if encoding is not None else "miss")
+        return encoding is not None, encoding
+
+    def put(self, key: str, encoding: Optional[np.ndarray]) -> None:
+        """
+        Stores an encoding; None records that the image has no face.
+        """
+        with self._lock:
+            self._store(key, self.NO_FACE if encoding is None else encoding)
+
+        if encoding is not None:
+            self._write_disk(key, encoding)
+
+    def _store(self, key: str, value) -> None:
+        self._entries[key] = (value, time.time())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key[:2], f"{key}.npy")
+
+    def _read_disk(self, key: str) -> Optional[np.ndarray]:
+        if not self.disk_dir:
+            return None
+
+        path = self._disk_path(key)
+        try:
+            if self._expired(os.path.getmtime(path)):
+                os.remove(path)
+                return None
+            return np.load(path)
+        except (OSError, ValueError):
+            return None
+
+    def _write_disk(self, key: str, encoding: np.ndarray) -> None:
+        if not self.disk_dir:
+            return
+
+        path = self._disk_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = f"{path}.{os.getpid()}.tmp.npy"
+            np.save(temp_path, encoding)
+            os.replace(temp_path, path)
+        except OSError as e:
+            print(f"Error writing encoding cache: {e}")
+
+    def stats(self) -> dict:
+        """
+        Returns the hit/miss counters and the current size.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
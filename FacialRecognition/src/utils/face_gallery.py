@@ -0,0 +1,375 @@
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+
+from src.interfaces.gallery_index import GalleryIndex
+
+
+class FaceGallery:
+    """
+    In-memory gallery of enrolled face encodings used for 1:N matching.
+    All encodings live in one contiguous float32 (N, D) matrix with a parallel
+    list of usernames, so a query is answered with a single batched distance
+    computation instead of a Python loop over the database.
+
+    Two metrics are supported:
+    - "euclidean": Euclidean distance, used by the dlib recognizers
+    - "cosine": 1 - cosine similarity, used by InsightFace. Encodings are
+      normalized to unit length once when added, so a query is a single dot product
+
+    An optional GalleryIndex can narrow each query to a shortlist of candidate
+    rows, which are then scored exactly.
+
+    Users enrolled from several captures keep their centroid in the matrix and
+    their templates on the side. The centroid scan ranks the whole gallery,
+    then the `shortlist_size` closest users are re-scored with their nearest
+    template, so a query costs N + shortlist_size * T distances.
+    """
+
+    METRICS = ("euclidean", "cosine")
+
+    def __init__(self, dimensions: Optional[int] = None, initial_capacity: int = 1024,
+                 metric: str = "euclidean", index: Optional[GalleryIndex] = None,
+                 shortlist_size: int = 10):
+        """
+        Initializes an empty gallery.
+
+        Args:
+            dimensions (Optional[int]): Size of each encoding. If None it is taken
+                                        from the first encoding added
+            initial_capacity (int): Number of rows allocated up front
+            metric (str): Distance metric, "euclidean" or "cosine"
+            index (Optional[GalleryIndex]): Search index used to shortlist rows.
+                                            If None every query scans the whole gallery
+            shortlist_size (int): Users re-scored against their templates per query
+        """
+        if metric not in self.METRICS:
+            raise ValueError(f"Unknown metric '{metric}', expected one of {self.METRICS}")
+
+        self.metric = metric
+        self.index = index
+        self.shortlist_size = max(1, shortlist_size)
+        self.dimensions = dimensions
+        self.usernames: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._capacity = max(1, initial_capacity)
+        self._matrix = None
+        self._squared_norms = None
+        # Row -> (T, D) templates prepared with the gallery metric
+        self._templates: Dict[int, np.ndarray] = {}
+
+        if dimensions is not None:
+            self._allocate(dimensions)
+
+    def _allocate(self, dimensions: int) -> None:
+        self.dimensions = dimensions
+        self._matrix = np.zeros((self._capacity, dimensions), dtype=np.float32)
+        self._squared_norms = np.zeros(self._capacity, dtype=np.float32)
+
+    def _grow(self, required: int) -> None:
+        """
+        Doubles the allocated rows until at least `required` rows fit.
+        """
+        capacity = self._capacity
+        while capacity < required:
+            capacity *= 2
+
+        matrix = np.zeros((capacity, self.dimensions), dtype=np.float32)
+        matrix[:len(self)] = self._matrix[:len(self)]
+        squared_norms = np.zeros(capacity, dtype=np.float32)
+        squared_norms[:len(self)] = self._squared_norms[:len(self)]
+
+        self._matrix = matrix
+        self._squared_norms = squared_norms
+        self._capacity = capacity
+
+    def __len__(self) -> int:
+        return len(self.usernames)
+
+    def __contains__(self, username: str) -> bool:
+        return username in self._rows
+
+    @property
+    def encodings(self) -> np.ndarray:
+        """
+        Returns a view of the (N, D) matrix holding the enrolled encodings.
+        """
+        if self._matrix is None:
+            return np.zeros((0, self.dimensions or 0), dtype=np.float32)
+        return self._matrix[:len(self)]
+
+    @staticmethod
+    def normalize(face_encoding) -> np.ndarray:
+        """
+        Returns the encoding as a unit-length float32 vector.
+        """
+        encoding = np.asarray(face_encoding, dtype=np.float32).ravel()
+        norm = np.linalg.norm(encoding)
+        return encoding / norm if norm > 0 else encoding
+
+    def _prepare(self, face_encoding) -> np.ndarray:
+        if self.metric == "cosine":
+            return self.normalize(face_encoding)
+        return np.asarray(face_encoding, dtype=np.float32).ravel()
+
+    def _prepare_many(self, face_encodings) -> np.ndarray:
+        matrix = np.asarray(face_encodings, dtype=np.float32).reshape(len(face_encodings), -1)
+        if self.metric == "cosine":
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            matrix = matrix / np.where(norms > 0, norms, 1.0)
+        return matrix
+
+    def centroid(self, face_encodings) -> np.ndarray:
+        """
+        Returns the centroid of several captures of one face, used as the
+        user's encoding for the first matching pass. Cosine centroids are
+        averaged over unit vectors and normalized again.
+
+        Args:
+            face_encodings: Sequence or (T, D) matrix of encodings
+
+        Returns:
+            np.ndarray: Centroid encoding
+        """
+        centroid = self._prepare_many(face_encodings).mean(axis=0)
+        return self.normalize(centroid) if self.metric == "cosine" else centroid
+
+    def add(self, username: str, face_encoding, templates=None) -> None:
+        """
+        Adds a user encoding to the gallery, replacing it if the user already exists.
+
+        Args:
+            username (str): Username the encoding belongs to
+            face_encoding: Encoding as numpy array or list; the centroid for multi-template users
+            templates: Optional (T, D) encodings of the individual captures
+        """
+        row = self._add_row(username, face_encoding)
+        self._set_row_templates(row, templates)
+
+        if self.index is not None:
+            self.index.add(row, self.encodings)
+
+    def _add_row(self, username: str, face_encoding) -> int:
+        encoding = self._prepare(face_encoding)
+
+        if self._matrix is None:
+            self._allocate(encoding.shape[0])
+
+        if encoding.shape[0] != self.dimensions:
+            raise ValueError(
+                f"Encoding for '{username}' has {encoding.shape[0]} dimensions, expected {self.dimensions}"
+            )
+
+        row = self._rows.get(username)
+        if row is None:
+            row = len(self)
+            if row >= self._capacity:
+                self._grow(row + 1)
+            self.usernames.append(username)
+            self._rows[username] = row
+
+        self._matrix[row] = encoding
+        self._squared_norms[row] = np.dot(encoding, encoding)
+        return row
+
+    def _set_row_templates(self, row: int, templates) -> None:
+        if templates is not None and len(templates) > 1:
+            self._templates[row] = self._prepare_many(templates)
+        else:
+            # A single capture is the centroid itself
+            self._templates.pop(row, None)
+
+    def set_templates(self, username: str, templates) -> None:
+        """
+        Attaches the individual captures of an enrolled user, used to re-score
+        the user when it is shortlisted by its centroid.
+
+        Args:
+            username (str): Enrolled username
+            templates: (T, D) encodings, None to remove them
+        """
+        self._set_row_templates(self._rows[username], templates)
+
+    def load_users(self, users: Dict[str, Dict]) -> None:
+        """
+        Adds every user with a stored encoding from a DBManager-style dictionary.
+
+        Args:
+            users (Dict[str, Dict]): Mapping of username to user data
+        """
+        for username, user_data in users.items():
+            face_encoding = user_data.get("face_encoding")
+            if face_encoding is not None:
+                self._add_row(username, face_encoding)
+
+        if self.index is not None and len(self) > 0:
+            self.index.attach(self.encodings)
+
+    def load_matrix(self, usernames: List[str], encodings: np.ndarray) -> None:
+        """
+        Bulk-loads an (N, D) matrix of encodings with one vectorized copy.
+
+        Args:
+            usernames (List[str]): Unique usernames, one per matrix row
+            encodings (np.ndarray): (N, D) matrix of encodings
+        """
+        if len(usernames) == 0:
+            return
+
+        if len(self) > 0:
+            for username, encoding in zip(usernames, encodings):
+                self._add_row(username, encoding)
+        else:
+            matrix = np.asarray(encodings, dtype=np.float32)
+            if self.metric == "cosine":
+                norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+                matrix = matrix / np.where(norms > 0, norms, 1.0)
+
+            self._capacity = max(self._capacity, len(usernames))
+            self._allocate(matrix.shape[1])
+            self._matrix[:len(usernames)] = matrix
+            self._squared_norms[:len(usernames)] = np.einsum("ij,ij->i", matrix, matrix)
+            self.usernames = list(usernames)
+            self._rows = {username: row for row, username in enumerate(self.usernames)}
+
+        if self.index is not None:
+            self.index.attach(self.encodings)
+
+    def distances(self, face_encoding) -> np.ndarray:
+        """
+        Computes the distance from a probe encoding to every enrolled encoding.
+        Euclidean distances use ||a - b||^2 = ||a||^2 - 2 a.b + ||b||^2 and cosine
+        distances use 1 - a.b over unit vectors, so the whole gallery is scored
+        with one matrix-vector product.
+
+        Args:
+            face_encoding: Probe encoding
+
+        Returns:
+            np.ndarray: Array of N distances, in the same order as `usernames`
+        """
+        if len(self) == 0:
+            return np.zeros(0, dtype=np.float32)
+
+        return self._distances(self._prepare(face_encoding))
+
+    def _distances(self, query: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Scores a prepared query against all rows, or only against `rows` if given.
+        """
+        if rows is None:
+            encodings = self.encodings
+            squared_norms = self._squared_norms[:len(self)]
+        else:
+            encodings = self._matrix[rows]
+            squared_norms = self._squared_norms[rows]
+
+        if self.metric == "cosine":
+            return 1.0 - encodings @ query
+
+        squared = squared_norms - 2.0 * (encodings @ query) + np.dot(query, query)
+        np.maximum(squared, 0.0, out=squared)
+        return np.sqrt(squared)
+
+    def _search(self, face_encoding, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the candidate rows for a query and their exact distances.
+        """
+        query = self._prepare(face_encoding)
+        if self._templates:
+            k = max(k, self.shortlist_size)
+        rows = self.index.candidates(query, k) if self.index is not None else None
+
+        if rows is None or len(rows) == 0:
+            rows, distances = np.arange(len(self)), self._distances(query)
+        else:
+            distances = self._distances(query, rows)
+
+        if self._templates:
+            rows, distances = self._rescore(query, rows, distances, k)
+        return rows, distances
+
+    def _rescore(self, query: np.ndarray, rows: np.ndarray, distances: np.ndarray,
+                 k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Keeps the k rows closest by centroid and lowers each one's distance to
+        its nearest template.
+        """
+        if len(rows) > k:
+            shortlist = np.argpartition(distances, k - 1)[:k]
+            rows, distances = rows[shortlist], distances[shortlist]
+        else:
+            distances = distances.copy()
+
+        for position, row in enumerate(rows):
+            templates = self._templates.get(int(row))
+            if templates is None:
+                continue
+            if self.metric == "cosine":
+                template_distances = 1.0 - templates @ query
+            else:
+                template_distances = np.linalg.norm(templates - query, axis=1)
+            distances[position] = min(distances[position], float(template_distances.min()))
+        return rows, distances
+
+    def best_match(self, face_encoding) -> Tuple[Optional[str], float]:
+        """
+        Finds the closest enrolled user to the probe encoding.
+
+        Returns:
+            Tuple[Optional[str], float]: Username and distance of the best match,
+                                         (None, inf) if the gallery is empty
+        """
+        if len(self) == 0:
+            return None, float('inf')
+
+        rows, distances = self._search(face_encoding, 1)
+        best = int(np.argmin(distances))
+        return self.usernames[rows[best]], float(distances[best])
+
+    def best_matches(self, face_encodings) -> List[Tuple[Optional[str], float]]:
+        """
+        Finds the closest enrolled user for several probes at once. Without an
+        index or templates all probes are scored with one (Q, D) x (D, N) matrix product.
+
+        Args:
+            face_encodings: Sequence or (Q, D) matrix of probe encodings
+
+        Returns:
+            List[Tuple[Optional[str], float]]: Username and distance of the best
+                                               match of each probe, in probe order
+        """
+        if len(face_encodings) == 0:
+            return []
+        if len(self) == 0:
+            return [(None, float('inf'))] * len(face_encodings)
+        if self.index is not None or self._templates:
+            return [self.best_match(face_encoding) for face_encoding in face_encodings]
+
+        queries = np.stack([self._prepare(face_encoding) for face_encoding in face_encodings])
+        products = queries @ self.encodings.T
+        if self.metric == "cosine":
+            distances = 1.0 - products
+        else:
+            distances = (self._squared_norms[:len(self)][None, :] - 2.0 * products
+                         + np.einsum("ij,ij->i", queries, queries)[:, None])
+            np.maximum(distances, 0.0, out=distances)
+            np.sqrt(distances, out=distances)
+
+        best = np.argmin(distances, axis=1)
+        return [(self.usernames[row], float(distances[probe, row])) for probe, row in enumerate(best)]
+
+    def top_k(self, face_encoding, k: int = 5) -> List[Tuple[str, float]]:
+        """
+        Finds the k closest enrolled users to the probe encoding.
+
+        Returns:
+            List[Tuple[str, float]]: (username, distance) pairs sorted by distance
+        """
+        if len(self) == 0 or k <= 0:
+            return []
+
+        rows, distances = self._search(face_encoding, k)
+        k = min(k, len(distances))
+        best = np.argpartition(distances, k - 1)[:k]
+        best = best[np.argsort(distances[best])]
+        return [(self.usernames[rows[i]], float(distances[i])) for i in best]
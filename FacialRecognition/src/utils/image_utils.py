@@ -1,9 +1,11 @@
 import cv2
 import numpy as np
-from PIL import Image, ImageTk
-from typing import Tuple, Optional
+from PIL import Image
+from typing import Tuple, Optional, Union
 import os
 
+from src.utils.metrics import metrics
+
 
 class ImageUtils:
 
@@ -28,6 +30,48 @@ class ImageUtils:
             print(f"Error loading image: {e}")
             return None
 
+    @staticmethod
+    def decode_image(data: Union[bytes, bytearray, memoryview]) -> Optional[np.ndarray]:
+        """
+        Decodes an encoded image (JPEG, PNG, ...) directly from memory.
+        The buffer is wrapped without copying before being passed to OpenCV.
+
+        Args:
+            data (Union[bytes, bytearray, memoryview]): Encoded image bytes
+
+        Returns:
+            Optional[np.ndarray]: Decoded image in BGR format, or None if decoding fails
+        """
+        buffer = np.frombuffer(memoryview(data), dtype=np.uint8)
+        if buffer.size == 0:
+            return None
+
+        try:
+            return cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+        except Exception as e:
+            print(f"Error decoding image: {e}")
+            return None
+
+    @staticmethod
+    def read_image(image) -> Optional[np.ndarray]:
+        """
+        Returns a BGR image from any input accepted by the recognizers.
+
+        Args:
+            image: Path to an image file (str), encoded image bytes
+                  (bytes, bytearray or memoryview) or an already decoded np.ndarray
+
+        Returns:
+            Optional[np.ndarray]: Image in BGR format, or None if it can't be read
+        """
+        if isinstance(image, str):
+            with metrics.timer("decode"):
+                return cv2.imread(image)
+        if isinstance(image, (bytes, bytearray, memoryview)):
+            with metrics.timer("decode"):
+                return ImageUtils.decode_image(image)
+        return image
+
     @staticmethod
     def resize_image(image: np.ndarray, size: Tuple[int, int]) -> np.ndarray:
         """
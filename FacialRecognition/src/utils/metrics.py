@@ -0,0 +1,241 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+# Latency buckets in seconds, from sub-millisecond matching up to slow CNN detections
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+HELP = {
+    "face_stage_seconds": "Time spent in each stage of the recognition pipeline",
+    "face_request_seconds": "Total time of each API endpoint",
+    "face_detection_tier_total": "Images resolved by each dlib upsampling tier",
+    "encoding_cache_lookups_total": "Encoding cache lookups by result",
+    "face_gallery_size": "Encodings loaded in the matching gallery",
+    "inference_queue_depth": "Calls waiting for a free inference worker",
+    "inference_in_flight": "Calls accepted by the inference executor",
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram; observing a value is one bisect plus three additions.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def merge(self, counts: List[int], total: float, count: int) -> None:
+        for position, bucket_count in enumerate(counts):
+            self.counts[position] += bucket_count
+        self.sum += total
+        self.count += count
+
+
+class MetricsRegistry:
+    """
+    Process-wide store of histograms, counters and gauges, rendered in the
+    Prometheus text exposition format.
+
+    Inference worker processes record into their own registry; take_delta()
+    exports and clears what they recorded so the parent can merge() it with
+    each result, and /metrics covers every worker.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._gauges: Dict[str, Callable[[], float]] = {}
+        self._samples: Optional[Dict[Tuple[str, Labels], List[float]]] = None
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        """
+        Records one value in the histogram `name` with the given labels.
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+            if self._samples is not None:
+                self._samples.setdefault(key, []).append(value)
+
+    @contextmanager
+    def timer(self, stage: str, name: str = "face_stage_seconds", label: str = "stage"):
+        """
+        Times the block and records it under the given stage.
+
+        Args:
+            stage (str): Label value, e.g. "detect" or "match"
+            name (str): Histogram name
+            label (str): Label name
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **{label: stage})
+
+    def inc(self, name: str, amount: float = 1, **labels) -> None:
+        """
+        Increments the counter `name` with the given labels.
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def gauge(self, name: str, callback: Callable[[], float]) -> None:
+        """
+        Registers a gauge whose value is read from `callback` at scrape time.
+        """
+        with self._lock:
+            self._gauges[name] = callback
+
+    def counter_values(self, name: str, label: str) -> Dict[str, float]:
+        """
+        Returns the counters `name` keyed by the value of one of their labels.
+
+        Args:
+            name (str): Counter name
+            label (str): Label whose value becomes the key, e.g. "tier"
+        """
+        with self._lock:
+            counters = list(self._counters.items())
+        return {dict(labels).get(label, ""): value
+                for (counter_name, labels), value in counters if counter_name == name}
+
+    def capture_samples(self) -> None:
+        """
+        Starts keeping every observed value besides the histogram buckets, so
+        exact percentiles can be computed. Meant for benchmarks, not for serving.
+        """
+        with self._lock:
+            self._samples = {}
+
+    def take_samples(self) -> Dict[Tuple[str, Labels], List[float]]:
+        """
+        Returns the values observed since capture_samples() and stops capturing.
+
+        Returns:
+            Dict[Tuple[str, Labels], List[float]]: Raw values by (name, labels)
+        """
+        with self._lock:
+            samples, self._samples = self._samples or {}, None
+        return samples
+
+    def reset(self) -> None:
+        """
+        Drops everything recorded so far. Forked worker processes call it first,
+        so the copy of the parent's values they inherit is not merged back a second
+        time. The lock is replaced too, as it may have been held during the fork.
+        """
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+        self._gauges = {}
+        self._samples = None
+
+    def take_delta(self) -> Optional[dict]:
+        """
+        Exports and clears the recorded histograms and counters.
+
+        Returns:
+            Optional[dict]: Raw values for merge(), None if nothing was recorded
+        """
+        with self._lock:
+            if not self._histograms and not self._counters:
+                return None
+            delta = {
+                "histograms": [(key, histogram.counts, histogram.sum, histogram.count)
+                               for key, histogram in self._histograms.items()],
+                "counters": list(self._counters.items())
+            }
+            self._histograms = {}
+            self._counters = {}
+        return delta
+
+    def merge(self, delta: Optional[dict]) -> None:
+        """
+        Adds values exported by take_delta() in another process.
+        """
+        if not delta:
+            return
+        with self._lock:
+            for key, counts, total, count in delta["histograms"]:
+                histogram = self._histograms.get(key)
+                if histogram is None:
+                    histogram = self._histograms[key] = Histogram()
+                histogram.merge(counts, total, count)
+            for key, amount in delta["counters"]:
+                self._counters[key] = self._counters.get(key, 0) + amount
+
+    @staticmethod
+    def _format_labels(labels: Labels, extra: str = "") -> str:
+        parts = [f'{name}="{value}"' for name, value in labels]
+        if extra:
+            parts.append(extra)
+        return "{" + ",".join(parts) + "}" if parts else ""
+
+    def render(self) -> str:
+        """
+        Returns every metric in the Prometheus text exposition format.
+        """
+        with self._lock:
+            histograms = sorted(((key, list(histogram.counts), histogram.sum, histogram.count, histogram.buckets)
+                                 for key, histogram in self._histograms.items()), key=lambda item: item[0])
+            counters = sorted(self._counters.items())
+            gauges = sorted(self._gauges.items())
+
+        lines = []
+        described = set()
+
+        def describe(name: str, kind: str):
+            if name not in described:
+                described.add(name)
+                lines.append(f"# HELP {name} {HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), counts, total, count, buckets in histograms:
+            describe(name, "histogram")
+            cumulative = 0
+            for bound, bucket_count in zip(buckets, counts):
+                cumulative += bucket_count
+                bucket_labels = self._format_labels(labels, f'le="{bound}"')
+                lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+            bucket_labels = self._format_labels(labels, 'le="+Inf"')
+            lines.append(f"{name}_bucket{bucket_labels} {count}")
+            lines.append(f"{name}_sum{self._format_labels(labels)} {total}")
+            lines.append(f"{name}_count{self._format_labels(labels)} {count}")
+
+        for (name, labels), value in counters:
+            describe(name, "counter")
+            lines.append(f"{name}{self._format_labels(labels)} {value}")
+
+        for name, callback in gauges:
+            try:
+                value = float(callback())
+            except Exception as e:
+                print(f"Error reading gauge {name}: {e}")
+                continue
+            describe(name, "gauge")
+            lines.append(f"{name} {value}")
+
+        return "\n".join(lines) + "\n"
+
+
+# Registry shared by the whole process
+metrics = MetricsRegistry()
@@ -0,0 +1,241 @@
+import os
+import sqlite3
+import threading
+from typing import Dict, Any, Optional, List, Tuple
+from datetime import datetime
+import numpy as np
+
+from .db_manager import DBManager
+from .face_gallery import FaceGallery
+
+
+class SQLiteDBManager(DBManager):
+    """
+    Database manager backed by SQLite in WAL mode.
+    Several worker processes can share one store: readers never block the writer,
+    user lookups go through the username index and every save is a single-row
+    insert. Encodings are stored as float32 BLOBs; the templates of
+    multi-capture users are one BLOB of T concatenated rows.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT NOT NULL,
+            face_encoding BLOB,
+            templates BLOB,
+            image_path TEXT,
+            created_at TEXT
+        );
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_users_username ON users(username);
+    """
+
+    def __init__(self, db_file: str, images_dir: str, timeout: float = 30.0):
+        """
+        Initializes the SQLite database manager.
+
+        Args:
+            db_file (str): Path of the database; its extension is replaced by .sqlite3
+            images_dir (str): Directory path where user profile images will be stored
+            timeout (float): Seconds to wait for a lock held by another worker
+        """
+        self.sqlite_file = f"{os.path.splitext(db_file)[0]}.sqlite3"
+        self.timeout = timeout
+        self._local = threading.local()
+        self._last_synced_id = 0
+        super().__init__(db_file, images_dir)
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """
+        Returns the connection of the calling thread, opening it on first use.
+        """
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.sqlite_file, timeout=self.timeout)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def _load_database(self) -> Dict[str, Any]:
+        """
+        Creates the schema if needed. Users are read on demand instead of being
+        kept in memory, so this always returns an empty dictionary.
+        """
+        with self.connection:
+            self.connection.executescript(self.SCHEMA)
+            # Databases created before multi-template enrollment lack the column
+            columns = {row[1] for row in self.connection.execute("PRAGMA table_info(users)")}
+            if "templates" not in columns:
+                self.connection.execute("ALTER TABLE users ADD COLUMN templates BLOB")
+        return {}
+
+    @staticmethod
+    def _row_to_user(row) -> Dict[str, Any]:
+        face_encoding = np.frombuffer(row[0], dtype=np.float32) if row[0] is not None else None
+        user_data = {
+            'face_encoding': face_encoding,
+            'image_path': row[1],
+            'created_at': row[2]
+        }
+        if row[3] is not None and face_encoding is not None:
+            user_data['templates'] = np.frombuffer(row[3], dtype=np.float32).reshape(-1, len(face_encoding))
+        return user_data
+
+    @staticmethod
+    def _templates_blob(templates) -> Optional[bytes]:
+        if templates is None or len(templates) < 2:
+            return None
+        return np.ascontiguousarray(templates, dtype=np.float32).tobytes()
+
+    def save_database(self) -> bool:
+        # Every save_user is committed on its own; there is nothing to rewrite
+        return True
+
+    def user_exists(self, username: str) -> bool:
+        cursor = self.connection.execute("SELECT 1 FROM users WHERE username = ?", (username,))
+        return cursor.fetchone() is not None
+
+    def get_user(self, username: str) -> Optional[Dict[str, Any]]:
+        cursor = self.connection.execute(
+            "SELECT face_encoding, image_path, created_at, templates FROM users WHERE username = ?", (username,))
+        row = cursor.fetchone()
+        return self._row_to_user(row) if row else None
+
+    def get_all_users(self) -> Dict[str, Any]:
+        cursor = self.connection.execute(
+            "SELECT username, face_encoding, image_path, created_at, templates FROM users ORDER BY id")
+        return {row[0]: self._row_to_user(row[1:]) for row in cursor}
+
+    def save_user(self, username: str, face_encoding: np.ndarray,
+                  original_image_path: str, templates: Optional[np.ndarray] = None) -> bool:
+        """
+        Saves a new user with a single-row insert, replacing an existing user
+        with the same username.
+
+        Args:
+            username (str): Username of the new user
+            face_encoding (np.ndarray): Facial encoding data; the centroid when templates are given
+            original_image_path (str): Path to user's profile image
+            templates (Optional[np.ndarray]): (T, D) encodings of every capture of the user
+        """
+        try:
+            saved_image_path = self._save_user_image(original_image_path, username)
+            if not saved_image_path:
+                return False
+
+            blob = None
+            if face_encoding is not None:
+                blob = np.asarray(face_encoding, dtype=np.float32).tobytes()
+
+            with self.connection:
+                # Delete and insert so a replaced user gets a new id and is picked up by sync_galleries
+                self.connection.execute("DELETE FROM users WHERE username = ?", (username,))
+                self.connection.execute(
+                    "INSERT INTO users (username, face_encoding, templates, image_path, created_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (username, blob, self._templates_blob(templates), saved_image_path, datetime.now().isoformat())
+                )
+
+            if face_encoding is not None:
+                for gallery in self.galleries:
+                    gallery.add(username, face_encoding, templates)
+            return True
+        except Exception as e:
+            print(f"Error saving user: {e}")
+            return False
+
+    def save_users(self, users: List[Tuple[str, np.ndarray, str]]) -> List[str]:
+        """
+        Saves many users in a single transaction, used for bulk enrollment.
+
+        Args:
+            users (List[Tuple[str, np.ndarray, str]]): (username, face encoding,
+                                                        original image path) of each user
+
+        Returns:
+            List[str]: Usernames that were saved; users whose image can't be copied are skipped
+        """
+        rows = []
+        saved = []
+        for username, face_encoding, original_image_path in users:
+            saved_image_path = self._save_user_image(original_image_path, username)
+            if not saved_image_path:
+                continue
+            blob = None
+            if face_encoding is not None:
+                blob = np.asarray(face_encoding, dtype=np.float32).tobytes()
+            rows.append((username, blob, saved_image_path, datetime.now().isoformat()))
+            saved.append((username, face_encoding))
+
+        if not rows:
+            return []
+
+        try:
+            with self.connection:
+                self.connection.executemany("DELETE FROM users WHERE username = ?",
+                                            [(row[0],) for row in rows])
+                self.connection.executemany(
+                    "INSERT INTO users (username, face_encoding, image_path, created_at) VALUES (?, ?, ?, ?)",
+                    rows
+                )
+        except Exception as e:
+            print(f"Error saving users: {e}")
+            return []
+
+        self._add_to_galleries(saved)
+        return [username for username, _ in saved]
+
+    def register_gallery(self, gallery: FaceGallery) -> FaceGallery:
+        """
+        Loads every stored encoding into a gallery and keeps it in sync on each
+        save_user. Users saved by other workers are added by sync_galleries.
+
+        Args:
+            gallery (FaceGallery): Gallery to populate
+
+        Returns:
+            FaceGallery: The same gallery, for chaining
+        """
+        usernames, encodings, templates, last_id = self._read_encodings(0)
+        if usernames:
+            gallery.load_matrix(usernames, encodings)
+            for username, user_templates in zip(usernames, templates):
+                if user_templates is not None:
+                    gallery.set_templates(username, user_templates)
+        self._last_synced_id = max(self._last_synced_id, last_id)
+        self.galleries.append(gallery)
+        return gallery
+
+    def sync_galleries(self) -> int:
+        """
+        Adds users saved by other worker processes to the registered galleries.
+        Uses the id index, so the cost depends only on the number of new rows.
+
+        Returns:
+            int: Number of users added
+        """
+        if not self.galleries:
+            return 0
+
+        usernames, encodings, templates, last_id = self._read_encodings(self._last_synced_id)
+        for username, encoding, user_templates in zip(usernames, encodings, templates):
+            for gallery in self.galleries:
+                gallery.add(username, encoding, user_templates)
+        self._last_synced_id = max(self._last_synced_id, last_id)
+        return len(usernames)
+
+    def _read_encodings(self, after_id: int):
+        cursor = self.connection.execute(
+            "SELECT id, username, face_encoding, templates FROM users "
+            "WHERE id > ? AND face_encoding IS NOT NULL ORDER BY id", (after_id,))
+        rows = cursor.fetchall()
+        if not rows:
+            return [], None, [], after_id
+
+        usernames = [row[1] for row in rows]
+        encodings = np.stack([np.frombuffer(row[2], dtype=np.float32) for row in rows])
+        templates = [np.frombuffer(row[3], dtype=np.float32).reshape(-1, encodings.shape[1])
+                     if row[3] is not None else None for row in rows]
+        return usernames, encodings, templates, rows[-1][0]
@@ -0,0 +1,84 @@
+"""
+Startup helpers for the API entry points.
+
+Cold start is dominated by loading the models and by the lazy initialization
+the first inference triggers. The entry points time every startup stage with
+StartupTimer and run a warm-up inference before the app is returned, so the
+server only starts listening once the models are ready.
+
+Sharing models between server workers (copy-on-write):
+    gunicorn -k uvicorn.workers.UvicornWorker --preload -w 4 src.main_api_dlib:app
+
+With --preload the app, the database and the models are loaded once in the
+master process and the workers are forked from it, sharing those pages until
+they are written. freeze_for_fork() moves every object created during startup
+out of the garbage collector's reach, so collections in the workers don't touch
+(and copy) the shared pages. Process-mode inference pools start after the fork,
+in each worker's startup handler. ONNX Runtime sessions are not fork-safe, so
+the InsightFace API should be started without --preload.
+"""
+import gc
+import time
+from contextlib import contextmanager
+from typing import Dict
+
+
+class StartupTimer:
+    """
+    Records how long each startup stage takes.
+    """
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.finished_at = None
+        self.timings: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Times the block under the given stage name.
+
+        Args:
+            name (str): Stage name, e.g. "models" or "warm_up"
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = time.perf_counter() - start
+            print(f"Startup stage '{name}': {self.timings[name] * 1000:.1f} ms")
+
+    def finish(self) -> float:
+        """
+        Marks the end of startup.
+
+        Returns:
+            float: Total startup time in seconds
+        """
+        self.finished_at = time.perf_counter()
+        return self.total
+
+    @property
+    def total(self) -> float:
+        """
+        Returns the startup time in seconds, or the time elapsed so far if
+        startup hasn't finished.
+        """
+        return (self.finished_at or time.perf_counter()) - self.started_at
+
+    def report(self) -> Dict[str, float]:
+        """
+        Returns the stage timings in milliseconds, plus the total.
+        """
+        report = {name: round(seconds * 1000, 1) for name, seconds in self.timings.items()}
+        report["total"] = round(self.total * 1000, 1)
+        return report
+
+
+def freeze_for_fork() -> None:
+    """
+    Collects garbage and freezes the surviving objects, so forked workers share
+    the startup memory copy-on-write instead of copying it on their first collection.
+    """
+    gc.collect()
+    gc.freeze()
@@ -0,0 +1,57 @@
+import multiprocessing
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from src.tools import bulk_enroll
+from src.utils.db_manager import DBManager
+from src.utils.face_gallery import FaceGallery
+
+
+class FakeInsightFaceRecognizer:
+    """
+    Returns raw, non-unit embeddings like InsightFace's recognition model, one per image file name.
+    """
+
+    def get_face_encodings_batch(self, paths):
+        encodings = []
+        for path in paths:
+            user_number = int(os.path.splitext(os.path.basename(path))[0].split("_")[1])
+            encodings.append(np.random.default_rng(user_number).normal(size=512).astype(np.float32) * 20.0)
+        return encodings
+
+
+@unittest.skipUnless(multiprocessing.get_start_method() == "fork",
+                     "workers must inherit the patched recognizer factory")
+class BulkEnrollInsightFaceTest(unittest.TestCase):
+
+    def test_insightface_encodings_are_stored_as_unit_vectors(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            photos = os.path.join(temp_dir, "photos")
+            os.makedirs(photos)
+            for i in range(3):
+                with open(os.path.join(photos, f"user_{i}.jpg"), "wb") as f:
+                    f.write(b"image")
+            db_file = os.path.join(temp_dir, "db", "users_db_IF.json")
+            images_dir = os.path.join(temp_dir, "images")
+
+            with mock.patch.object(bulk_enroll, "build_recognizer", lambda name: FakeInsightFaceRecognizer()):
+                stats = bulk_enroll.enroll(photos, "insightface", db_file, images_dir, workers=1)
+            self.assertEqual(stats["enrolled"], 3)
+
+            db_manager = DBManager(db_file, images_dir)
+            for username in ("user_0", "user_1", "user_2"):
+                encoding = np.asarray(db_manager.get_user(username)["face_encoding"])
+                self.assertAlmostEqual(float(np.linalg.norm(encoding)), 1.0, places=5)
+
+            # Same encoding the API register endpoint would store for that image
+            raw = FakeInsightFaceRecognizer().get_face_encodings_batch(["user_1.jpg"])[0]
+            stored = np.asarray(db_manager.get_user("user_1")["face_encoding"], dtype=np.float32)
+            np.testing.assert_allclose(stored, FaceGallery.normalize(raw), rtol=1e-6)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from src.indexes.ivf_flat_index import IVFFlatIndex
+from src.utils.face_gallery import FaceGallery
+from src.utils.sqlite_db_manager import SQLiteDBManager
+
+
+def make_encodings(size: int, dimensions: int = 16, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(size // 20, dimensions))
+    return (centers[rng.integers(0, len(centers), size)]
+            + 0.3 * rng.normal(size=(size, dimensions))).astype(np.float32)
+
+
+class IVFFlatIndexReloadTest(unittest.TestCase):
+    """
+    A persisted index must not be reused with assignments that point at the wrong rows.
+    With n_probe=1 each row is only found through its own list, so enrolled
+    encodings are matched to themselves only if every assignment is right.
+    """
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.index_path = os.path.join(self.temp_dir.name, "users.ivf.npz")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def make_index(self) -> IVFFlatIndex:
+        return IVFFlatIndex(index_path=self.index_path, n_probe=1, min_train_size=50, save_every=1)
+
+    def assert_self_matches(self, gallery: FaceGallery, users: dict):
+        misses = [username for username, encoding in users.items()
+                  if gallery.best_match(encoding)[0] != username]
+        self.assertEqual(misses, [])
+
+    def test_reregistered_user_moves_rows_in_sqlite(self):
+        image_path = os.path.join(self.temp_dir.name, "face.jpg")
+        with open(image_path, "wb") as f:
+            f.write(b"image")
+        db_file = os.path.join(self.temp_dir.name, "users.db")
+        images_dir = os.path.join(self.temp_dir.name, "images")
+
+        encodings = make_encodings(400)
+        users = {f"user_{i:03d}": encoding for i, encoding in enumerate(encodings)}
+        db_manager = SQLiteDBManager(db_file, images_dir)
+        db_manager.save_users([(username, encoding, image_path) for username, encoding in users.items()])
+        db_manager.register_gallery(FaceGallery(index=self.make_index()))
+
+        # Deleted and reinserted: after a restart the user and every later row move
+        users["user_300"] = make_encodings(400, seed=1)[0]
+        self.assertTrue(db_manager.save_user("user_300", users["user_300"], image_path))
+        db_manager.connection.close()
+
+        db_manager = SQLiteDBManager(db_file, images_dir)
+        gallery = db_manager.register_gallery(FaceGallery(index=self.make_index()))
+        self.assert_self_matches(gallery, users)
+
+    def test_reordered_gallery_is_not_reused(self):
+        encodings = make_encodings(400)
+        index = self.make_index()
+        index.attach(encodings)
+        self.assertTrue(os.path.exists(self.index_path))
+
+        # The first row stays in place, as the old single-row check compared only that one
+        order = np.concatenate([[0], 1 + np.random.default_rng(2).permutation(len(encodings) - 1)])
+        shuffled = encodings[order]
+        gallery = FaceGallery(index=self.make_index())
+        users = {f"user_{i:03d}": encoding for i, encoding in enumerate(shuffled)}
+        gallery.load_users({username: {"face_encoding": encoding} for username, encoding in users.items()})
+        self.assert_self_matches(gallery, users)
+
+    def test_replaced_middle_row_is_reassigned(self):
+        encodings = make_encodings(400)
+        self.make_index().attach(encodings)
+
+        replaced = encodings.copy()
+        replaced[200] = make_encodings(400, seed=3)[0]
+        index = self.make_index()
+        self.assertTrue(index.load(replaced))
+        gallery = FaceGallery(index=index)
+        users = {f"user_{i:03d}": encoding for i, encoding in enumerate(replaced)}
+        gallery.load_users({username: {"face_encoding": encoding} for username, encoding in users.items()})
+        self.assert_self_matches(gallery, users)
+
+
+if __name__ == "__main__":
+    unittest.main()